@@ -0,0 +1 @@
+"""Computations on tide data"""
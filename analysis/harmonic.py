@@ -0,0 +1,248 @@
+"""
+Harmonic analysis of tides.
+
+Heights are fitted by least squares as a mean level plus cosine waves
+of known tidal constituents, then predicted at any time without crawling.
+Nodal corrections are ignored, so models should be refitted from recent tides
+rather than used for years.
+"""
+from datetime import date, datetime, time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from storages.model import Tide, TideItem
+
+from analysis.interpolate import MINUTES_OF_DAY, to_arrays
+from analysis.series import Extreme
+
+# times are hours since this naive local datetime
+EPOCH = datetime(2000, 1, 1)
+
+
+class Constituent(NamedTuple):
+    name: str
+    # degrees per hour
+    speed: float
+
+
+# in order of priority, kept first when two constituents can't be separated
+CONSTITUENTS: Tuple[Constituent, ...] = (
+    Constituent('M2', 28.9841042),
+    Constituent('S2', 30.0000000),
+    Constituent('K1', 15.0410686),
+    Constituent('O1', 13.9430356),
+    Constituent('N2', 28.4397295),
+    Constituent('K2', 30.0821373),
+    Constituent('P1', 14.9589314),
+    Constituent('Q1', 13.3986609),
+    Constituent('M4', 57.9682084),
+    Constituent('MS4', 58.9841042),
+    Constituent('MN4', 57.4238337),
+    Constituent('M6', 86.9523127),
+    Constituent('2N2', 27.8953548),
+    Constituent('MU2', 27.9682084),
+    Constituent('NU2', 28.5125831),
+    Constituent('L2', 29.5284789),
+    Constituent('J1', 15.5854433),
+    Constituent('M3', 43.4761563),
+    Constituent('MK3', 44.0251729),
+    Constituent('OO1', 16.1391017),
+    Constituent('2Q1', 12.8542862),
+    Constituent('S4', 60.0000000),
+    Constituent('M8', 115.9364166),
+    Constituent('Mf', 1.0980331),
+    Constituent('Mm', 0.5443747),
+)
+
+
+class Quality(NamedTuple):
+    # root mean square error in cm
+    rmse: float
+    # max absolute error in cm
+    max_error: float
+    # count of compared heights
+    count: int
+
+
+def hours_of(d: datetime) -> float:
+    """Hours since :data:`EPOCH`."""
+    return (d - EPOCH).total_seconds() / 3600
+
+
+def samples_of(tides: Iterable[Tide]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Collect hourly heights and extremes of :param:`tides`.
+
+    :return: (hours since :data:`EPOCH`, heights)
+    """
+    hours: List[np.ndarray] = []
+    heights: List[np.ndarray] = []
+    for t in tides:
+        if t is None or t.date is None:
+            continue
+        minutes, ys = to_arrays([*(t.day or []), *(t.limit or [])])
+        start = datetime(t.date.year, t.date.month, t.date.day)
+        hours.append(hours_of(start) + minutes / 60)
+        heights.append(ys)
+    if not hours:
+        return np.zeros(0), np.zeros(0)
+    return np.concatenate(hours), np.concatenate(heights)
+
+
+def select(span: float, constituents: Sequence[Constituent] = CONSTITUENTS) -> List[Constituent]:
+    """
+    Select constituents resolvable from samples over :param:`span` hours.
+
+    A constituent needs a whole period within the span, and must differ
+    from every selected one by at least one cycle over the span (Rayleigh criterion).
+    """
+    if span <= 0:
+        return []
+    selected: List[Constituent] = []
+    for c in constituents:
+        if c.speed * span < 360:
+            continue
+        if all(abs(c.speed - s.speed) * span >= 360 for s in selected):
+            selected.append(c)
+    return selected
+
+
+def _design(hours: np.ndarray, speeds: np.ndarray) -> np.ndarray:
+    """Columns of 1, then cos and sin of each constituent."""
+    phases = np.radians(np.outer(hours, speeds))
+    return np.hstack([np.ones((len(hours), 1)), np.cos(phases), np.sin(phases)])
+
+
+class HarmonicModel:
+    """Fitted mean level and constituents of a port."""
+
+    def __init__(self, mean: float, names: Sequence[str], speeds: Sequence[float],
+                 amplitudes: Sequence[float], phases: Sequence[float],
+                 rmse: float = float('nan'), count: int = 0, datum: Optional[float] = None) -> None:
+        """
+        :param mean: Mean level in cm.
+        :param names: Names of constituents.
+        :param speeds: Degrees per hour.
+        :param amplitudes: Amplitudes in cm.
+        :param phases: Degrees at :data:`EPOCH`.
+        :param rmse: Root mean square error of fitted samples.
+        :param count: Count of fitted samples.
+        :param datum: Datum plane of heights, see also :attr:`Tide.datum`.
+        """
+        self.mean = float(mean)
+        self.names = list(names)
+        self.speeds = np.asarray(speeds, dtype=np.float64)
+        self.amplitudes = np.asarray(amplitudes, dtype=np.float64)
+        self.phases = np.asarray(phases, dtype=np.float64)
+        self.rmse = float(rmse)
+        self.count = count
+        self.datum = datum
+        # compared with tides which are not fitted, see also :method:`evaluate`
+        self.quality: Optional[Quality] = None
+
+    def predict(self, hours: np.ndarray) -> np.ndarray:
+        """Heights at :param:`hours` since :data:`EPOCH`."""
+        hours = np.asarray(hours, dtype=np.float64)
+        args = np.radians(np.multiply.outer(hours, self.speeds) - self.phases)
+        return self.mean + np.cos(args) @ self.amplitudes
+
+    def curve(self, d: date, step: float = 60) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Heights of :param:`d` every :param:`step` minutes.
+
+        :return: (minutes since 00:00, heights)
+        """
+        if step <= 0:
+            raise ValueError('step must be positive')
+        minutes = np.arange(0, MINUTES_OF_DAY, step, dtype=np.float64)
+        start = hours_of(datetime(d.year, d.month, d.day))
+        return minutes, self.predict(start + minutes / 60)
+
+    def extremes(self, d: date) -> List[Extreme]:
+        """High and low waters of :param:`d`, to the minute."""
+        start = hours_of(datetime(d.year, d.month, d.day))
+        # one more minute at both ends to detect extremes at 00:00 and 23:59
+        minutes = np.arange(-1, MINUTES_OF_DAY + 1, dtype=np.float64)
+        ys = self.predict(start + minutes / 60)
+        slopes = np.sign(np.diff(ys))
+        # index of y where slope changes
+        turns = np.flatnonzero(slopes[:-1] != slopes[1:]) + 1
+        return [Extreme(float(minutes[i]), float(ys[i]), bool(slopes[i - 1] > 0)) for i in turns
+                if 0 <= minutes[i] < MINUTES_OF_DAY and slopes[i - 1] != 0]
+
+    def tide_items(self, d: date) -> Tuple[List[TideItem], List[TideItem]]:
+        """
+        Predicted hourly heights and extremes of :param:`d`,
+        as :attr:`Tide.day` and :attr:`Tide.limit`. Heights are rounded to cm.
+        """
+        minutes, ys = self.curve(d, 60)
+        day = [TideItem(time(int(m) // 60), round(float(y))) for m, y in zip(minutes, ys)]
+        limit = [TideItem(time(int(e.minute) // 60, int(e.minute) % 60), round(e.height))
+                 for e in self.extremes(d)]
+        return day, limit
+
+    def evaluate(self, tides: Iterable[Tide]) -> Quality:
+        """Compare predicted heights with heights of crawled :param:`tides`."""
+        hours, heights = samples_of(tides)
+        if not len(hours):
+            return Quality(float('nan'), float('nan'), 0)
+        errors = self.predict(hours) - heights
+        return Quality(float(np.sqrt(np.mean(errors ** 2))), float(np.max(np.abs(errors))), len(errors))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Json serializable form, see also :method:`from_dict`."""
+        return {'mean': self.mean, 'names': self.names, 'speeds': self.speeds.tolist(),
+                'amplitudes': self.amplitudes.tolist(), 'phases': self.phases.tolist(),
+                'rmse': self.rmse, 'count': self.count, 'datum': self.datum,
+                'quality': list(self.quality) if self.quality else None}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> 'HarmonicModel':
+        model = cls(d['mean'], d['names'], d['speeds'], d['amplitudes'], d['phases'],
+                    d.get('rmse', float('nan')), d.get('count', 0), d.get('datum'))
+        if d.get('quality'):
+            model.quality = Quality(*d['quality'])
+        return model
+
+
+def fit(hours: np.ndarray, heights: np.ndarray, constituents: Sequence[Constituent] = CONSTITUENTS) -> HarmonicModel:
+    """
+    Fit heights by least squares.
+    Only constituents resolvable from the span of :param:`hours` are used, see :func:`select`.
+
+    :param hours: Hours since :data:`EPOCH`.
+    :param heights: Heights at :param:`hours`.
+    """
+    hours = np.asarray(hours, dtype=np.float64)
+    heights = np.asarray(heights, dtype=np.float64)
+    selected = select(float(np.ptp(hours)) if len(hours) else 0, constituents)
+    n = len(selected)
+    if len(hours) < 2 * n + 1 or n == 0:
+        raise ValueError(f'{len(hours)} samples are too few to fit tidal constituents')
+    speeds = np.array([c.speed for c in selected])
+    a = _design(hours, speeds)
+    coef, *_ = np.linalg.lstsq(a, heights, rcond=None)
+    residual = a @ coef - heights
+    cos, sin = coef[1:n + 1], coef[n + 1:]
+    return HarmonicModel(coef[0], [c.name for c in selected], speeds,
+                         np.hypot(cos, sin), np.degrees(np.arctan2(sin, cos)),
+                         float(np.sqrt(np.mean(residual ** 2))), len(hours))
+
+
+def fit_tides(tides: Sequence[Tide], validate_days: int = 0,
+              constituents: Sequence[Constituent] = CONSTITUENTS) -> HarmonicModel:
+    """
+    Fit hourly heights and extremes of stored :param:`tides`. See also :func:`fit`.
+
+    :param tides: Tides in order of date.
+    :param validate_days: Count of the latest tides which are not fitted,
+        but compared with predictions as :attr:`HarmonicModel.quality`.
+    """
+    fitted = tides[:len(tides) - validate_days] if validate_days > 0 else tides
+    hours, heights = samples_of(fitted)
+    model = fit(hours, heights, constituents)
+    model.datum = next((t.datum for t in reversed(tides) if t.datum is not None), None)
+    if validate_days > 0:
+        model.quality = model.evaluate(tides[len(fitted):])
+    return model
+
@@ -0,0 +1,115 @@
+"""
+Vectorized interpolation of tide heights.
+
+Times are minutes since the start of the day, so that a whole day
+is evaluated by one call on numpy arrays.
+"""
+from typing import Iterable, Tuple
+
+import numpy as np
+from storages.model import Tide, TideItem
+
+MINUTES_OF_DAY = 24 * 60
+
+SPLINE = 'spline'
+COSINE = 'cosine'
+METHODS = (SPLINE, COSINE)
+
+
+def to_arrays(items: Iterable[TideItem]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert :class:`TideItem`s to arrays sorted by time.
+    Items without time or height are dropped, and only the first one of the same time is kept.
+
+    :return: (minutes since 00:00, heights)
+    """
+    pairs = {}
+    for i in items:
+        if i is None or i.time is None or i.height is None:
+            continue
+        m = i.time.hour * 60 + i.time.minute + i.time.second / 60
+        pairs.setdefault(m, float(i.height))
+    minutes = sorted(pairs)
+    return np.array(minutes, dtype=np.float64), np.array([pairs[m] for m in minutes], dtype=np.float64)
+
+
+def cubic_spline(x: np.ndarray, y: np.ndarray, xs: np.ndarray) -> np.ndarray:
+    """
+    Evaluate the natural cubic spline through (:param:`x`, :param:`y`) at :param:`xs`.
+
+    :param x: Strictly increasing knots. At least 2.
+    :param y: Values at knots. A 2d array of shape (series, knots) evaluates many series
+        with the same knots at once, and the knot system is solved only once.
+    :param xs: Points to evaluate. Points out of knots are extrapolated by the end pieces.
+    :return: Values of shape (len(xs),) or (series, len(xs)).
+    """
+    n = len(x)
+    if n < 2:
+        raise ValueError('cubic spline needs at least 2 knots')
+    y = np.asarray(y, dtype=np.float64)
+    h = np.diff(x)
+    # second derivatives at knots, zeros at both ends for natural spline
+    m = np.zeros(y.shape)
+    if n > 2:
+        a = np.zeros((n - 2, n - 2))
+        idx = np.arange(n - 2)
+        a[idx, idx] = 2 * (h[:-1] + h[1:])
+        a[idx[1:], idx[:-1]] = h[1:-1]
+        a[idx[:-1], idx[1:]] = h[1:-1]
+        slopes = np.diff(y, axis=-1) / h
+        m[..., 1:-1] = np.linalg.solve(a, 6 * np.diff(slopes, axis=-1).T).T
+    xs = np.asarray(xs, dtype=np.float64)
+    i = np.clip(np.searchsorted(x, xs, side='right') - 1, 0, n - 2)
+    hi = h[i]
+    t0 = xs - x[i]
+    t1 = x[i + 1] - xs
+    return (m[..., i] * t1 ** 3 + m[..., i + 1] * t0 ** 3) / (6 * hi) \
+        + (y[..., i] / hi - m[..., i] * hi / 6) * t1 \
+        + (y[..., i + 1] / hi - m[..., i + 1] * hi / 6) * t0
+
+
+def cosine(x: np.ndarray, y: np.ndarray, xs: np.ndarray) -> np.ndarray:
+    """
+    Evaluate half cosine waves between adjacent extremes (:param:`x`, :param:`y`) at :param:`xs`.
+
+    It's the usual approximation of tide between a high water and a low water.
+    Points out of extremes follow the nearest wave.
+
+    :param x: Strictly increasing times of extremes. At least 2.
+    :param y: Heights of extremes.
+    :param xs: Points to evaluate.
+    """
+    if len(x) < 2:
+        raise ValueError('cosine interpolation needs at least 2 extremes')
+    xs = np.asarray(xs, dtype=np.float64)
+    i = np.clip(np.searchsorted(x, xs, side='right') - 1, 0, len(x) - 2)
+    phase = np.pi * (xs - x[i]) / (x[i + 1] - x[i])
+    return (y[i] + y[i + 1]) / 2 + (y[i] - y[i + 1]) / 2 * np.cos(phase)
+
+
+def interpolate(tide: Tide, xs: np.ndarray, method: str = SPLINE) -> np.ndarray:
+    """
+    Evaluate heights of :param:`tide` at :param:`xs` minutes.
+
+    :param method: :data:`SPLINE` through hourly heights and extremes,
+        or :data:`COSINE` between extremes.
+    """
+    if method == SPLINE:
+        x, y = to_arrays([*(tide.day or []), *(tide.limit or [])])
+        return cubic_spline(x, y, xs)
+    if method == COSINE:
+        x, y = to_arrays(tide.limit or [])
+        return cosine(x, y, xs)
+    raise ValueError(f'method must be one of {METHODS}, but got {method}')
+
+
+def curve(tide: Tide, step: float, method: str = SPLINE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Evaluate heights of :param:`tide` every :param:`step` minutes of the day.
+
+    :return: (minutes since 00:00, heights)
+    """
+    if step <= 0:
+        raise ValueError('step must be positive')
+    xs = np.arange(0, MINUTES_OF_DAY, step, dtype=np.float64)
+    return xs, interpolate(tide, xs, method)
@@ -0,0 +1,162 @@
+"""Vectorized analytics of hourly tide series of many ports and days."""
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from storages.model import Tide
+
+from analysis.interpolate import MINUTES_OF_DAY, cubic_spline
+
+HOURS = 24
+# minutes of hourly samples
+HOUR_MINUTES = np.arange(HOURS, dtype=np.float64) * 60
+
+
+class Extreme(NamedTuple):
+    # minutes since 00:00
+    minute: float
+    height: float
+    # high water or low water
+    high: bool
+
+
+class Window(NamedTuple):
+    # minutes since 00:00, inclusive
+    start: float
+    # minutes since 00:00, exclusive
+    end: float
+
+
+class TideSeries:
+    """
+    Hourly heights of many tides as one 2d array of shape (tides, 24),
+    so that analytics of all tides are computed by array operations at once.
+
+    Missing hours are linearly interpolated from the others of the same tide.
+    Tides with less than 2 hours are kept as rows of NaN, and produce no result.
+    """
+
+    def __init__(self, labels: List[Tuple[Optional[str], date]], heights: np.ndarray) -> None:
+        """
+        :param labels: (port id, date) of each row.
+        :param heights: Array of shape (len(labels), 24).
+        """
+        heights = np.asarray(heights, dtype=np.float64).reshape(-1, HOURS)
+        if len(labels) != len(heights):
+            raise ValueError('labels and heights must have the same length')
+        self.labels = labels
+        self.heights = heights
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @classmethod
+    def from_tides(cls, tides: Iterable[Tide]) -> 'TideSeries':
+        labels: List[Tuple[Optional[str], date]] = []
+        rows: List[np.ndarray] = []
+        for t in tides:
+            row = np.full(HOURS, np.nan)
+            for i in t.day or []:
+                if i.time is not None and i.height is not None and i.time.minute == 0:
+                    row[i.time.hour] = i.height
+            known = ~np.isnan(row)
+            if 1 < known.sum() < HOURS:
+                row = np.interp(HOUR_MINUTES, HOUR_MINUTES[known], row[known])
+            elif known.sum() <= 1:
+                row[:] = np.nan
+            labels.append((t.port.objectId if t.port else None, t.date.date()))
+            rows.append(row)
+        return cls(labels, np.array(rows).reshape(-1, HOURS))
+
+    def rows_of(self, port_ids: Sequence[str]) -> np.ndarray:
+        """
+        Heights of :param:`port_ids` as one contiguous array of shape (len(port_ids), 24).
+        Ports without tide are rows of NaN. The first tide is used if a port has many.
+        """
+        rows: Dict[Optional[str], int] = {}
+        for i, (port_id, _) in enumerate(self.labels):
+            rows.setdefault(port_id, i)
+        heights = np.full((len(port_ids), HOURS), np.nan)
+        found = [(i, rows[p]) for i, p in enumerate(port_ids) if p in rows]
+        if found:
+            dst, src = zip(*found)
+            heights[list(dst)] = self.heights[list(src)]
+        return heights
+
+    def ranges(self) -> np.ndarray:
+        """Tidal range of each tide, the highest minus the lowest hourly height."""
+        if not len(self):
+            return np.zeros(0)
+        with np.errstate(invalid='ignore'):
+            return np.max(self.heights, axis=1) - np.min(self.heights, axis=1)
+
+    def extrema(self) -> List[List[Extreme]]:
+        """
+        High and low waters of each tide at sub-hour precision.
+
+        Each local extreme of hourly heights is refined to the vertex of
+        the parabola through it and its two neighbors.
+        Extremes at 00:00 and 23:00 are not detected since they have only one neighbor.
+        """
+        left, center, right = self.heights[:, :-2], self.heights[:, 1:-1], self.heights[:, 2:]
+        high = (center > left) & (center >= right)
+        low = (center < left) & (center <= right)
+        curvature = left - 2 * center + right
+        with np.errstate(divide='ignore', invalid='ignore'):
+            offset = np.where(curvature != 0, 0.5 * (left - right) / curvature, 0)
+        peaks = center - 0.25 * (left - right) * offset
+        minutes = (np.arange(1, HOURS - 1) + offset) * 60
+        rows, cols = np.nonzero(high | low)
+        result: List[List[Extreme]] = [[] for _ in range(len(self))]
+        for r, c in zip(rows.tolist(), cols.tolist()):
+            result[r].append(Extreme(float(minutes[r, c]), float(peaks[r, c]), bool(high[r, c])))
+        return result
+
+    def resample(self, step: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Evaluate all tides every :param:`step` minutes of the day by natural cubic spline.
+
+        :return: (minutes since 00:00, heights of shape (tides, points))
+        """
+        xs = np.arange(0, MINUTES_OF_DAY, step, dtype=np.float64)
+        if not len(self):
+            return xs, np.zeros((0, len(xs)))
+        return xs, cubic_spline(HOUR_MINUTES, self.heights, xs)
+
+    def windows(self, lower: float = None, upper: float = None, step: float = 1) -> List[List[Window]]:
+        """
+        Time windows of each tide when the height is between :param:`lower` and :param:`upper`.
+
+        Heights are resampled every :param:`step` minutes, and boundaries are
+        refined by linear interpolation between samples.
+
+        :param lower: Min height, inclusive. No limit if None.
+        :param upper: Max height, inclusive. No limit if None.
+        """
+        if lower is None and upper is None:
+            raise ValueError('lower and upper cannot be None at the same time')
+        xs, ys = self.resample(step)
+        inside = np.ones(ys.shape, dtype=bool)
+        with np.errstate(invalid='ignore'):
+            if lower is not None:
+                inside &= ys >= lower
+            if upper is not None:
+                inside &= ys <= upper
+        # +1 at starts, -1 at ends of runs
+        edges = np.diff(np.pad(inside.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+        starts_r, starts_c = np.nonzero(edges == 1)
+        _, ends_c = np.nonzero(edges == -1)
+
+        def crossing(r: int, c: int) -> float:
+            """Refined minute between sample c-1 and c where the height crosses a bound."""
+            if c <= 0 or c >= len(xs):
+                return float(xs[c]) if c < len(xs) else float(MINUTES_OF_DAY)
+            y0, y1 = ys[r, c - 1], ys[r, c]
+            bound = lower if lower is not None and (y0 < lower) != (y1 < lower) else upper
+            if bound is None or y1 == y0:
+                return float(xs[c])
+            return float(xs[c - 1] + (bound - y0) / (y1 - y0) * step)
+        result: List[List[Window]] = [[] for _ in range(len(self))]
+        for r, s, e in zip(starts_r.tolist(), starts_c.tolist(), ends_c.tolist()):
+            result[r].append(Window(crossing(r, s), crossing(r, e)))
+        return result
@@ -0,0 +1,136 @@
+"""
+Statistics of tides.
+
+Fields derived from one tide are stored with it to be queried in storage,
+and monthly statistics are merged incrementally from daily ones.
+"""
+import hashlib
+import json
+from datetime import datetime
+from typing import Iterable, List, NamedTuple, Optional
+
+from storages.model import DayStatsDict, Tide, TideItem
+
+
+class Extremum(NamedTuple):
+    time: datetime
+    height: float
+
+
+class MonthStats(NamedTuple):
+    # count of days with stats
+    count: int
+    # lowest and highest water of the month
+    min: Optional[Extremum]
+    max: Optional[Extremum]
+    # mean of hourly heights
+    mean: Optional[float]
+    # mean of daily ranges
+    mean_range: Optional[float]
+
+
+class TideFields(NamedTuple):
+    # highest and lowest water of hourly heights and limits
+    max: Optional[float]
+    min: Optional[float]
+    range: Optional[float]
+    # time of the first high water of the day
+    first_high: Optional[datetime]
+    # hash of datum and heights, see also :func:`checksum`
+    checksum: str
+
+
+def checksum(tide: Tide) -> str:
+    """Stable hash of datum, hourly heights and limits of :param:`tide`."""
+    content = json.dumps([tide.datum, tide.day_dicts, tide.limit_dicts],
+                         ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+def first_high(tide: Tide) -> Optional[datetime]:
+    """
+    Time of the first high water of :param:`tide`.
+
+    A limit is a high water if it's higher than its adjacent limits,
+    or higher than the mean of hourly heights if it's the only one.
+    The first local maximum of hourly heights is used if there is no limit.
+
+    :return: None if no high water is found.
+    """
+    def at(i: TideItem) -> datetime:
+        return datetime.combine(tide.date.date(), i.time)
+    limits = sorted((i for i in tide.limit or [] if i.time is not None and i.height is not None),
+                    key=lambda i: i.time)
+    hourly = sorted((i for i in tide.day or [] if i.time is not None and i.height is not None),
+                    key=lambda i: i.time)
+    if len(limits) == 1:
+        if hourly and limits[0].height > sum(i.height for i in hourly) / len(hourly):
+            return at(limits[0])
+        return None
+    if limits:
+        for k, i in enumerate(limits):
+            neighbors = limits[max(k - 1, 0):k] + limits[k + 1:k + 2]
+            if all(i.height > n.height for n in neighbors):
+                return at(i)
+        return None
+    for k in range(1, len(hourly) - 1):
+        if hourly[k - 1].height < hourly[k].height >= hourly[k + 1].height:
+            return at(hourly[k])
+    return None
+
+
+def derive(tide: Tide) -> TideFields:
+    """Fields of :param:`tide` which are stored with it, so that tides can be filtered in storage."""
+    heights = [i.height for i in [*(tide.day or []), *(tide.limit or [])] if i.height is not None]
+    highest = max(heights) if heights else None
+    lowest = min(heights) if heights else None
+    return TideFields(highest, lowest, highest - lowest if heights else None,
+                      first_high(tide) if tide.date is not None else None, checksum(tide))
+
+
+def day_stats(tide: Tide) -> Optional[DayStatsDict]:
+    """
+    Stats of one tide. Extremes are searched in both hourly heights and limits.
+
+    :return: None if :param:`tide` has no height.
+    """
+    items = [i for i in [*(tide.day or []), *(tide.limit or [])]
+             if i.time is not None and i.height is not None]
+    if not items:
+        return None
+    lowest = min(items, key=lambda i: i.height)
+    highest = max(items, key=lambda i: i.height)
+    hourly = [i.height for i in tide.day or [] if i.height is not None]
+    return DayStatsDict(date=tide.date.date().isoformat(),
+                        min=lowest.height, minTime=str(lowest.time),
+                        max=highest.height, maxTime=str(highest.time),
+                        sum=float(sum(hourly)), count=len(hourly))
+
+
+def merge_days(days: Iterable[DayStatsDict], *news: DayStatsDict) -> List[DayStatsDict]:
+    """
+    Merge stats of new days into :param:`days`. Days with the same date are replaced,
+    so merging a day again doesn't count it twice.
+
+    :return: Stats of each day in order of date.
+    """
+    merged = {d['date']: d for d in days}
+    merged.update((d['date'], d) for d in news if d is not None)
+    return [merged[k] for k in sorted(merged)]
+
+
+def summarize(days: List[DayStatsDict]) -> MonthStats:
+    """Aggregate stats of days in a month."""
+    if not days:
+        return MonthStats(0, None, None, None, None)
+
+    def at(d: DayStatsDict, t: Optional[str]) -> datetime:
+        return datetime.fromisoformat(f"{d['date']}T{t or '00:00:00'}")
+    lowest = min(days, key=lambda d: d['min'])
+    highest = max(days, key=lambda d: d['max'])
+    count = sum(d['count'] for d in days)
+    return MonthStats(len(days),
+                      Extremum(at(lowest, lowest['minTime']), lowest['min']),
+                      Extremum(at(highest, highest['maxTime']), highest['max']),
+                      sum(d['sum'] for d in days) / count if count else None,
+                      sum(d['max'] - d['min'] for d in days) / len(days))
@@ -1,9 +1,14 @@
 from aiohttp import web
 
+from web.admin import routes as admin_routes
+from web.background import cache_ctx
 from web.costumer import routes as cos_routes
-from web.middleware import error_middleware
+from web.jobs import jobs_ctx
+from web.middleware import compression_middleware, error_middleware
 
-app = web.Application(middlewares=[error_middleware])
+app = web.Application(middlewares=[error_middleware, compression_middleware])
 
-app.add_routes([*cos_routes])
+app.add_routes([*cos_routes, *admin_routes])
+app.cleanup_ctx.append(cache_ctx)
+app.cleanup_ctx.append(jobs_ctx)
 web.run_app(app)
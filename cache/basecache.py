@@ -0,0 +1,96 @@
+"""Cache backends"""
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+
+class BaseCache(ABC):
+    """
+    Key-value cache backend base class.
+
+    Keys are strings and values must be json serializable,
+    so that they can be shared between processes.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get cached value of :param:`key`.
+
+        :return: Cached value, or None if not found or expired.
+        """
+        pass
+
+    @abstractmethod
+    def keys(self) -> List[str]:
+        """Get all keys which are not expired."""
+        pass
+
+    @abstractmethod
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None):
+        """
+        Cache all :param:`items` at once.
+
+        :param items: Key-value pairs to cache.
+        :param ttl: Seconds to keep these items. None to keep forever.
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, *keys: str):
+        """Remove :param:`keys` from cache. Unexist keys will be ignored."""
+        pass
+
+    @abstractmethod
+    def clear(self):
+        """Remove all cached items."""
+        pass
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Get cached values of :param:`keys` at once.
+
+        :return: Found key-value pairs. Missing or expired keys are omitted.
+        """
+        found = {}
+        for k in keys:
+            v = self.get(k)
+            if v is not None:
+                found[k] = v
+        return found
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """
+        Cache :param:`value` as :param:`key`.
+
+        :param ttl: Seconds to keep this item. None to keep forever.
+        """
+        self.set_many({key: value}, ttl)
+
+    def expire_of(self, key: str) -> Optional[float]:
+        """
+        Get the timestamp when :param:`key` expires.
+
+        :return: None if it never expires, or it's not found.
+        """
+        return None
+
+    def delete_local(self, *keys: str):
+        """
+        Remove :param:`keys` cached by current process only, such as items
+        evicted by other processes which have removed them from shared storage.
+        Backends without shared storage remove them as :method:`delete`.
+        """
+        self.delete(*keys)
+
+    async def flush(self):
+        """Wait until pending writes are written. Do nothing by default."""
+        pass
+
+    def is_writer(self) -> bool:
+        """
+        Determine whether current process should refresh this cache.
+
+        Backends shared between processes elect only one writer,
+        others are always True.
+        """
+        return True
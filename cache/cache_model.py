@@ -0,0 +1,356 @@
+"""
+Models for cache.
+
+Cached objects are stored as json serializable records,
+these classes wrap records to implement :module:`storages.model`.
+"""
+import datetime
+import functools
+import json
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from storages.model import (Area, BaseClazz, DayStatsDict, Port, Province, Tide,
+                            TideItem, TideItemArray, TideItemDict, TideStats,
+                            WithInfo)
+
+Record = Dict[str, Any]
+
+
+def _to_iso(d: Optional[datetime.date]) -> Optional[str]:
+    return d.isoformat() if d is not None else None
+
+
+def _from_iso(s: Optional[str]) -> Optional[datetime.datetime]:
+    return datetime.datetime.fromisoformat(s) if s else None
+
+
+def _id_of(o: Optional[BaseClazz]) -> Optional[str]:
+    return o.objectId if o is not None else None
+
+
+# fields of alias names in raw data of nmdis
+_ALIAS_FIELDS = ('areaenname', 'enname', 'pyname')
+
+
+def _alias_table(content: Any) -> Dict[str, List[str]]:
+    """Get alias names of every item in raw data of a list by its id and code."""
+    items = content.get('data') if isinstance(content, dict) else None
+    table: Dict[str, List[str]] = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        aliases = [item[f] for f in _ALIAS_FIELDS if isinstance(item.get(f), str) and item[f].strip()]
+        for rid in (item.get('code'), item.get('id')):
+            if isinstance(rid, str):
+                table.setdefault(rid, aliases)
+    return table
+
+
+@functools.lru_cache(maxsize=16)
+def _parse_alias_table(raw: Union[str, bytes]) -> Dict[str, List[str]]:
+    """
+    Parse raw data of a list once, since every item of the list
+    carries the whole response as its raw data.
+    """
+    try:
+        return _alias_table(json.loads(raw))
+    except ValueError:
+        return {}
+
+
+def aliases_of(o: WithInfo) -> List[str]:
+    """
+    Get alias names of :param:`o`, such as English and pinyin names, from its raw data.
+
+    Raw data is the whole response of a list, so find the item of :param:`o` by rid.
+    """
+    if isinstance(o, CacheWithInfo):
+        return o.aliases
+    raw = o.raw
+    if not raw or not o.rid:
+        return []
+    table = _parse_alias_table(raw) if isinstance(raw, (str, bytes)) else _alias_table(raw)
+    return list(table.get(o.rid, ()))
+
+
+class CacheBaseClazz(BaseClazz):
+    OBJECT_ID = 'objectId'
+    CREATED_AT = 'createdAt'
+    UPDATED_AT = 'updatedAt'
+    RAW = 'raw'
+
+    def __init__(self, record: Record = None) -> None:
+        super().__init__()
+        self.record: Record = record if record is not None else {}
+
+    @classmethod
+    def to_record(cls, o: BaseClazz) -> Record:
+        """Convert :param:`o` to a cache record. Raw data won't be cached."""
+        return {
+            CacheBaseClazz.OBJECT_ID: o.objectId,
+            CacheBaseClazz.CREATED_AT: _to_iso(o.createdAt),
+            CacheBaseClazz.UPDATED_AT: _to_iso(o.updatedAt),
+        }
+
+    @property
+    def objectId(self) -> Optional[str]:
+        return self.record.get(CacheBaseClazz.OBJECT_ID)
+
+    @property
+    def createdAt(self) -> Optional[datetime.datetime]:
+        return _from_iso(self.record.get(CacheBaseClazz.CREATED_AT))
+
+    @property
+    def updatedAt(self) -> Optional[datetime.datetime]:
+        return _from_iso(self.record.get(CacheBaseClazz.UPDATED_AT))
+
+    @property
+    def raw(self) -> Optional[Any]:
+        return self.record.get(CacheBaseClazz.RAW)
+
+    @raw.setter
+    def raw(self, data: Any):
+        self.record[CacheBaseClazz.RAW] = data
+
+
+class CacheWithInfo(CacheBaseClazz, WithInfo):
+    NAME = 'name'
+    RID = 'rid'
+    ALIASES = 'aliases'
+
+    @classmethod
+    def to_record(cls, o: WithInfo) -> Record:
+        r = super().to_record(o)
+        r.update({CacheWithInfo.RID: o.rid, CacheWithInfo.NAME: o.name,
+                  CacheWithInfo.ALIASES: aliases_of(o)})
+        return r
+
+    @property
+    def rid(self) -> Optional[str]:
+        return self.record.get(CacheWithInfo.RID)
+
+    @rid.setter
+    def rid(self, value: str):
+        self.record[CacheWithInfo.RID] = value
+
+    @property
+    def name(self) -> Optional[str]:
+        return self.record.get(CacheWithInfo.NAME)
+
+    @name.setter
+    def name(self, value: str):
+        self.record[CacheWithInfo.NAME] = value
+
+    @property
+    def aliases(self) -> List[str]:
+        """Alias names from raw data, such as English and pinyin names."""
+        return self.record.get(CacheWithInfo.ALIASES) or []
+
+
+class CacheArea(CacheWithInfo, Area):
+    pass
+
+
+class CacheProvince(CacheWithInfo, Province):
+    AREA = 'area'
+
+    @classmethod
+    def to_record(cls, o: Province) -> Record:
+        r = super().to_record(o)
+        r[CacheProvince.AREA] = _id_of(o.area)
+        return r
+
+    @property
+    def area(self) -> Optional[Area]:
+        """Related :class:`Area` which only contains objectId."""
+        aid = self.record.get(CacheProvince.AREA)
+        return CacheArea({CacheBaseClazz.OBJECT_ID: aid}) if aid else None
+
+    @area.setter
+    def area(self, area: Area):
+        self.record[CacheProvince.AREA] = _id_of(area)
+
+
+class CachePort(CacheWithInfo, Port):
+    PROVINCE = 'province'
+    GEOPOINT = 'geopoint'
+    ZONE = 'zone'
+
+    @classmethod
+    def to_record(cls, o: Port) -> Record:
+        r = super().to_record(o)
+        r.update({CachePort.PROVINCE: _id_of(o.province),
+                  CachePort.GEOPOINT: o.geopoint,
+                  CachePort.ZONE: o.zone})
+        return r
+
+    @property
+    def province(self) -> Optional[Province]:
+        """Related :class:`Province` which only contains objectId."""
+        pid = self.record.get(CachePort.PROVINCE)
+        return CacheProvince({CacheBaseClazz.OBJECT_ID: pid}) if pid else None
+
+    @province.setter
+    def province(self, province: Province):
+        self.record[CachePort.PROVINCE] = _id_of(province)
+
+    @property
+    def zone(self) -> Optional[str]:
+        return self.record.get(CachePort.ZONE)
+
+    @zone.setter
+    def zone(self, value: str):
+        self.record[CachePort.ZONE] = value
+
+    @property
+    def geopoint(self) -> Optional[Tuple[float, float]]:
+        gp = self.record.get(CachePort.GEOPOINT)
+        return tuple(gp) if gp else None
+
+    @geopoint.setter
+    def geopoint(self, value: Tuple[float, float]):
+        self.record[CachePort.GEOPOINT] = value
+
+
+class CacheTide(CacheBaseClazz, Tide):
+    DAY = 'day'
+    LIMIT = 'limit'
+    PORT = 'port'
+    DATE = 'date'
+    DATUM = 'datum'
+    PREDICTED = 'predicted'
+
+    def __init__(self, record: Record = None) -> None:
+        # field: (cached value, array decoded from it)
+        self.__decoded: Dict[str, Tuple[Any, TideItemArray]] = {}
+        super().__init__(record)
+
+    @classmethod
+    def to_record(cls, o: Tide, port_id: str = None, predicted: bool = False) -> Record:
+        """
+        :param port_id: Id of related :class:`Port`.
+            Use it if :param:`o` is crawled and its port doesn't have an objectId.
+        :param predicted: Whether :param:`o` is predicted rather than crawled.
+        """
+        r = super().to_record(o)
+        r.update({CacheTide.PORT: port_id or _id_of(o.port),
+                  CacheTide.DATE: _to_iso(o.date),
+                  CacheTide.DAY: TideItemArray.from_items(o.day).encode(),
+                  CacheTide.LIMIT: TideItemArray.from_items(o.limit).encode(),
+                  CacheTide.DATUM: o.datum})
+        if predicted or o.predicted:
+            r[CacheTide.PREDICTED] = True
+        return r
+
+    @property
+    def predicted(self) -> bool:
+        return bool(self.record.get(CacheTide.PREDICTED))
+
+    def __to_array(self, key: str) -> TideItemArray:
+        """
+        Decode field :param:`key` only once.
+
+        The decoded array is reused until the cached value is replaced, such as by setters.
+        """
+        v: Union[str, List[TideItemDict], None] = self.record.get(key)
+        cached = self.__decoded.get(key)
+        if cached is None or cached[0] is not v:
+            # records cached before packing are lists of dicts
+            a = TideItemArray.decode(v) if isinstance(v, str) else TideItemArray.from_items(v or [])
+            cached = (v, a)
+            self.__decoded[key] = cached
+        return cached[1]
+
+    @property
+    def day_array(self) -> TideItemArray:
+        """Packed :attr:`day`. Don't modify it, it's shared by later reads."""
+        return self.__to_array(CacheTide.DAY)
+
+    @property
+    def limit_array(self) -> TideItemArray:
+        """Packed :attr:`limit`. Don't modify it, it's shared by later reads."""
+        return self.__to_array(CacheTide.LIMIT)
+
+    @property
+    def day(self) -> List[TideItem]:
+        return self.day_array.to_items()
+
+    @day.setter
+    def day(self, value: List[TideItem]):
+        self.record[CacheTide.DAY] = TideItemArray.from_items(value).encode()
+
+    @property
+    def limit(self) -> List[TideItem]:
+        return self.limit_array.to_items()
+
+    @limit.setter
+    def limit(self, value: List[TideItem]):
+        self.record[CacheTide.LIMIT] = TideItemArray.from_items(value).encode()
+
+    @property
+    def day_dicts(self) -> List[TideItemDict]:
+        return self.day_array.to_dicts()
+
+    @property
+    def limit_dicts(self) -> List[TideItemDict]:
+        return self.limit_array.to_dicts()
+
+    @property
+    def port(self) -> Optional[Port]:
+        """Related :class:`Port` which only contains objectId."""
+        pid = self.record.get(CacheTide.PORT)
+        return CachePort({CacheBaseClazz.OBJECT_ID: pid}) if pid else None
+
+    @port.setter
+    def port(self, value: Port):
+        self.record[CacheTide.PORT] = _id_of(value)
+
+    @property
+    def date(self) -> Optional[datetime.datetime]:
+        return _from_iso(self.record.get(CacheTide.DATE))
+
+    @date.setter
+    def date(self, value: datetime.datetime):
+        self.record[CacheTide.DATE] = _to_iso(value)
+
+    @property
+    def datum(self) -> Optional[float]:
+        return self.record.get(CacheTide.DATUM)
+
+    @datum.setter
+    def datum(self, value: float):
+        self.record[CacheTide.DATUM] = value
+
+
+class CacheTideStats(CacheBaseClazz, TideStats):
+    PORT = 'port'
+    YEAR = 'year'
+    MONTH = 'month'
+    DAYS = 'days'
+
+    @classmethod
+    def to_record(cls, o: TideStats) -> Record:
+        r = super().to_record(o)
+        r.update({CacheTideStats.PORT: _id_of(o.port),
+                  CacheTideStats.YEAR: o.year,
+                  CacheTideStats.MONTH: o.month,
+                  CacheTideStats.DAYS: o.days})
+        return r
+
+    @property
+    def port(self) -> Optional[Port]:
+        """Related :class:`Port` which only contains objectId."""
+        pid = self.record.get(CacheTideStats.PORT)
+        return CachePort({CacheBaseClazz.OBJECT_ID: pid}) if pid else None
+
+    @property
+    def year(self) -> Optional[int]:
+        return self.record.get(CacheTideStats.YEAR)
+
+    @property
+    def month(self) -> Optional[int]:
+        return self.record.get(CacheTideStats.MONTH)
+
+    @property
+    def days(self) -> List[DayStatsDict]:
+        return self.record.get(CacheTideStats.DAYS) or []
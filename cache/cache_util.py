@@ -1,16 +1,39 @@
-from datetime import date
-from typing import Any, List, Optional, Tuple, Type, TypeVar, Union
+import asyncio
+import calendar
+import hashlib
+import json
+import math
+import time
+from datetime import date, datetime, timedelta
+from typing import (Any, AsyncIterator, Awaitable, Callable, Dict, List,
+                    Optional, Set, Tuple, TypeVar, Union)
 
+from analysis.harmonic import HarmonicModel, fit_tides
+from analysis.stats import day_stats, merge_days
+from config import CacheSetting, ChangeLogSetting, HarmonicSetting
+from crawlers.c_model import CTide
 from services.crawler_service import CrawlerService
 from storages.basedbutil import IDT, BaseDbUtil, switch_idt
+from storages.changelog import ChangeDict, ChangeLog
 from storages.common import ExecState
 from storages.dbutil import DbUtil
-from storages.model import Area, Port, Province, Tide, WithInfo
+from storages.model import (Area, DayStatsDict, Port, Province, Tide, TideStats,
+                            WithInfo)
+from utils.async_util import as_completed_bounded, gather_bounded
+from utils.geo import GeoIndex
+from utils.logger import Logger
 from utils.meta import merge_meta
+from utils.search import SearchIndex
+from utils.singleflight import SingleFlight
 from utils.singleton import Singleton
 from utils.validate import Value
 
-from utils.alru import alru_cache
+from cache.basecache import BaseCache
+from cache.cache_model import (CacheArea, CachePort, CacheProvince, CacheTide,
+                               CacheTideStats, aliases_of)
+from cache.memory_cache import MemoryCache
+from cache.shared_cache import SharedCache
+from cache.snapshot import Snapshot
 
 _ClazzWithInfo = TypeVar('_ClazzWithInfo', bound=WithInfo)
 
@@ -18,20 +41,76 @@ _ClazzWithInfo = TypeVar('_ClazzWithInfo', bound=WithInfo)
 EXECSTATE_SUCCESS = [ExecState.CREATE, ExecState.SUCCESS, ExecState.UPDATE]
 
 
+def create_cache() -> BaseCache:
+    """Create cache backend from :class:`CacheSetting`."""
+    if CacheSetting.BACKEND == 'memory':
+        return MemoryCache()
+    if CacheSetting.BACKEND == 'shared':
+        return SharedCache(CacheSetting.SHARED_PATH, CacheSetting.SHARED_CHECK_INTERVAL)
+    raise ValueError(
+        f"cache backend must be 'memory' or 'shared', but got {CacheSetting.BACKEND}")
+
+
+def _key(*parts: Any) -> str:
+    return ':'.join(str(p) for p in parts)
+
+
+_HIERARCHY_KEYS = ('area', 'areas', 'province',
+                   'provinces', 'port', 'ports')
+
+
+def _stats_key(port_id: str, year: int, month: int) -> str:
+    return _key('stats', port_id, f'{year:04d}-{month:02d}')
+
+
+def _versions(records: List[dict]) -> List[Tuple[str, str]]:
+    return [(r.get(CacheArea.OBJECT_ID), r.get(CacheArea.UPDATED_AT)) for r in records]
+
+
 class CacheUtil(merge_meta(BaseDbUtil, Singleton)):
+    """
+    Read-through cache over :class:`DbUtil`.
 
-    def __new__(cls: Type[DbUtil]) -> DbUtil:
-        return DbUtil()
+    Only queries by :attr:`IDT.ID` are cached, others query storage directly.
+    Concurrent misses of the same key share one query or crawl.
+    """
 
-    def __init__(self) -> None:
+    def __init__(self, cache: BaseCache = None, db_util: BaseDbUtil = None) -> None:
+        """
+        :param cache: Cache backend. Created from :class:`CacheSetting` by default.
+        :param db_util: Storage to read through. :class:`DbUtil` by default.
+        """
         super().__init__()
-        self.cache = None
+        self.logger = Logger(self.__class__.__name__).logger
+        self.cache: BaseCache = cache if cache else create_cache()
+        self.db_util: BaseDbUtil = db_util if db_util else DbUtil()
+        self.flights = SingleFlight()
+        # bumped whenever cached areas, provinces or ports may be changed,
+        # indexes of them are rebuilt only if it's changed
+        self._hierarchy_version = 0
+        # (hierarchy version, built at) of the port index
+        self._port_indexed: Optional[Tuple[int, float]] = None
+        self._port_index: Optional[Tuple[str, GeoIndex[Port]]] = None
+        self._search_index: SearchIndex[Tuple[str, str]] = SearchIndex()
+        # key of indexed object: version of it
+        self._search_versions: Dict[Tuple[str, str], Any] = {}
+        self._search_docs: Dict[Tuple[str, str], WithInfo] = {}
+        # (hierarchy version, built at) of the search index
+        self._search_indexed: Optional[Tuple[int, float]] = None
+        # (port id, year, month) with new tides since stats were rebuilt
+        self._stale_stats: Set[Tuple[str, int, int]] = set()
+        self.snapshot = Snapshot(
+            CacheSetting.SNAPSHOT_PATH) if CacheSetting.SNAPSHOT_PATH else None
+        self.changelog = ChangeLog(
+            ChangeLogSetting.PATH) if ChangeLogSetting.PATH else None
+        if self.changelog:
+            self.changelog.subscribe()
 
     async def open(self):
-        await super().open()
+        await self.db_util.open()
 
     async def close(self):
-        await super().close()
+        await self.db_util.close()
 
     def cmp_area(self, c1: Area, c2: Area) -> bool:
         return self.__cmp_withinfo(c1, c2)
@@ -55,7 +134,7 @@ class CacheUtil(merge_meta(BaseDbUtil, Singleton)):
         :return: Different attributes.
         """
         cmpn = self.__cmp_base(c1, c2)
-        if cmpn:
+        if cmpn is not None:
             return cmpn
         # optional objectId
         if not Value.is_any_none_or_whitespace(c1.objectId, c2.objectId):
@@ -74,15 +153,13 @@ class CacheUtil(merge_meta(BaseDbUtil, Singleton)):
 
         :return:
             True if both are None or has equals id.
-            False if one of None or difference type.
+            False if one of None.
             None for other situations and continue to compare.
         """
         if o1 is None and o2 is None:
             return True
         if o1 is None or o2 is None:
             return False
-        if type(o1) != type(o2):
-            return False
         if id(o1) == id(o2):
             return True
         return None
@@ -91,84 +168,647 @@ class CacheUtil(merge_meta(BaseDbUtil, Singleton)):
         if o is None:
             raise ValueError(f"{name} cannot be null")
 
+    def _hierarchy_changed(self):
+        """Mark indexes of areas, provinces and ports stale."""
+        self._hierarchy_version += 1
+
+    def _is_fresh(self, indexed: Optional[Tuple[int, float]]) -> bool:
+        """
+        Whether an index built at :param:`indexed` is up to date.
+
+        Lists filled by other processes of a shared cache aren't seen by the hooks,
+        so indexes are also rebuilt once they're older than hierarchy ttl.
+        """
+        if indexed is None or indexed[0] != self._hierarchy_version:
+            return False
+        ttl = CacheSetting.HIERARCHY_TTL
+        return ttl is None or time.monotonic() - indexed[1] < ttl
+
+    def _cache_area(self, area: Area) -> CacheArea:
+        record = CacheArea.to_record(area)
+        self.cache.set(_key('area', area.objectId), record,
+                       CacheSetting.HIERARCHY_TTL)
+        return CacheArea(record)
+
+    def _cache_province(self, province: Province) -> CacheProvince:
+        record = CacheProvince.to_record(province)
+        self.cache.set(_key('province', province.objectId), record,
+                       CacheSetting.HIERARCHY_TTL)
+        return CacheProvince(record)
+
+    def _cache_port(self, port: Port) -> CachePort:
+        record = CachePort.to_record(port)
+        self.cache.set(_key('port', port.objectId), record,
+                       CacheSetting.HIERARCHY_TTL)
+        return CachePort(record)
+
+    def _cache_tide(self, tide: Tide, port_id: str, d: date, predicted: bool = False) -> CacheTide:
+        record = CacheTide.to_record(tide, port_id, predicted)
+        self.cache.set(_key('tide', port_id, d.isoformat()), record,
+                       HarmonicSetting.PREDICTED_TTL if predicted else CacheSetting.TIDE_TTL)
+        return CacheTide(record)
+
     async def add_area(self, area: Area, col: IDT) -> Tuple[ExecState, Union[Optional[Area], Exception]]:
         self.__valid_none(area, 'area')
         if Value.is_any_none_or_whitespace(area.rid, area.name):
             raise ValueError("area rid and name cannot be null or empty")
-        ca = self.cache.get_area(switch_idt(
-            col, lambda: area.objectId, lambda: area.rid))
-        if not self.__cmp_withinfo(ca, area):
-            (ret, inserted) = await DbUtil().add_area(area, col)
-            if ret in EXECSTATE_SUCCESS:
-                self.cache._add_area(inserted)
+        ca = await self.get_area(switch_idt(col, lambda: area.objectId, lambda: area.rid), col)
+        if self.cmp_area(ca, area):
+            return ExecState.EXIST, ca
+        (ret, inserted) = await self.db_util.add_area(area, col)
+        if ret in EXECSTATE_SUCCESS:
+            self.cache.delete(_key('areas'))
+            self._cache_area(inserted)
+            self._hierarchy_changed()
+        return ret, inserted
 
     async def add_province(self, province: Province, col: IDT) -> Tuple[ExecState, Union[Optional[Province], Exception]]:
-        self.__valid_none(province, 'port')
+        self.__valid_none(province, 'province')
         if Value.is_any_none_or_whitespace(province.rid, province.name, province.area, province.area.rid):
             raise ValueError(
                 "province rid, name, area and area.rid cannot be null or empty")
-        pa = self.cache.get_province(switch_idt(
-            col, lambda: province.objectId, lambda: province.rid))
-        if not self.cmp_province(pa, province):
-            (ret, inserted) = await DbUtil().add_province(province, col)
-            if ret in EXECSTATE_SUCCESS:
-                self.cache._add_province(inserted)
+        cp = await self.get_province(switch_idt(col, lambda: province.objectId, lambda: province.rid), col)
+        if self.cmp_province(cp, province):
+            return ExecState.EXIST, cp
+        (ret, inserted) = await self.db_util.add_province(province, col)
+        if ret in EXECSTATE_SUCCESS:
+            cached = self._cache_province(inserted)
+            self.cache.delete(_key('provinces', cached.area.objectId))
+            self._hierarchy_changed()
+        return ret, inserted
 
     async def add_port(self, port: Port, col: IDT) -> Tuple[ExecState, Union[Optional[Port], Exception]]:
         self.__valid_none(port, 'port')
-        if Value.is_any_none_or_whitespace(port.rid, port.name, port.area, port.area.rid):
+        if Value.is_any_none_or_whitespace(port.rid, port.name, port.province, port.province.rid):
             raise ValueError(
-                "port rid, name, area and area.rid cannot be null or empty")
-        pa = self.cache.get_port(switch_idt(
-            col, lambda: port.objectId, lambda: port.rid))
-        if not self.cmp_port(pa, port):
-            (ret, inserted) = await DbUtil().add_port(port, col)
-            if ret in EXECSTATE_SUCCESS:
-                self.cache._add_port(inserted)
+                "port rid, name, province and province.rid cannot be null or empty")
+        cp = await self.get_port(switch_idt(col, lambda: port.objectId, lambda: port.rid), col)
+        if self.cmp_port(cp, port):
+            return ExecState.EXIST, cp
+        (ret, inserted) = await self.db_util.add_port(port, col)
+        if ret in EXECSTATE_SUCCESS:
+            cached = self._cache_port(inserted)
+            self.cache.delete(_key('ports', cached.province.objectId))
+            self._hierarchy_changed()
+        return ret, inserted
 
     async def add_tide(self, tide: Tide, col: IDT) -> Tuple[ExecState, Union[Optional[Tide], Exception]]:
         self.__valid_none(tide, 'tide')
         if Value.is_any_none_or_whitespace(tide.port, tide.port.rid):
             raise ValueError(
                 "tide port and port.rid cannot be null or empty")
-        return await self.db_util.add_tide(tide, col)
+        (ret, inserted) = await self.db_util.add_tide(tide, col)
+        if ret in EXECSTATE_SUCCESS:
+            d = inserted.date.date()
+            self._cache_tide(inserted, inserted.port.objectId, d)
+            self._stale_stats.add((inserted.port.objectId, d.year, d.month))
+        return ret, inserted
 
     async def get_area(self, area_id: str, col: IDT) -> Optional[Area]:
         if Value.is_any_none_or_whitespace(area_id):
             raise ValueError("area_id cannot be null or empty.")
-        return self.cache.get_area(area_id, col)
+        if col != IDT.ID:
+            return await self.db_util.get_area(area_id, col)
+        record = self.cache.get(_key('area', area_id))
+        if record is not None:
+            return CacheArea(record)
+
+        async def load():
+            area = await self.db_util.get_area(area_id, col)
+            return self._cache_area(area) if area else None
+        return await self.flights.do(_key('area', area_id), load)
 
     async def get_province(self, province_id: str, col: IDT) -> Optional[Province]:
         if Value.is_any_none_or_whitespace(province_id):
             raise ValueError("province_id cannot be null or empty.")
-        return self.cache.get_province(province_id, col)
+        if col != IDT.ID:
+            return await self.db_util.get_province(province_id, col)
+        record = self.cache.get(_key('province', province_id))
+        if record is not None:
+            return CacheProvince(record)
+
+        async def load():
+            province = await self.db_util.get_province(province_id, col)
+            return self._cache_province(province) if province else None
+        return await self.flights.do(_key('province', province_id), load)
 
     async def get_port(self, port_id: str, col: IDT) -> Optional[Port]:
         if Value.is_any_none_or_whitespace(port_id):
             raise ValueError("port_id cannot be null or empty.")
-        return self.cache.get_port(port_id, col)
+        if col != IDT.ID:
+            return await self.db_util.get_port(port_id, col)
+        record = self.cache.get(_key('port', port_id))
+        if record is not None:
+            return CachePort(record)
+
+        async def load():
+            port = await self.db_util.get_port(port_id, col)
+            return self._cache_port(port) if port else None
+        return await self.flights.do(_key('port', port_id), load)
+
+    def get_cached_tide(self, port_id: str, d: date) -> Optional[Tide]:
+        """Get :class:`Tide` from cache only."""
+        record = self.cache.get(_key('tide', port_id, d.isoformat()))
+        return CacheTide(record) if record is not None else None
+
+    async def get_stored_tide(self, port_id: str, d: date) -> Optional[Tide]:
+        """Get :class:`Tide` from cache or storage, without crawling it if not found."""
+        tide = self.get_cached_tide(port_id, d)
+        if tide is not None:
+            return tide
+        tide = await self.db_util.get_tide(port_id, d)
+        return self._cache_tide(tide, port_id, d) if tide is not None else None
 
-    @alru_cache(maxsize=1024, typed=True)
     async def get_tide(self, port_id: str, d: date) -> Optional[Tide]:
+        """
+        Get :class:`Tide` from cache, storage or crawler in order.
+
+        Crawled tide will be saved to storage.
+        """
         if Value.is_any_none_or_whitespace(port_id):
             raise ValueError("port_id cannot be null or empty.")
-        if d == None or d < date(2000, 0, 0):
+        if d == None or d < date(2000, 1, 1):
             d = date.today()
-        tide = await DbUtil().get_tide(port_id, d)
-        if tide is not None:
-            return tide
-        port = await DbUtil().get_port(port_id, IDT.ID)
-        return await CrawlerService().crawl_tide(d, port.rid)
+        key = _key('tide', port_id, d.isoformat())
+        record = self.cache.get(key)
+        if record is not None:
+            return CacheTide(record)
+
+        async def load():
+            tide = await self.db_util.get_tide(port_id, d)
+            if tide is None:
+                return await self.__crawl_tide(port_id, d)
+            return self._cache_tide(tide, port_id, d)
+        return await self.flights.do(key, load)
+
+    async def __crawl_tide(self, port_id: str, d: date) -> Optional[Tide]:
+        """Crawl, save and cache tide of a port which is not found in storage."""
+        return await self.flights.do(_key('crawl', port_id, d.isoformat()),
+                                     lambda: self.__do_crawl_tide(port_id, d))
+
+    async def __do_crawl_tide(self, port_id: str, d: date) -> Optional[Tide]:
+        port = await self.get_port(port_id, IDT.ID)
+        if port is None:
+            return None
+        timeout = HarmonicSetting.CRAWL_TIMEOUT if HarmonicSetting.FALLBACK else None
+        try:
+            tide = await asyncio.wait_for(CrawlerService().crawl_tide(d, port.rid), timeout)
+        except Exception as ex:
+            predicted = await self.__predict_fallback(port_id, d, ex)
+            if predicted is None:
+                raise
+            return predicted
+        if tide is None:
+            return await self.__predict_fallback(port_id, d)
+        (ret, inserted) = await self.db_util.add_tide(tide, IDT.RID)
+        if ret in EXECSTATE_SUCCESS:
+            tide = inserted
+            self._stale_stats.add((port_id, d.year, d.month))
+        return self._cache_tide(tide, port_id, d)
+
+    async def __predict_fallback(self, port_id: str, d: date, ex: Exception = None) -> Optional[Tide]:
+        """Predict tide which failed to crawl if :attr:`HarmonicSetting.FALLBACK`."""
+        if not HarmonicSetting.FALLBACK:
+            return None
+        self.logger.warning(f'crawl tide {port_id} {d} failed, predict it. {ex or ""}')
+        try:
+            return await self.predict_tide(port_id, d)
+        except Exception as pex:
+            self.logger.error(f'predict tide {port_id} {d} failed. {pex}',
+                              exc_info=True, stack_info=True)
+            return None
+
+    async def get_harmonic_model(self, port_id: str) -> Optional[HarmonicModel]:
+        """
+        Get the harmonic model of a port, fitted from its stored tides
+        of recent :attr:`HarmonicSetting.FIT_DAYS` days.
+
+        :return: None if stored tides are too few.
+        """
+        key = _key('harmonic', port_id)
+        record = self.cache.get(key)
+        if record is not None:
+            # empty record if stored tides are too few
+            return HarmonicModel.from_dict(record) if record else None
+
+        async def load():
+            end = date.today()
+            tides = await self.db_util.get_tides_range(
+                port_id, end - timedelta(HarmonicSetting.FIT_DAYS - 1), end)
+            model = None
+            if len(tides) >= HarmonicSetting.MIN_DAYS:
+                try:
+                    model = fit_tides(tides, HarmonicSetting.VALIDATE_DAYS)
+                except ValueError as ex:
+                    self.logger.warning(f'fit tides of {port_id} failed. {ex}')
+            self.cache.set(key, model.to_dict() if model else {}, HarmonicSetting.MODEL_TTL)
+            return model
+        return await self.flights.do(key, load)
+
+    async def predict_tide(self, port_id: str, d: date) -> Optional[Tide]:
+        """
+        Predict :class:`Tide` of a port by its harmonic model instead of crawling.
+
+        Predicted tide is cached for :attr:`HarmonicSetting.PREDICTED_TTL` seconds,
+        and is not saved to storage.
+
+        :return: None if the port has no model or its model is not accurate enough.
+        """
+        model = await self.get_harmonic_model(port_id)
+        if model is None:
+            return None
+        error = model.quality.rmse if model.quality else model.rmse
+        if not error <= HarmonicSetting.MAX_RMSE:
+            self.logger.warning(f'harmonic model of {port_id} is not accurate, rmse {error}')
+            return None
+        tide = CTide()
+        tide.date = datetime(d.year, d.month, d.day)
+        tide.day, tide.limit = model.tide_items(d)
+        tide.datum = model.datum
+        return self._cache_tide(tide, port_id, d, predicted=True)
+
+    async def get_tides(self, port_ids: List[str], d: date, concurrency: int = None) -> Dict[str, Tide]:
+        """
+        Get :class:`Tide`s of many ports like :method:`get_tide`.
+
+        Cached ones are got at once, then the rest are queried from storage at once,
+        and only the missing ones are crawled concurrently.
+
+        :param concurrency: Max count of tides to crawl at the same time.
+            :attr:`CacheSetting.CRAWL_CONCURRENCY` by default.
+        :return: Found tides by port id. Ports without tide are omitted.
+        """
+        if d == None or d < date(2000, 1, 1):
+            d = date.today()
+        port_ids = list(dict.fromkeys(
+            p for p in port_ids if not Value.is_any_none_or_whitespace(p)))
+        keys = {p: _key('tide', p, d.isoformat()) for p in port_ids}
+        records = self.cache.get_many(list(keys.values()))
+        tides: Dict[str, Tide] = {p: CacheTide(records[k])
+                                  for p, k in keys.items() if k in records}
+        missing = [p for p in port_ids if p not in tides]
+        if missing:
+            stored = await self.db_util.get_tides(missing, d)
+            for p, t in stored.items():
+                tides[p] = self._cache_tide(t, p, d)
+            missing = [p for p in missing if p not in tides]
+        if missing:
+            crawled = await gather_bounded([self.__crawl_tide(p, d) for p in missing],
+                                           concurrency or CacheSetting.CRAWL_CONCURRENCY,
+                                           return_exceptions=True)
+            for p, t in zip(missing, crawled):
+                if isinstance(t, Tide):
+                    tides[p] = t
+        return {p: tides[p] for p in port_ids if p in tides}
+
+    async def get_tides_range(self, port_id: str, start: date, end: date) -> List[Tide]:
+        """Get :class:`Tide`s of a port between two dates in order of date. See also :method:`iter_tides`."""
+        tides = [t async for t in self.iter_tides(port_id, start, end)]
+        return sorted(tides, key=lambda t: t.date)
+
+    def scan_tides(self, start: date, end: date, province_id: str = None) -> AsyncIterator[List[Tide]]:
+        """Scan storage directly, scanned tides are not cached."""
+        return self.db_util.scan_tides(start, end, province_id)
+
+    async def iter_tides(self, port_id: str, start: date, end: date, concurrency: int = None) -> AsyncIterator[Tide]:
+        """
+        Get :class:`Tide`s of a port between two dates like :method:`get_tide`.
+
+        Cached and stored tides are yielded first in order of date,
+        then the missing ones are crawled concurrently and yielded once crawled.
+
+        :param start: First date, inclusive.
+        :param end: Last date, inclusive.
+        :param concurrency: Max count of tides to crawl at the same time.
+            :attr:`CacheSetting.CRAWL_CONCURRENCY` by default.
+        :return: Found tides. Dates without tide are omitted.
+        """
+        if Value.is_any_none_or_whitespace(port_id):
+            raise ValueError("port_id cannot be null or empty.")
+        days = [start + timedelta(i) for i in range((end - start).days + 1)]
+        keys = {d: _key('tide', port_id, d.isoformat()) for d in days}
+        records = self.cache.get_many(list(keys.values()))
+        tides: Dict[date, Tide] = {d: CacheTide(records[k])
+                                   for d, k in keys.items() if k in records}
+        missing = [d for d in days if d not in tides]
+        if missing:
+            for t in await self.db_util.get_tides_range(port_id, missing[0], missing[-1]):
+                d = t.date.date()
+                if d not in tides:
+                    tides[d] = self._cache_tide(t, port_id, d)
+            missing = [d for d in missing if d not in tides]
+        for d in days:
+            if d in tides:
+                yield tides[d]
+        if not missing:
+            return
+        async for t in as_completed_bounded([self.__crawl_tide(port_id, d) for d in missing],
+                                            concurrency or CacheSetting.CRAWL_CONCURRENCY,
+                                            return_exceptions=True):
+            if isinstance(t, Tide):
+                yield t
+
+    async def find_tides(self, d: date, min_range: float = None, max_range: float = None,
+                         min_high: float = None, max_low: float = None,
+                         province_id: str = None, limit: int = None) -> List[Tide]:
+        """Query storage directly, since results depend on filters. Found tides are cached as :method:`get_tide`."""
+        found = await self.db_util.find_tides(d, min_range, max_range, min_high, max_low, province_id, limit)
+        return [self._cache_tide(t, t.port.objectId, d) for t in found if t.port is not None]
+
+    async def save_derived(self, tides: List[Tide]) -> Tuple[ExecState, Union[int, Exception]]:
+        """Cached tides don't keep derived fields, so nothing is evicted."""
+        return await self.db_util.save_derived(tides)
+
+    async def add_stats(self, port_id: str, year: int, month: int, days: List[DayStatsDict]) -> Tuple[ExecState, Union[Optional[TideStats], Exception]]:
+        (ret, inserted) = await self.db_util.add_stats(port_id, year, month, days)
+        if ret in EXECSTATE_SUCCESS:
+            self.cache.set(_stats_key(port_id, year, month),
+                           CacheTideStats.to_record(inserted), CacheSetting.TIDE_TTL)
+        return ret, inserted
+
+    async def get_stats(self, port_id: str, year: int, month: int) -> Optional[TideStats]:
+        """Stats not found are not cached, they may be rebuilt by :method:`rebuild_stats` soon."""
+        if Value.is_any_none_or_whitespace(port_id):
+            raise ValueError("port_id cannot be null or empty.")
+        key = _stats_key(port_id, year, month)
+        record = self.cache.get(key)
+        if record is not None:
+            return CacheTideStats(record)
+
+        async def load():
+            stats = await self.db_util.get_stats(port_id, year, month)
+            if stats is None:
+                return None
+            record = CacheTideStats.to_record(stats)
+            self.cache.set(key, record, CacheSetting.TIDE_TTL)
+            return CacheTideStats(record)
+        return await self.flights.do(key, load)
 
     async def get_areas(self) -> List[Area]:
-        return self.cache.get_areas()
+        records = self.cache.get(_key('areas'))
+        if records is None:
+            records = await self.flights.do(_key('areas'), lambda: self.__load_list(
+                _key('areas'), self.db_util.get_areas(), CacheArea.to_record))
+        return [CacheArea(r) for r in records]
 
     async def get_provinces(self, area_id: str, col: IDT = None) -> List[Province]:
         if Value.is_any_none_or_whitespace(area_id):
             raise ValueError("area_id cannot be null or empty")
-        return self.cache.get_provinces(area_id, col)
+        if col != IDT.ID:
+            return await self.db_util.get_provinces(area_id, col)
+        key = _key('provinces', area_id)
+        records = self.cache.get(key)
+        if records is None:
+            records = await self.flights.do(key, lambda: self.__load_list(
+                key, self.db_util.get_provinces(area_id, col), CacheProvince.to_record))
+        return [CacheProvince(r) for r in records]
 
     async def get_ports(self, province_id: str, col: IDT = None) -> List[Port]:
         if Value.is_any_none_or_whitespace(province_id):
             raise ValueError("province_id cannot be null or empty")
-        return self.cache.get_ports(province_id, col)
+        if col != IDT.ID:
+            return await self.db_util.get_ports(province_id, col)
+        key = _key('ports', province_id)
+        records = self.cache.get(key)
+        if records is None:
+            records = await self.flights.do(key, lambda: self.__load_list(
+                key, self.db_util.get_ports(province_id, col), CachePort.to_record))
+        return [CachePort(r) for r in records]
+
+    async def __load_list(self, key: str, query: Awaitable[List[WithInfo]], to_record: Callable[[WithInfo], dict]) -> List[dict]:
+        """Query a list from storage and cache its records."""
+        records = [to_record(o) for o in await query]
+        self.cache.set(key, records, CacheSetting.HIERARCHY_TTL)
+        self._hierarchy_changed()
+        return records
+
+    async def get_hierarchy(self) -> Tuple[List[Area], List[Province], List[Port]]:
+        """Get all areas, provinces of all areas and ports of all provinces."""
+        areas = await self.get_areas()
+        provinces: List[Province] = []
+        for a in areas:
+            provinces.extend(await self.get_provinces(a.objectId, IDT.ID))
+        ports: List[Port] = []
+        for p in provinces:
+            ports.extend(await self.get_ports(p.objectId, IDT.ID))
+        return areas, provinces, ports
+
+    async def get_all_ports(self) -> List[Port]:
+        """Get ports of all provinces of all areas."""
+        return (await self.get_hierarchy())[2]
+
+    async def get_search_index(self) -> Tuple[SearchIndex[Tuple[str, str]], Dict[Tuple[str, str], WithInfo]]:
+        """
+        Get search index of names and aliases of all areas, provinces and ports.
+        It's updated only after cached areas, provinces or ports are changed,
+        and only changed ones are re-indexed.
+
+        :return: (index, indexed objects). Keys are (`area`/`province`/`port`, objectId).
+        """
+        if self._is_fresh(self._search_indexed):
+            return self._search_index, self._search_docs
+        indexed = (self._hierarchy_version, time.monotonic())
+        areas, provinces, ports = await self.get_hierarchy()
+        docs: Dict[Tuple[str, str], WithInfo] = {}
+        for kind, os in (('area', areas), ('province', provinces), ('port', ports)):
+            docs.update({(kind, o.objectId): o for o in os})
+        for k in self._search_versions.keys() - docs.keys():
+            self._search_index.remove(k)
+            del self._search_versions[k]
+        for k, o in docs.items():
+            version = (o.updatedAt, o.name)
+            if self._search_versions.get(k) != version:
+                self._search_index.add(k, [o.name, *aliases_of(o)])
+                self._search_versions[k] = version
+        self._search_docs, self._search_indexed = docs, indexed
+        return self._search_index, docs
+
+    async def get_port_index(self) -> Tuple[str, GeoIndex[Port]]:
+        """
+        Get spatial index of all ports with geopoint.
+        It's rebuilt only after cached areas, provinces or ports are changed.
+
+        :return: (version of ports, index)
+        """
+        if self._port_index is not None and self._is_fresh(self._port_indexed):
+            return self._port_index
+        indexed = (self._hierarchy_version, time.monotonic())
+        ports = await self.get_all_ports()
+        version = hashlib.sha1(json.dumps(
+            _versions([CachePort.to_record(p) for p in ports])).encode()).hexdigest()
+        if self._port_index is None or self._port_index[0] != version:
+            located = [p for p in ports if p.geopoint]
+            self._port_index = (version, GeoIndex(located, [p.geopoint for p in located]))
+        self._port_indexed = indexed
+        return self._port_index
+
+    def save_snapshot(self) -> int:
+        """
+        Save areas, provinces, ports and recent tides to snapshot.
+
+        Only the writer of cache saves snapshot.
+
+        :return: Count of saved items.
+        """
+        if self.snapshot is None or not self.cache.is_writer():
+            return 0
+        since = (date.today() - timedelta(CacheSetting.SNAPSHOT_TIDE_DAYS)).isoformat()
+        items: Dict[str, Tuple[Any, Optional[float]]] = {}
+        for k in self.cache.keys():
+            parts = k.split(':')
+            if parts[0] in _HIERARCHY_KEYS or (parts[0] == 'tide' and parts[-1] >= since):
+                v = self.cache.get(k)
+                # predicted tides expire soon, don't restore them as crawled
+                if v is not None and not (parts[0] == 'tide' and v.get(CacheTide.PREDICTED)):
+                    items[k] = (v, self.cache.expire_of(k))
+        self.snapshot.save(items)
+        return len(items)
+
+    def load_snapshot(self) -> int:
+        """
+        Restore cache from snapshot. Items are kept for the rest of their ttl when saved,
+        expired ones are skipped. Loaded items may be stale,
+        use :method:`refresh_hierarchy` to validate them.
+
+        Only the writer of cache loads snapshot.
+
+        :return: Count of loaded items.
+        """
+        if self.snapshot is None or not self.cache.is_writer():
+            return 0
+        now = time.time()
+        groups: Dict[Optional[float], Dict[str, Any]] = {}
+        for k, (v, expire) in self.snapshot.load().items():
+            # whole seconds, so that items saved at about the same time are set at once
+            ttl = None if expire is None else math.floor(expire - now)
+            if ttl is None or ttl > 0:
+                groups.setdefault(ttl, {})[k] = v
+        for ttl, group in groups.items():
+            self.cache.set_many(group, ttl)
+        self._hierarchy_changed()
+        return sum(len(g) for g in groups.values())
+
+    async def refresh_hierarchy(self) -> int:
+        """
+        Compare cached areas, provinces and ports with storage by updatedAt,
+        and update stale ones.
+
+        :return: Count of updated lists.
+        """
+        updated: Dict[str, list] = {}
+
+        async def refresh(key: str, query, to_record):
+            cached = self.cache.get(key)
+            if cached is None:
+                return
+            records = [to_record(o) for o in await query()]
+            if _versions(records) != _versions(cached):
+                updated[key] = records
+
+        await refresh(_key('areas'), self.db_util.get_areas, CacheArea.to_record)
+        for k in self.cache.keys():
+            parts = k.split(':')
+            if parts[0] == 'provinces':
+                await refresh(k, lambda: self.db_util.get_provinces(parts[1], IDT.ID), CacheProvince.to_record)
+            elif parts[0] == 'ports':
+                await refresh(k, lambda: self.db_util.get_ports(parts[1], IDT.ID), CachePort.to_record)
+        singles: Dict[str, dict] = {}
+        for key, records in updated.items():
+            kind = {'areas': 'area', 'provinces': 'province', 'ports': 'port'}[key.split(':')[0]]
+            singles.update({_key(kind, r.get(CacheArea.OBJECT_ID)): r for r in records})
+        if updated:
+            self.cache.set_many({**updated, **singles}, CacheSetting.HIERARCHY_TTL)
+            self._hierarchy_changed()
+        return len(updated)
+
+    def _keys_of(self, change: ChangeDict) -> List[str]:
+        """Get cached keys affected by :param:`change`."""
+        entity, oid, parent = change['entity'], change['id'], change.get('parent')
+        if entity == 'area':
+            return [_key('area', oid), _key('areas')]
+        if entity == 'province':
+            return [_key('province', oid), _key('provinces', parent)]
+        if entity == 'port':
+            return [_key('port', oid), _key('ports', parent)]
+        if entity == 'tide':
+            return [_key('tide', parent, change.get('date'))]
+        if entity == 'stats':
+            return [_key('stats', parent, change.get('date'))]
+        return []
+
+    def apply_changes(self) -> int:
+        """
+        Evict cached items changed by other processes from change log.
+        Changes of this process are skipped, since they're already cached when written.
+
+        Only the writer of cache evicts items from the shared file if the cache is shared,
+        other processes evict items kept in their own memory.
+
+        :return: Count of applied changes.
+        """
+        if self.changelog is None:
+            return 0
+        changes = [c for c in self.changelog.read() if not self.changelog.is_own(c)]
+        if not changes:
+            return 0
+        keys = set()
+        for c in changes:
+            keys.update(self._keys_of(c))
+            if c['entity'] == 'tide' and c.get('parent') and c.get('date'):
+                d = date.fromisoformat(c['date'])
+                self._stale_stats.add((c['parent'], d.year, d.month))
+        if self.cache.is_writer():
+            self.cache.delete(*keys)
+        else:
+            self.cache.delete_local(*keys)
+        if any(k.split(':')[0] in _HIERARCHY_KEYS for k in keys):
+            self._hierarchy_changed()
+        return len(changes)
+
+    async def rebuild_stats(self) -> int:
+        """
+        Rebuild monthly stats of ports which have new tides, written by this process
+        or read from change log, from all stored tides of those months.
+
+        Stats are rebuilt rather than merged, so that writers never drop days of each other.
+        Only the writer of cache rebuilds them if other processes publish to change log,
+        others leave their months to it.
+
+        :return: Count of written monthly stats.
+        """
+        stale, self._stale_stats = self._stale_stats, set()
+        if not stale or (self.changelog is not None and not self.cache.is_writer()):
+            return 0
+        written = 0
+        for port_id, year, month in sorted(stale):
+            try:
+                tides = await self.db_util.get_tides_range(
+                    port_id, date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1]))
+                days = merge_days([], *(day_stats(t) for t in tides))
+                if not days:
+                    continue
+                (ret, _) = await self.add_stats(port_id, year, month, days)
+            except Exception as ex:
+                self.logger.error(f'rebuild stats {port_id}({year}-{month:02d}) failed. {ex}',
+                                  exc_info=True, stack_info=True)
+                ret = ExecState.FAIL
+            if ret in EXECSTATE_SUCCESS:
+                written += 1
+            else:
+                # retry in next rebuild
+                self._stale_stats.add((port_id, year, month))
+        return written
+
+    async def prewarm(self, port_ids: List[str], days: int, concurrency: int) -> int:
+        """
+        Cache tides of :param:`port_ids` from today to next :param:`days` days.
+        Missing tides will be crawled.
+
+        :param concurrency: Max count of tides to get at the same time.
+        :return: Count of found tides.
+        """
+        today = date.today()
+        tides = await gather_bounded([self.get_tide(p, today + timedelta(i))
+                                      for p in port_ids for i in range(days)],
+                                     concurrency, return_exceptions=True)
+        return len([t for t in tides if isinstance(t, Tide)])
@@ -0,0 +1,43 @@
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from cache.basecache import BaseCache
+
+
+class MemoryCache(BaseCache):
+    """Cache in current process."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        # key: (expire timestamp or None, value)
+        self._data: Dict[str, Tuple[Optional[float], Any]] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expire, value = item
+        if expire is not None and expire < time.time():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    def expire_of(self, key: str) -> Optional[float]:
+        item = self._data.get(key)
+        return item[0] if item is not None else None
+
+    def keys(self) -> List[str]:
+        now = time.time()
+        return [k for k, (expire, _) in self._data.items() if expire is None or expire >= now]
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None):
+        expire = time.time() + ttl if ttl is not None else None
+        for k, v in items.items():
+            self._data[k] = (expire, v)
+
+    def delete(self, *keys: str):
+        for k in keys:
+            self._data.pop(k, None)
+
+    def clear(self):
+        self._data.clear()
@@ -0,0 +1,64 @@
+import heapq
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import CacheSetting
+from utils.singleton import Singleton
+
+
+class Popularity:
+    """
+    Access frequency counters which decay exponentially over time.
+
+    Use forward decay: a hit at time `t` weighs `2 ** ((t - landmark) / half_life)`,
+    so that counters never need to be decayed one by one.
+    """
+    # rescale counters if weights are larger than 2 ** this
+    __MAX_EXPONENT = 64
+
+    def __init__(self, half_life: float = 24 * 3600, capacity: int = 10000) -> None:
+        """
+        :param half_life: Seconds, the score of a key halves after this.
+        :param capacity: Max count of tracked keys. Least popular ones will be dropped.
+        """
+        self.half_life = half_life
+        self.capacity = capacity
+        self._landmark = time.time()
+        self._scores: Dict[str, float] = {}
+
+    def __weight(self, now: float) -> float:
+        exponent = (now - self._landmark) / self.half_life
+        if exponent > Popularity.__MAX_EXPONENT:
+            scale = math.pow(2, -exponent)
+            self._scores = {k: v * scale for k, v in self._scores.items()}
+            self._landmark = now
+            exponent = 0
+        return math.pow(2, exponent)
+
+    def hit(self, key: str, now: Optional[float] = None):
+        """Count an access of :param:`key`."""
+        now = time.time() if now is None else now
+        self._scores[key] = self._scores.get(key, 0) + self.__weight(now)
+        if len(self._scores) > 2 * self.capacity:
+            self._scores = dict(heapq.nlargest(
+                self.capacity, self._scores.items(), key=lambda i: i[1]))
+
+    def top(self, k: int, now: Optional[float] = None) -> List[Tuple[str, float]]:
+        """
+        Get the :param:`k` most popular keys.
+
+        :return: (key, decayed score) in descending order of score.
+        """
+        now = time.time() if now is None else now
+        scale = math.pow(2, -(now - self._landmark) / self.half_life)
+        return [(key, score * scale) for key, score in
+                heapq.nlargest(k, self._scores.items(), key=lambda i: i[1])]
+
+
+class TidePopularity(Popularity, Singleton):
+    """Popularity of ports requested by tide endpoint."""
+
+    def __init__(self) -> None:
+        super().__init__(CacheSetting.POPULARITY_HALF_LIFE,
+                         CacheSetting.POPULARITY_CAPACITY)
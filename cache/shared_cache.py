@@ -0,0 +1,424 @@
+import asyncio
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import IO, Any, Dict, List, Optional, Set, Tuple
+
+from utils.logger import Logger
+
+from cache.basecache import BaseCache
+from cache.memory_cache import MemoryCache
+
+try:
+    import fcntl
+except ImportError:  # windows, no file lock
+    fcntl = None
+
+_MAGIC = b'TCC1'
+_HEADER = struct.Struct('<4sI')
+# key: [offset from values, length, expire timestamp or None]
+_Index = Dict[str, Tuple[int, int, Optional[float]]]
+# rotate the spool if it's larger than this
+_SPOOL_MAX_SIZE = 4 * 1024 * 1024
+
+
+def _load(path: str) -> Optional[Tuple[mmap.mmap, _Index, int]]:
+    """
+    Map the shared file.
+
+    :return: (mapped file, index, offset of values), or None if not exists or not a shared cache file.
+    """
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < _HEADER.size:
+                return None
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+    magic, length = _HEADER.unpack_from(mm)
+    if magic != _MAGIC:
+        mm.close()
+        return None
+    base = _HEADER.size + length
+    return mm, json.loads(mm[_HEADER.size:base]), base
+
+
+class SharedCache(BaseCache):
+    """
+    Cache in a memory-mapped file shared by all processes on the host.
+
+    File layout: header(magic, length of index), index(json), values(json).
+    Readers map the file and only decode the requested value.
+
+    One process is elected as the writer, see :method:`is_writer`. Only the writer fills
+    the shared file. Other processes append their items to a spool file, one json line
+    by one `write` with `O_APPEND`, and the writer moves them to the shared file on its
+    next check. Until then they keep the items in their own memory, and drop them once
+    the shared file has them.
+    Deletes of any process are written to the shared file at once, they are rare and must be
+    seen by all. Deletes of other processes are spooled as well, so that the writer never
+    applies an item spooled before the delete after it.
+    Writes are batched and the file is rebuilt in a thread of the running event loop,
+    so that requests never wait for file I/O. Written items are read from memory until
+    the new file replaces the old one, so that readers never see a partial write.
+    The rebuilds of processes are serialized by a file lock.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0) -> None:
+        """
+        :param path: Path of the shared file. It will be created if not exists.
+        :param check_interval: Seconds between two checks whether the file was replaced,
+            and between two tries to be elected as the writer.
+        """
+        super().__init__()
+        self.logger = Logger(self.__class__.__name__).logger
+        self.path = path
+        self.check_interval = check_interval
+        self._mm: Optional[mmap.mmap] = None
+        self._index: _Index = {}
+        # offset of values
+        self._base = 0
+        self._stamp = None
+        self._checked = 0.0
+        self._writer_fd: Optional[int] = None
+        self._writer_checked: Optional[float] = None
+        # json values spooled by this process which are not in the shared file yet
+        self._local = MemoryCache()
+        self._spool_path = f'{path}.spool'
+        # spool read by the writer, and incomplete line from last read
+        self._spool: Optional[IO[bytes]] = None
+        self._spool_pending = b''
+        # key: (json value, expire) to write, and keys to delete in next rebuild
+        self._sets: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._deletes: Set[str] = set()
+        # being written by current rebuild
+        self._flushing_sets: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._flushing_deletes: Set[str] = set()
+        self._flushing: Optional[asyncio.Future] = None
+
+    def __del__(self):
+        self._unmap()
+        if self._writer_fd is not None:
+            os.close(self._writer_fd)
+        if self._spool is not None:
+            self._spool.close()
+
+    def _unmap(self):
+        if self._mm is not None:
+            self._mm.close()
+        self._mm = None
+        self._index = {}
+
+    def _refresh(self, force: bool = False):
+        """Remap the file if it was replaced since last check."""
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_interval:
+            return
+        self._checked = now
+        if self._writer_fd is not None:
+            self._drain()
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._unmap()
+            self._stamp = None
+            return
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp:
+            return
+        self._unmap()
+        self._stamp = stamp
+        loaded = _load(self.path)
+        if loaded is None:
+            if st.st_size >= _HEADER.size:
+                self.logger.error(f'{self.path} is not a shared cache file.')
+            return
+        self._mm, self._index, self._base = loaded
+        # spooled items are read from the shared file once the writer has written them
+        for k in self._local.keys():
+            mapped = self._mapped(k)
+            if mapped is not None and mapped[0] == self._local.get(k):
+                self._local.delete(k)
+
+    def _mapped(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        """Get (json value, expire) of :param:`key` in the shared file."""
+        found = self._index.get(key)
+        if found is None:
+            return None
+        offset, length, expire = found
+        offset += self._base
+        return self._mm[offset:offset + length], expire
+
+    def _append_spool(self, items: List[Dict[str, Any]]):
+        """Append items for the writer. Errors are logged but not raised, it's only a cache."""
+        data = b''.join(json.dumps(item, separators=(',', ':')).encode() + b'\n' for item in items)
+        try:
+            fd = os.open(self._spool_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+            try:
+                os.write(fd, data)
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            if size > _SPOOL_MAX_SIZE:
+                # the writer still holds the old file and will read the rest of it
+                os.replace(self._spool_path, f'{self._spool_path}.1')
+        except OSError as ex:
+            self.logger.error(f'spool {len(items)} items to {self._spool_path} failed. {ex}')
+
+    def _open_spool(self, at_end: bool) -> bool:
+        try:
+            # created if not exists, so that items spooled from now on are never missed by rotation
+            self._spool = os.fdopen(os.open(self._spool_path, os.O_RDONLY | os.O_CREAT, 0o644), 'rb')
+        except OSError as ex:
+            self.logger.error(f'open {self._spool_path} failed. {ex}')
+            self._spool = None
+            return False
+        if at_end:
+            self._spool.seek(0, os.SEEK_END)
+        self._spool_pending = b''
+        return True
+
+    def _spool_rotated(self) -> bool:
+        try:
+            return os.stat(self._spool_path).st_ino != os.fstat(self._spool.fileno()).st_ino
+        except FileNotFoundError:
+            return False
+
+    def _drain(self):
+        """Move items spooled by other processes since last drain to pending writes of the writer."""
+        if self._spool is None and not self._open_spool(at_end=False):
+            return
+        data = self._spool_pending + self._spool.read()
+        if self._spool_rotated():
+            data += self._spool.read()
+            self._spool.close()
+            self._open_spool(at_end=False)
+            data += self._spool.read() if self._spool else b''
+        lines = data.split(b'\n')
+        self._spool_pending = lines.pop()
+        if not lines:
+            return
+        for line in lines:
+            try:
+                item = json.loads(line)
+                key = item['k']
+            except (ValueError, KeyError, TypeError):
+                self.logger.warning(f'ignore malformed spooled item {line}')
+                continue
+            if 'v' not in item:
+                self._sets.pop(key, None)
+                self._deletes.add(key)
+            elif not self._expired(item.get('e')):
+                self._sets[key] = (item['v'].encode(), item.get('e'))
+                self._deletes.discard(key)
+        self._schedule_flush()
+
+    @staticmethod
+    def _expired(expire: Optional[float]) -> bool:
+        return expire is not None and expire < time.time()
+
+    def _raw(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        """Get (json value, expire) of :param:`key` in memory or the shared file."""
+        item = self._sets.get(key)
+        if item is None and key not in self._deletes:
+            item = self._flushing_sets.get(key)
+            if item is None and key not in self._flushing_deletes:
+                value = self._local.get(key)
+                if value is not None:
+                    return value, self._local.expire_of(key)
+                item = self._mapped(key)
+        if item is None or self._expired(item[1]):
+            return None
+        return item
+
+    def get(self, key: str) -> Optional[Any]:
+        self._refresh()
+        item = self._raw(key)
+        return json.loads(item[0]) if item is not None else None
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        self._refresh()
+        found = {}
+        for k in keys:
+            item = self._raw(k)
+            if item is not None:
+                found[k] = json.loads(item[0])
+        return found
+
+    def expire_of(self, key: str) -> Optional[float]:
+        self._refresh()
+        item = self._raw(key)
+        return item[1] if item is not None else None
+
+    def keys(self) -> List[str]:
+        self._refresh()
+        candidates = {*self._index, *self._local.keys(), *self._flushing_sets, *self._sets}
+        return [k for k in candidates if self._raw(k) is not None]
+
+    @contextmanager
+    def _lock(self):
+        """Exclusive lock for writing."""
+        with open(f'{self.path}.lock', 'a') as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _write(self, sets: Dict[str, Tuple[bytes, Optional[float]]], deletes=(), keep: bool = True):
+        """
+        Rebuild the shared file. It doesn't touch the current mapping, so it's safe to call in a thread.
+
+        :param sets: Key-(json value, expire) pairs to write.
+        :param deletes: Keys to remove.
+        :param keep: Keep current items or not.
+        """
+        with self._lock():
+            items: Dict[str, Tuple[bytes, Optional[float]]] = {}
+            loaded = _load(self.path) if keep else None
+            if loaded is not None:
+                mm, index, base = loaded
+                try:
+                    for k, (offset, length, expire) in index.items():
+                        if not self._expired(expire):
+                            items[k] = (mm[base + offset:base + offset + length], expire)
+                finally:
+                    mm.close()
+            for k in deletes:
+                items.pop(k, None)
+            items.update(sets)
+            index: _Index = {}
+            offset = 0
+            for k, (raw, expire) in items.items():
+                index[k] = (offset, len(raw), expire)
+                offset += len(raw)
+            bindex = json.dumps(index, separators=(',', ':')).encode()
+            tmp = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, len(bindex)))
+                f.write(bindex)
+                for raw, _ in items.values():
+                    f.write(raw)
+            os.replace(tmp, self.path)
+
+    def _flush_started(self) -> Tuple[Dict[str, Tuple[bytes, Optional[float]]], Set[str]]:
+        """Move pending writes to flushing ones."""
+        self._flushing_sets, self._sets = self._sets, {}
+        self._flushing_deletes, self._deletes = self._deletes, set()
+        return self._flushing_sets, self._flushing_deletes
+
+    def _flush_done(self, _=None):
+        self._flushing = None
+        self._flushing_sets, self._flushing_deletes = {}, set()
+        self._refresh(force=True)
+        if self._sets or self._deletes:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        """Rebuild the file in a thread of the running event loop, or right now if there is no loop."""
+        if self._flushing is not None:
+            # pending writes will be flushed once current rebuild is done
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            sets, deletes = self._flush_started()
+            try:
+                self._write(sets, deletes)
+            finally:
+                self._flush_done()
+            return
+        sets, deletes = self._flush_started()
+        self._flushing = loop.run_in_executor(None, self._write, sets, deletes)
+        self._flushing.add_done_callback(self._flush_failed)
+        self._flushing.add_done_callback(self._flush_done)
+
+    def _flush_failed(self, future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            self.logger.error(f'write {self.path} failed. {future.exception()}')
+
+    async def flush(self):
+        """Wait until pending writes are written, including items spooled by other processes if this is the writer."""
+        if self._writer_fd is not None:
+            self._drain()
+        while self._flushing is not None or self._sets or self._deletes:
+            if self._flushing is None:
+                self._schedule_flush()
+                continue
+            try:
+                await self._flushing
+            except Exception:
+                # logged by :method:`_flush_failed`
+                pass
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None):
+        raws = {k: json.dumps(v, separators=(',', ':')).encode() for k, v in items.items()}
+        expire = time.time() + ttl if ttl is not None else None
+        if not self.is_writer():
+            self._refresh()
+            # no need to keep or spool a copy of what the shared file already has
+            spooled = {}
+            for k, raw in raws.items():
+                mapped = self._mapped(k)
+                if mapped is None or mapped[0] != raw or (
+                        mapped[1] is not None and (expire is None or mapped[1] < expire)):
+                    spooled[k] = raw
+            self._local.delete(*(k for k in raws if k not in spooled))
+            if spooled:
+                self._local.set_many(spooled, ttl)
+                self._append_spool([{'k': k, 'v': raw.decode(), 'e': expire} for k, raw in spooled.items()])
+            return
+        for k, raw in raws.items():
+            self._sets[k] = (raw, expire)
+            self._deletes.discard(k)
+        self._schedule_flush()
+
+    def delete(self, *keys: str):
+        self._refresh()
+        self.delete_local(*keys)
+        if keys and not self.is_writer():
+            self._append_spool([{'k': k} for k in keys])
+        shared = [k for k in keys if k in self._index or k in self._flushing_sets]
+        if shared:
+            self._deletes.update(shared)
+            self._schedule_flush()
+
+    def delete_local(self, *keys: str):
+        self._local.delete(*keys)
+        for k in keys:
+            self._sets.pop(k, None)
+
+    def clear(self):
+        self._local.clear()
+        self._sets, self._deletes = {}, set()
+        self._write({}, keep=False)
+        self._refresh(force=True)
+
+    def is_writer(self) -> bool:
+        if self._writer_fd is not None:
+            return True
+        if fcntl is None:
+            return True
+        now = time.monotonic()
+        if self._writer_checked is not None and now - self._writer_checked < self.check_interval:
+            return False
+        self._writer_checked = now
+        fd = os.open(f'{self.path}.writer', os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        # keep the lock until this process exits
+        self._writer_fd = fd
+        # items spooled before the election may be older than what the last writer wrote
+        if self._spool is None:
+            self._open_spool(at_end=True)
+        self.logger.info(f'elected as the writer of {self.path}')
+        return True
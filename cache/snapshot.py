@@ -0,0 +1,62 @@
+import gzip
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from utils.logger import Logger
+
+
+# value, and the timestamp when it expires or None if it never expires
+Item = Tuple[Any, Optional[float]]
+
+
+class Snapshot:
+    """Gzipped json snapshot of cached items with their expire time on local disk."""
+    VERSION = 2
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: Path of the snapshot file.
+        """
+        self.logger = Logger(self.__class__.__name__).logger
+        self.path = path
+
+    def save(self, items: Dict[str, Item]):
+        """
+        Save :param:`items` to snapshot file.
+
+        Write to a temporary file and replace the old one,
+        so that the snapshot is always complete.
+        """
+        content = {'version': Snapshot.VERSION,
+                   'created': datetime.now().isoformat(),
+                   'items': {k: [v, expire] for k, (v, expire) in items.items()}}
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            json.dump(content, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, self.path)
+        self.logger.info(f'save {len(items)} items to {self.path}')
+
+    def load(self) -> Dict[str, Item]:
+        """
+        Load items from snapshot file. Snapshots of other versions are ignored.
+
+        :return: Saved items, or empty dict if not exists or broken.
+        """
+        if not os.path.isfile(self.path):
+            return {}
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                content = json.load(f)
+        except Exception as ex:
+            self.logger.error(f'load snapshot {self.path} failed. {ex}')
+            return {}
+        if content.get('version') != Snapshot.VERSION:
+            self.logger.warning(
+                f'ignore snapshot {self.path} of version {content.get("version")}')
+            return {}
+        items = {k: (v, expire) for k, (v, expire) in (content.get('items') or {}).items()}
+        self.logger.info(
+            f'load {len(items)} items from {self.path} created at {content.get("created")}')
+        return items
@@ -1,5 +1,7 @@
 import logging
 import os
+import tempfile
+from datetime import time
 from typing import Optional
 
 
@@ -30,6 +32,109 @@ class Headers:
     }
 
 
+class AdminSetting:
+    """settings for admin endpoints"""
+    # admin users file created by `tasks/users.py`
+    CONFIG_FILE: str = os.environ.get('TC_ADMIN_CONFIG', 'admin.json')
+
+
+class CrawlerSetting:
+    """settings for crawl tasks"""
+    # content hashes of saved areas, provinces and ports. Remove it to save all crawled objects again.
+    HASH_INDEX_PATH: str = os.environ.get(
+        'TC_HASH_INDEX_PATH', 'hash_index.json')
+
+
 class LoggerSetting:
     """settings for log"""
     LOGGING_FILE = 'logging.yaml'
+
+
+class CacheSetting:
+    """settings for cache"""
+    # cache backend. `memory` keeps a cache per process,
+    # `shared` keeps a memory-mapped file shared by all processes on the host.
+    BACKEND: str = os.environ.get('TC_CACHE_BACKEND', 'memory')
+    # path of the memory-mapped file, used if `BACKEND` is `shared`
+    SHARED_PATH: str = os.environ.get(
+        'TC_CACHE_SHARED_PATH', os.path.join(tempfile.gettempdir(), 'tide-crawler.cache'))
+    # seconds between two checks whether the shared file was replaced by the writer
+    SHARED_CHECK_INTERVAL: float = 1.0
+    # seconds to keep areas, provinces and ports. None to keep forever.
+    HIERARCHY_TTL: Optional[float] = 24 * 3600
+    # seconds to keep tides. None to keep forever.
+    TIDE_TTL: Optional[float] = 7 * 24 * 3600
+    # path of the snapshot to restore cache after restart. None to disable.
+    SNAPSHOT_PATH: Optional[str] = os.environ.get(
+        'TC_CACHE_SNAPSHOT_PATH', os.path.join(tempfile.gettempdir(), 'tide-crawler.snapshot.gz'))
+    # seconds between two snapshots
+    SNAPSHOT_INTERVAL: float = 5 * 60
+    # tides of these days before today will be saved to snapshot, and all future tides
+    SNAPSHOT_TIDE_DAYS: int = 7
+    # seconds, the popularity of a port halves after this
+    POPULARITY_HALF_LIFE: float = 24 * 3600
+    # max count of ports to track popularity
+    POPULARITY_CAPACITY: int = 10000
+    # time of day to prewarm tides of popular ports
+    PREWARM_AT: time = time(0, 5)
+    # count of most popular ports to prewarm
+    PREWARM_TOP_K: int = 50
+    # prewarm tides of these days from today
+    PREWARM_DAYS: int = 2
+    # max count of tides to prewarm at the same time
+    PREWARM_CONCURRENCY: int = 4
+    # max count of missing tides to crawl at the same time for one batch request
+    CRAWL_CONCURRENCY: int = 4
+    # max count of ports in one batch request
+    BATCH_MAX_PORTS: int = 200
+    # max count of days in one range request
+    RANGE_MAX_DAYS: int = 31
+    # max count of serialized responses to cache in each process
+    RESPONSE_CACHE_SIZE: int = 1024
+    # bytes, responses smaller than this won't be compressed
+    COMPRESS_MIN_SIZE: int = 1024
+    # seconds between two rebuilds of monthly stats of ports with new tides
+    STATS_INTERVAL: float = 60
+
+
+class JobSetting:
+    """settings for background jobs of web, such as crawling missing tides"""
+    # max count of running jobs in each process
+    CONCURRENCY: int = 4
+    # seconds to keep finished jobs for polling
+    TTL: float = 10 * 60
+    # max seconds to long-poll a job
+    MAX_WAIT: float = 30
+    # seconds between two reads of cache and storage when long-polling a job of another process
+    POLL_INTERVAL: float = 1.0
+
+
+class HarmonicSetting:
+    """settings to predict tides by harmonic analysis of stored tides if crawling failed"""
+    # predict tides which failed to crawl. Predicted tides are cached but not saved.
+    FALLBACK: bool = os.environ.get('TC_HARMONIC_FALLBACK', '1') != '0'
+    # fit stored tides of these days until today
+    FIT_DAYS: int = 90
+    # latest stored tides of these days are not fitted but used to validate the model
+    VALIDATE_DAYS: int = 7
+    # min count of stored tides to fit a model
+    MIN_DAYS: int = 30
+    # cm, models with larger validation error won't be used
+    MAX_RMSE: float = 20
+    # seconds to keep fitted models
+    MODEL_TTL: float = 24 * 3600
+    # seconds to keep predicted tides, so they will be crawled again soon
+    PREDICTED_TTL: float = 3600
+    # seconds to wait for crawling before predicting. None to wait until crawling finished.
+    CRAWL_TIMEOUT: Optional[float] = None
+
+
+class ChangeLogSetting:
+    """settings for change log of storage, used to invalidate caches of other processes"""
+    # path of the change log file. None to disable.
+    PATH: Optional[str] = os.environ.get(
+        'TC_CHANGELOG_PATH', os.path.join(tempfile.gettempdir(), 'tide-crawler.changelog'))
+    # bytes, rotate the change log if it's larger than this
+    MAX_SIZE: int = 4 * 1024 * 1024
+    # seconds between two reads of the change log
+    POLL_INTERVAL: float = 1.0
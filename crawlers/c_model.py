@@ -1,16 +1,25 @@
 """Models for crawler"""
 import datetime
+import hashlib
+import json
 from typing import Any, List, Optional, Tuple
 
 from storages.model import Area, BaseClazz, Port, Province, Tide, TideItem, WithInfo
 
 
 class CBase(BaseClazz):
+    """
+    Base of crawled models.
+
+    Models use slots since lots of them are created when crawling all tides.
+    Timestamps are assigned when first read, instead of on construction.
+    """
+    __slots__ = ('_raw', '_created_at')
+
     def __init__(self) -> None:
         super().__init__()
         self._raw = None
-        self._created_at = datetime.datetime.now()
-        self._updated_at = datetime.datetime.now()
+        self._created_at: Optional[datetime.datetime] = None
 
     @property
     def objectId(self) -> Optional[str]:
@@ -18,11 +27,14 @@ class CBase(BaseClazz):
 
     @property
     def createdAt(self) -> Optional[datetime.datetime]:
+        if self._created_at is None:
+            self._created_at = datetime.datetime.now()
         return self._created_at
 
     @property
     def updatedAt(self) -> Optional[datetime.datetime]:
-        return self._updated_at
+        # not updated after created
+        return self.createdAt
 
     @property
     def raw(self) -> Optional[Any]:
@@ -34,11 +46,27 @@ class CBase(BaseClazz):
 
 
 class CWithInfo(CBase, WithInfo):
+    __slots__ = ('_rid', '_name')
+
     def __init__(self) -> None:
         super().__init__()
         self._rid: str = None
         self._name: str = None
 
+    def _hash_fields(self) -> List[Any]:
+        """Fields to compute :prop:`content_hash`."""
+        return [self.rid, self.name]
+
+    @property
+    def content_hash(self) -> str:
+        """
+        Stable hash of crawled content, excluding raw data and timestamps.
+        Objects with the same hash don't need to be saved again.
+        """
+        content = json.dumps(self._hash_fields(), ensure_ascii=False,
+                             separators=(',', ':'))
+        return hashlib.sha1(content.encode()).hexdigest()
+
     @property
     def rid(self) -> Optional[str]:
         return self._rid
@@ -57,15 +85,22 @@ class CWithInfo(CBase, WithInfo):
 
 
 class CArea(CWithInfo, Area):
+    __slots__ = ()
+
     def __init__(self) -> None:
         super().__init__()
 
 
 class CProvince(CWithInfo, Province):
+    __slots__ = ('_area',)
+
     def __init__(self) -> None:
         super().__init__()
         self._area: Area = None
 
+    def _hash_fields(self) -> List[Any]:
+        return super()._hash_fields() + [self.area.rid if self.area else None]
+
     @property
     def area(self) -> Optional[Area]:
         return self._area
@@ -76,6 +111,7 @@ class CProvince(CWithInfo, Province):
 
 
 class CPort(CWithInfo, Port):
+    __slots__ = ('_province', '_geopoint', '_zone')
 
     def __init__(self) -> None:
         super().__init__()
@@ -83,6 +119,10 @@ class CPort(CWithInfo, Port):
         self._geopoint: Tuple[float, float] = None
         self._zone: str = None
 
+    def _hash_fields(self) -> List[Any]:
+        return super()._hash_fields() + [self.province.rid if self.province else None,
+                                         self.geopoint, self.zone]
+
     @property
     def province(self) -> Optional[Province]:
         return self._province
@@ -109,6 +149,7 @@ class CPort(CWithInfo, Port):
 
 
 class CTide(Tide, CBase):
+    __slots__ = ('_day', '_limit', '_datum', '_port', '_date')
 
     def __init__(self) -> None:
         super().__init__()
@@ -1,10 +1,11 @@
 from abc import ABC, abstractmethod
 from datetime import date
 from enum import Enum, auto
-from typing import Any, Callable, List, Optional, Tuple, Union
+from typing import (Any, AsyncIterator, Callable, Dict, List, Optional, Tuple,
+                    Union)
 
 from storages.common import ExecState
-from storages.model import Area, Port, Province, Tide
+from storages.model import Area, DayStatsDict, Port, Province, Tide, TideStats
 
 
 class IDT(Enum):
@@ -109,6 +110,90 @@ class BaseDbUtil(ABC):
         """
         pass
 
+    @abstractmethod
+    async def get_tides(self, port_ids: List[str], d: date) -> Dict[str, Tide]:
+        """
+        Get :class:`Tide`s of specified date for many ports at once.
+
+        :param port_ids: Id/objectId of :class:`Port`s
+        :param d: Specified date
+        :return: Found tides by port id. Ports without tide are omitted.
+        """
+        pass
+
+    @abstractmethod
+    async def get_tides_range(self, port_id: str, start: date, end: date) -> List[Tide]:
+        """
+        Get :class:`Tide`s of a port between two dates.
+
+        :param port_id: Id/objectId of :class:`Port`
+        :param start: First date, inclusive.
+        :param end: Last date, inclusive.
+        :return: Found tides in ascending order of date. Dates without tide are omitted.
+        """
+        pass
+
+    @abstractmethod
+    def scan_tides(self, start: date, end: date, province_id: str = None) -> AsyncIterator[List[Tide]]:
+        """
+        Scan all :class:`Tide`s between two dates page by page,
+        so that only one page is kept in memory.
+
+        :param start: First date, inclusive.
+        :param end: Last date, inclusive.
+        :param province_id: Id/objectId of :class:`Province`. Scan tides of all ports if None.
+        :return: Async iterator of pages.
+        """
+        pass
+
+    @abstractmethod
+    async def find_tides(self, d: date, min_range: float = None, max_range: float = None,
+                         min_high: float = None, max_low: float = None,
+                         province_id: str = None, limit: int = None) -> List[Tide]:
+        """
+        Find :class:`Tide`s of a date by their derived fields, in descending order of tidal range.
+        Tides stored without derived fields are never found, backfill them by :method:`save_derived`.
+
+        :param d: Specified date
+        :param min_range: Min tidal range, inclusive. No limit if None.
+        :param max_range: Max tidal range, inclusive. No limit if None.
+        :param min_high: Min height of the highest water, inclusive. No limit if None.
+        :param max_low: Max height of the lowest water, inclusive. No limit if None.
+        :param province_id: Id/objectId of :class:`Province`. Find tides of all ports if None.
+        :param limit: Max count of tides.
+        """
+        pass
+
+    @abstractmethod
+    async def save_derived(self, tides: List[Tide]) -> Tuple[ExecState, Union[int, Exception]]:
+        """
+        Compute derived fields of stored :class:`Tide`s and save the changed ones.
+
+        :param tides: Tides returned by storage, such as a page of :method:`scan_tides`.
+        :return: Count of saved tides.
+        """
+        pass
+
+    @abstractmethod
+    async def add_stats(self, port_id: str, year: int, month: int, days: List[DayStatsDict]) -> Tuple[ExecState, Union[Optional[TideStats], Exception]]:
+        """
+        Add stats of a port in a month, or replace it if exists.
+
+        :param port_id: Id/objectId of :class:`Port`
+        :param days: Stats of each day in order of date.
+        """
+        pass
+
+    @abstractmethod
+    async def get_stats(self, port_id: str, year: int, month: int) -> Optional[TideStats]:
+        """
+        Get stats of a port in a month.
+
+        :param port_id: Id/objectId of :class:`Port`
+        :return: :class:`TideStats` or :class:`None` if not found
+        """
+        pass
+
     @abstractmethod
     async def get_areas(self) -> List[Area]:
         """Get all :class:`Area`s"""
@@ -0,0 +1,131 @@
+"""Change log of storage, to notify other processes what has been written."""
+import json
+import os
+import uuid
+from typing import IO, List, Optional, Tuple, TypedDict
+
+from utils.logger import Logger
+
+
+class ChangeDict(TypedDict):
+    # area, province, port or tide
+    entity: str
+    # objectId of changed object
+    id: str
+    # objectId of related area/province/port
+    parent: Optional[str]
+    # iso date of tide
+    date: Optional[str]
+    # id of the publishing process, see :func:`source_id`
+    source: Optional[str]
+
+
+_source: Optional[Tuple[int, str]] = None
+
+
+def source_id() -> str:
+    """
+    Id of the current process. It's unique even if the pid is reused,
+    and a forked process gets a new one.
+    """
+    global _source
+    pid = os.getpid()
+    if _source is None or _source[0] != pid:
+        _source = (pid, f'{pid}-{uuid.uuid4().hex[:8]}')
+    return _source[1]
+
+
+class ChangeLog:
+    """
+    Append-only change log file.
+
+    Publishers append one json line per change. Each line is written by
+    one `write` with `O_APPEND`, so lines from multiple processes never interleave.
+    Subscribers keep the file open and read new lines since last read,
+    they must read at least once between two rotations.
+    """
+
+    def __init__(self, path: str, max_size: int = 4 * 1024 * 1024, source: str = None) -> None:
+        """
+        :param path: Path of the change log file.
+        :param max_size: Rotate the file if it's larger than this.
+        :param source: Id tagged to published changes. Id of the current process by default.
+        """
+        self.logger = Logger(self.__class__.__name__).logger
+        self.path = path
+        self.max_size = max_size
+        self.source = source
+        self._file: Optional[IO[bytes]] = None
+        # incomplete line from last read
+        self._pending = b''
+
+    def __del__(self):
+        if self._file is not None:
+            self._file.close()
+
+    def publish(self, entity: str, id: str, parent: str = None, date: str = None):
+        """Append a change. Errors are logged but not raised, the write has succeeded."""
+        change = ChangeDict(entity=entity, id=id, parent=parent, date=date,
+                            source=self.source or source_id())
+        line = json.dumps(change, separators=(',', ':')).encode() + b'\n'
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+            try:
+                os.write(fd, line)
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            if size > self.max_size:
+                # subscribers still hold the old file and will read the rest of it
+                os.replace(self.path, f'{self.path}.1')
+        except OSError as ex:
+            self.logger.error(f'publish {change} failed. {ex}')
+
+    def is_own(self, change: ChangeDict) -> bool:
+        """Whether :param:`change` is published by this process."""
+        return change.get('source') == (self.source or source_id())
+
+    def _open(self, at_end: bool) -> bool:
+        try:
+            self._file = open(self.path, 'rb')
+        except FileNotFoundError:
+            self._file = None
+            return False
+        if at_end:
+            self._file.seek(0, os.SEEK_END)
+        self._pending = b''
+        return True
+
+    def _rotated(self) -> bool:
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            return False
+
+    def subscribe(self):
+        """Start to read changes published after now."""
+        self._open(at_end=True)
+
+    def read(self) -> List[ChangeDict]:
+        """
+        Read changes since last read.
+
+        Call :method:`subscribe` first, or else read from the beginning.
+        """
+        if self._file is None and not self._open(at_end=False):
+            return []
+        data = self._pending + self._file.read()
+        if self._rotated():
+            data += self._file.read()
+            self._file.close()
+            self._open(at_end=False)
+            data += self._file.read() if self._file else b''
+        lines = data.split(b'\n')
+        self._pending = lines.pop()
+        changes: List[ChangeDict] = []
+        for line in lines:
+            try:
+                changes.append(json.loads(line))
+            except ValueError:
+                self.logger.warning(f'ignore malformed change {line}')
+        return changes
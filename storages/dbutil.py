@@ -1,14 +1,18 @@
 from datetime import date
-from typing import Any, List, Optional, Tuple, Union
+from typing import (Any, AsyncIterator, Callable, Dict, List, Optional, Tuple,
+                    Union)
 
+from config import ChangeLogSetting
 from utils.meta import merge_meta
 from utils.singleton import Singleton
 from utils.validate import Value
 
 from storages.basedbutil import IDT, BaseDbUtil
+from storages.changelog import ChangeLog
 from storages.common import ExecState
 from storages.leancloud.lc_util import LCUtil
-from storages.model import Area, Port, Province, Tide
+from storages.model import (Area, BaseClazz, DayStatsDict, Port, Province, Tide,
+                            TideStats)
 
 
 class DbUtil(merge_meta(BaseDbUtil, Singleton)):
@@ -21,6 +25,8 @@ class DbUtil(merge_meta(BaseDbUtil, Singleton)):
             self.db_util = db_util
         else:
             self.db_util = LCUtil()
+        self.changelog: Optional[ChangeLog] = ChangeLog(
+            ChangeLogSetting.PATH, ChangeLogSetting.MAX_SIZE) if ChangeLogSetting.PATH else None
 
     async def open(self):
         return await self.db_util.open()
@@ -32,32 +38,49 @@ class DbUtil(merge_meta(BaseDbUtil, Singleton)):
         if o is None:
             raise ValueError(f"{name} cannot be null")
 
+    def __publish(self, ret: Tuple[ExecState, Any], entity: str, parent: Callable[[Any], Optional[BaseClazz]], date: Callable[[Any], Optional[str]] = lambda _: None):
+        """
+        Publish the change to :attr:`changelog` if written successfully.
+
+        :param ret: Returned value of writing.
+        :param entity: Name of the written entity.
+        :param parent: Get related object from written object.
+        :param date: Get date from written object.
+        """
+        (state, obj) = ret
+        if self.changelog is None or state not in [ExecState.CREATE, ExecState.UPDATE, ExecState.SUCCESS]:
+            return ret
+        p = parent(obj)
+        self.changelog.publish(entity, obj.objectId,
+                               p.objectId if p else None, date(obj))
+        return ret
+
     async def add_area(self, area: Area, col: IDT) -> Tuple[ExecState, Union[Optional[Area], Exception]]:
         self.__valid_none(area, 'area')
         if Value.is_any_none_or_whitespace(area.rid, area.name):
             raise ValueError("area rid and name cannot be null or empty")
-        return await self.db_util.add_area(area, col)
+        return self.__publish(await self.db_util.add_area(area, col), 'area', lambda _: None)
 
     async def add_province(self, province: Province, col: IDT) -> Tuple[ExecState, Union[Optional[Province], Exception]]:
         self.__valid_none(province, 'port')
         if Value.is_any_none_or_whitespace(province.rid, province.name, province.area, province.area.rid):
             raise ValueError(
                 "province rid, name, area and area.rid cannot be null or empty")
-        return await self.db_util.add_province(province, col)
+        return self.__publish(await self.db_util.add_province(province, col), 'province', lambda o: o.area)
 
     async def add_port(self, port: Port, col: IDT) -> Tuple[ExecState, Union[Optional[Port], Exception]]:
         self.__valid_none(port, 'port')
         if Value.is_any_none_or_whitespace(port.rid, port.name, port.province, port.province.rid):
             raise ValueError(
                 "port rid, name, province and province.rid cannot be null or empty")
-        return await self.db_util.add_port(port, col)
+        return self.__publish(await self.db_util.add_port(port, col), 'port', lambda o: o.province)
 
     async def add_tide(self, tide: Tide, col: IDT) -> Tuple[ExecState, Union[Optional[Tide], Exception]]:
         self.__valid_none(tide, 'tide')
         if Value.is_any_none_or_whitespace(tide.port, tide.port.rid):
             raise ValueError(
                 "tide port and port.rid cannot be null or empty")
-        return await self.db_util.add_tide(tide, col)
+        return self.__publish(await self.db_util.add_tide(tide, col), 'tide', lambda o: o.port, lambda o: o.date.date().isoformat())
 
     async def get_area(self, area_id: str, col: IDT) -> Optional[Area]:
         if Value.is_any_none_or_whitespace(area_id):
@@ -81,6 +104,60 @@ class DbUtil(merge_meta(BaseDbUtil, Singleton)):
             d = date.today()
         return await self.db_util.get_tide(port_id, d)
 
+    async def get_tides(self, port_ids: List[str], d: date) -> Dict[str, Tide]:
+        if d == None or d < date(2000, 1, 1):
+            d = date.today()
+        port_ids = [p for p in port_ids if not Value.is_any_none_or_whitespace(p)]
+        if not port_ids:
+            return {}
+        return await self.db_util.get_tides(port_ids, d)
+
+    async def get_tides_range(self, port_id: str, start: date, end: date) -> List[Tide]:
+        if Value.is_any_none_or_whitespace(port_id):
+            raise ValueError("port_id cannot be null or empty.")
+        if start is None or end is None:
+            raise ValueError("start and end cannot be null.")
+        if start > end:
+            return []
+        return await self.db_util.get_tides_range(port_id, start, end)
+
+    async def scan_tides(self, start: date, end: date, province_id: str = None) -> AsyncIterator[List[Tide]]:
+        if start is None or end is None:
+            raise ValueError("start and end cannot be null.")
+        if start > end:
+            return
+        async for page in self.db_util.scan_tides(start, end, province_id):
+            yield page
+
+    async def find_tides(self, d: date, min_range: float = None, max_range: float = None,
+                         min_high: float = None, max_low: float = None,
+                         province_id: str = None, limit: int = None) -> List[Tide]:
+        self.__valid_none(d, 'd')
+        if min_range is not None and max_range is not None and min_range > max_range:
+            return []
+        return await self.db_util.find_tides(d, min_range, max_range, min_high, max_low, province_id, limit)
+
+    async def save_derived(self, tides: List[Tide]) -> Tuple[ExecState, Union[int, Exception]]:
+        tides = [t for t in tides if t is not None]
+        if not tides:
+            return ExecState.SUCCESS, 0
+        return await self.db_util.save_derived(tides)
+
+    async def add_stats(self, port_id: str, year: int, month: int, days: List[DayStatsDict]) -> Tuple[ExecState, Union[Optional[TideStats], Exception]]:
+        if Value.is_any_none_or_whitespace(port_id):
+            raise ValueError("port_id cannot be null or empty.")
+        if year is None or month is None or not 1 <= month <= 12:
+            raise ValueError("year and month must be a valid month.")
+        return self.__publish(await self.db_util.add_stats(port_id, year, month, days or []), 'stats',
+                              lambda o: o.port, lambda o: f'{o.year:04d}-{o.month:02d}')
+
+    async def get_stats(self, port_id: str, year: int, month: int) -> Optional[TideStats]:
+        if Value.is_any_none_or_whitespace(port_id):
+            raise ValueError("port_id cannot be null or empty.")
+        if year is None or month is None or not 1 <= month <= 12:
+            return None
+        return await self.db_util.get_stats(port_id, year, month)
+
     async def get_areas(self) -> List[Area]:
         return await self.db_util.get_areas()
 
@@ -0,0 +1,53 @@
+import json
+import os
+from typing import Dict
+
+from storages.model import WithInfo
+from utils.logger import Logger
+
+
+class HashIndex:
+    """
+    Content hashes of saved objects, stored in a local json file.
+
+    Used to skip crawled objects which are unchanged since last saved.
+    Crawled objects must have a `content_hash` property.
+    See also :class:`crawlers.c_model.CWithInfo`.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: Path of the index file. It will be created when :method:`save`.
+        """
+        self.logger = Logger(self.__class__.__name__).logger
+        self.path = path
+        self._hashes: Dict[str, str] = {}
+        self._dirty = False
+        if os.path.isfile(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self._hashes = json.load(f)
+            except ValueError as ex:
+                self.logger.error(f'load hash index {path} failed. {ex}')
+
+    def __key(self, entity: str, o: WithInfo) -> str:
+        return f'{entity}:{o.rid}'
+
+    def changed(self, entity: str, o: WithInfo) -> bool:
+        """Determine whether :param:`o` is new or changed since last :method:`update`."""
+        return self._hashes.get(self.__key(entity, o)) != o.content_hash
+
+    def update(self, entity: str, o: WithInfo):
+        """Record content hash of saved :param:`o`."""
+        self._hashes[self.__key(entity, o)] = o.content_hash
+        self._dirty = True
+
+    def save(self):
+        """Save index to file if updated."""
+        if not self._dirty:
+            return
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._hashes, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self._dirty = False
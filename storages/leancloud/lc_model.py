@@ -7,9 +7,11 @@ https://leancloud.cn/docs/leanstorage_guide-python.html#hash23473483
 """
 
 import datetime
-from typing import Any, List, Optional, Tuple, Type, Union
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
 
-from storages.model import Area, BaseClazz, Port, Province, Tide, TideItem, TideItemDict, WithInfo
+from analysis.stats import derive
+from storages.model import (Area, BaseClazz, DayStatsDict, Port, Province, Tide,
+                            TideItem, TideItemDict, TideStats, WithInfo)
 
 from leancloud import GeoPoint, Object
 
@@ -141,20 +143,40 @@ class LCTide(LCBaseClazz, Tide):
     PORT = 'port'
     DATE = 'date'
     DATUM = 'datum'
+    # derived columns, to filter and sort tides in storage. See also :func:`analysis.stats.derive`
+    MAX_HEIGHT = 'maxHeight'
+    MIN_HEIGHT = 'minHeight'
+    RANGE = 'range'
+    FIRST_HIGH = 'firstHigh'
+    CHECKSUM = 'checksum'
 
     def __init__(self):
+        # field: (stored dicts, items decoded from them)
+        self.__decoded: Dict[str, Tuple[List[TideItemDict], List[TideItem]]] = {}
         super().__init__()
 
-    def __to_tideitems(self, d: List[dict]):
-        return [TideItem.from_dict(i) for i in d]
+    def __to_tideitems(self, key: str) -> List[TideItem]:
+        """
+        Decode items of field :param:`key` only once.
+
+        Decoded items are reused until the stored dicts are replaced,
+        such as by :method:`set`, fetch or save.
+        """
+        d: List[TideItemDict] = self.get(key)
+        if d is None:
+            return []
+        cached = self.__decoded.get(key)
+        if cached is None or cached[0] is not d:
+            cached = (d, [TideItem.from_dict(i) for i in d])
+            self.__decoded[key] = cached
+        return list(cached[1])
 
     def __to_dicts(self, v: List[Union[TideItem, TideItemDict]]):
         return [i.to_dict() if type(i) == TideItem else i for i in v]
 
     @property
     def day(self) -> List[TideItem]:
-        d: List[dict] = self.get(LCTide.DAY)
-        return self.__to_tideitems(d)
+        return self.__to_tideitems(LCTide.DAY)
 
     @day.setter
     def day(self, value: List[Union[TideItem, TideItemDict]]):
@@ -162,12 +184,20 @@ class LCTide(LCBaseClazz, Tide):
 
     @property
     def limit(self) -> List[TideItem]:
-        return self.__to_tideitems(self.get(LCTide.LIMIT))
+        return self.__to_tideitems(LCTide.LIMIT)
 
     @limit.setter
     def limit(self, value: List[TideItem]):
         self.set(LCTide.LIMIT, self.__to_dicts(value))
 
+    @property
+    def day_dicts(self) -> List[TideItemDict]:
+        return self.get(LCTide.DAY) or []
+
+    @property
+    def limit_dicts(self) -> List[TideItemDict]:
+        return self.get(LCTide.LIMIT) or []
+
     @property
     def port(self) -> LCPort:
         return self.get_rel(LCTide.PORT, LCPort)
@@ -191,3 +221,83 @@ class LCTide(LCBaseClazz, Tide):
     @datum.setter
     def datum(self, value: float):
         self.set(LCTide.DATUM, value)
+
+    @property
+    def max_height(self) -> Optional[float]:
+        return self.get(LCTide.MAX_HEIGHT)
+
+    @property
+    def min_height(self) -> Optional[float]:
+        return self.get(LCTide.MIN_HEIGHT)
+
+    @property
+    def range(self) -> Optional[float]:
+        return self.get(LCTide.RANGE)
+
+    @property
+    def first_high(self) -> Optional[datetime.datetime]:
+        return self.get(LCTide.FIRST_HIGH)
+
+    @property
+    def checksum(self) -> Optional[str]:
+        return self.get(LCTide.CHECKSUM)
+
+    def derive(self):
+        """Compute derived columns from :attr:`day`, :attr:`limit` and :attr:`datum`."""
+        fields = derive(self)
+        self.set(LCTide.MAX_HEIGHT, fields.max)
+        self.set(LCTide.MIN_HEIGHT, fields.min)
+        self.set(LCTide.RANGE, fields.range)
+        self.set(LCTide.FIRST_HIGH, fields.first_high)
+        self.set(LCTide.CHECKSUM, fields.checksum)
+
+
+@Object.as_class("TideStats")
+class LCTideStats(LCBaseClazz, TideStats):
+    PORT = 'port'
+    YEAR = 'year'
+    MONTH = 'month'
+    DAYS = 'days'
+    # aggregated columns of days, to query or sort stats in console
+    COUNT = 'count'
+    MIN_HEIGHT = 'minHeight'
+    MIN_TIME = 'minTime'
+    MAX_HEIGHT = 'maxHeight'
+    MAX_TIME = 'maxTime'
+    MEAN_HEIGHT = 'meanHeight'
+    MEAN_RANGE = 'meanRange'
+
+    def __init__(self):
+        super().__init__()
+
+    @property
+    def port(self) -> LCPort:
+        return self.get_rel(LCTideStats.PORT, LCPort)
+
+    @port.setter
+    def port(self, value: LCPort):
+        self.set(LCTideStats.PORT, value)
+
+    @property
+    def year(self) -> int:
+        return self.get(LCTideStats.YEAR)
+
+    @year.setter
+    def year(self, value: int):
+        self.set(LCTideStats.YEAR, value)
+
+    @property
+    def month(self) -> int:
+        return self.get(LCTideStats.MONTH)
+
+    @month.setter
+    def month(self, value: int):
+        self.set(LCTideStats.MONTH, value)
+
+    @property
+    def days(self) -> List[DayStatsDict]:
+        return self.get(LCTideStats.DAYS) or []
+
+    @days.setter
+    def days(self, value: List[DayStatsDict]):
+        self.set(LCTideStats.DAYS, value)
@@ -1,15 +1,16 @@
 import asyncio
 import functools
 from datetime import date, datetime, timedelta
-from typing import (Any, Callable, List, Optional, Tuple, Type, TypeVar, Union,
-                    overload)
+from typing import (Any, AsyncIterator, Callable, Dict, List, Optional, Tuple,
+                    Type, TypeVar, Union, overload)
 
+from analysis.stats import checksum, summarize
 from config import LCSetting
 from storages.basedbutil import IDT, BaseDbUtil, switch_idt
 from storages.common import ExecState
 from storages.leancloud.lc_model import (LCArea, LCPort, LCProvince, LCTide,
-                                         LCWithInfo)
-from storages.model import Area, Port, Province, Tide, WithInfo
+                                         LCTideStats, LCWithInfo)
+from storages.model import Area, DayStatsDict, Port, Province, Tide, WithInfo
 from utils.async_util import async_wrap, run_async
 from utils.logger import Logger
 from utils.validate import Value
@@ -40,6 +41,10 @@ class LCUtil(BaseDbUtil):
     ------
     https://leancloud.cn/docs/leanstorage_guide-python.html
     """
+    # max count of objects returned by one query
+    QUERY_LIMIT = 1000
+    # max count of objects saved by one batch request
+    BATCH_LIMIT = 50
 
     def __init__(self) -> None:
         """
@@ -254,6 +259,7 @@ class LCUtil(BaseDbUtil):
             t.datum = tide.datum
             t.day = tide.day
             t.limit = tide.limit
+            t.derive()
             t.save()
             self.logger.debug(f"add tide {t.objectId} successfully.")
             return ExecState.CREATE, t
@@ -304,6 +310,171 @@ class LCUtil(BaseDbUtil):
                               exc_info=True, stack_info=True)
         return None
 
+    @_login()
+    async def get_tides(self, port_ids: List[str], d: date) -> Dict[str, LCTide]:
+        dt = datetime(d.year, d.month, d.day)
+        tides: Dict[str, LCTide] = {}
+        # one query for at most QUERY_LIMIT ports
+        for i in range(0, len(port_ids), LCUtil.QUERY_LIMIT):
+            ports = [LCPort.create_without_data(p)
+                     for p in port_ids[i:i + LCUtil.QUERY_LIMIT]]
+            query: Query = LCTide.query
+            try:
+                found: List[LCTide] = await async_wrap(query.contained_in(LCTide.PORT, ports)
+                                                       .greater_than_or_equal_to(LCTide.DATE, dt)
+                                                       .less_than(LCTide.DATE, dt+timedelta(1))
+                                                       .include(LCPort.__name__)
+                                                       .limit(LCUtil.QUERY_LIMIT)
+                                                       .find)()
+            except Exception as ex:
+                self.logger.error(f"get tides of {len(ports)} ports({str(d)}) failed. {ex}",
+                                  exc_info=True, stack_info=True)
+                continue
+            for t in found:
+                tides.setdefault(t.port.objectId, t)
+        return tides
+
+    @_login()
+    async def get_tides_range(self, port_id: str, start: date, end: date) -> List[LCTide]:
+        query: Query = LCTide.query
+        try:
+            return await async_wrap(query.equal_to(LCTide.PORT, LCPort.create_without_data(port_id))
+                                    .greater_than_or_equal_to(LCTide.DATE, datetime(start.year, start.month, start.day))
+                                    .less_than(LCTide.DATE, datetime(end.year, end.month, end.day)+timedelta(1))
+                                    .include(LCPort.__name__)
+                                    .ascending(LCTide.DATE)
+                                    .limit(LCUtil.QUERY_LIMIT)
+                                    .find)()
+        except Exception as ex:
+            self.logger.error(f"get tides {port_id}({str(start)}~{str(end)}) failed. {ex}",
+                              exc_info=True, stack_info=True)
+        return []
+
+    async def scan_tides(self, start: date, end: date, province_id: str = None, page_size: int = None) -> AsyncIterator[List[LCTide]]:
+        """
+        Pages are split by objectId instead of `skip`, which is slow for large offsets.
+        Errors are raised since a scan cannot be resumed.
+
+        :param page_size: Count of tides per page. :attr:`QUERY_LIMIT` by default.
+        """
+        await self.open()
+        page_size = page_size or LCUtil.QUERY_LIMIT
+        ports = None
+        if province_id is not None:
+            ports = await self.get_ports(province_id, IDT.ID)
+            if not ports:
+                return
+        last_id = None
+        while True:
+            query: Query = LCTide.query
+            query.greater_than_or_equal_to(LCTide.DATE, datetime(start.year, start.month, start.day)) \
+                .less_than(LCTide.DATE, datetime(end.year, end.month, end.day)+timedelta(1)) \
+                .ascending(LCTide.OBJECT_ID) \
+                .limit(page_size)
+            if ports is not None:
+                query.contained_in(LCTide.PORT, ports)
+            if last_id is not None:
+                query.greater_than(LCTide.OBJECT_ID, last_id)
+            page: List[LCTide] = await async_wrap(query.find)()
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            last_id = page[-1].objectId
+
+    @_login()
+    async def find_tides(self, d: date, min_range: float = None, max_range: float = None,
+                         min_high: float = None, max_low: float = None,
+                         province_id: str = None, limit: int = None) -> List[LCTide]:
+        dt = datetime(d.year, d.month, d.day)
+        query: Query = LCTide.query
+        query.greater_than_or_equal_to(LCTide.DATE, dt) \
+            .less_than(LCTide.DATE, dt+timedelta(1)) \
+            .exists(LCTide.RANGE) \
+            .include(LCPort.__name__) \
+            .descending(LCTide.RANGE) \
+            .limit(min(limit or LCUtil.QUERY_LIMIT, LCUtil.QUERY_LIMIT))
+        if min_range is not None:
+            query.greater_than_or_equal_to(LCTide.RANGE, min_range)
+        if max_range is not None:
+            query.less_than_or_equal_to(LCTide.RANGE, max_range)
+        if min_high is not None:
+            query.greater_than_or_equal_to(LCTide.MAX_HEIGHT, min_high)
+        if max_low is not None:
+            query.less_than_or_equal_to(LCTide.MIN_HEIGHT, max_low)
+        try:
+            if province_id is not None:
+                ports = await self.get_ports(province_id, IDT.ID)
+                if not ports:
+                    return []
+                query.contained_in(LCTide.PORT, ports)
+            return await async_wrap(query.find)()
+        except Exception as ex:
+            self.logger.error(f"find tides ({str(d)}) failed. {ex}",
+                              exc_info=True, stack_info=True)
+        return []
+
+    @_login()
+    async def save_derived(self, tides: List[Tide]) -> Tuple[ExecState, Union[int, Exception]]:
+        # tides stored before derived fields, or whose heights are changed since derived
+        changed = [t for t in tides if isinstance(t, LCTide) and t.checksum != checksum(t)]
+        for t in changed:
+            t.derive()
+        try:
+            for i in range(0, len(changed), LCUtil.BATCH_LIMIT):
+                await async_wrap(leancloud.Object.save_all)(changed[i:i + LCUtil.BATCH_LIMIT])
+            self.logger.debug(f"save derived fields of {len(changed)} tides successfully.")
+            return ExecState.UPDATE, len(changed)
+        except Exception as ex:
+            self.logger.error(
+                f"save derived fields of {len(changed)} tides failed. {ex}", exc_info=True, stack_info=True)
+            return ExecState.FAIL, ex
+
+    @_login()
+    async def add_stats(self, port_id: str, year: int, month: int, days: List[DayStatsDict]) -> Tuple[ExecState, Union[Optional[LCTideStats], Exception]]:
+        try:
+            stats: Optional[LCTideStats] = await self.get_stats(port_id, year, month)
+            state = ExecState.UPDATE if stats else ExecState.CREATE
+            if stats is None:
+                stats = LCTideStats()
+                stats.port = LCPort.create_without_data(port_id)
+                stats.year = year
+                stats.month = month
+            stats.days = days
+            summary = summarize(days)
+            stats.set(LCTideStats.COUNT, summary.count)
+            stats.set(LCTideStats.MIN_HEIGHT, summary.min.height if summary.min else None)
+            stats.set(LCTideStats.MIN_TIME, summary.min.time if summary.min else None)
+            stats.set(LCTideStats.MAX_HEIGHT, summary.max.height if summary.max else None)
+            stats.set(LCTideStats.MAX_TIME, summary.max.time if summary.max else None)
+            stats.set(LCTideStats.MEAN_HEIGHT, summary.mean)
+            stats.set(LCTideStats.MEAN_RANGE, summary.mean_range)
+            await async_wrap(stats.save)()
+            self.logger.debug(f"{state.name} stats {stats.objectId} successfully.")
+            return state, stats
+        except Exception as ex:
+            self.logger.error(f"add stats {port_id}({year}-{month}) failed. {ex}",
+                              exc_info=True, stack_info=True)
+            return ExecState.FAIL, ex
+
+    @_login()
+    async def get_stats(self, port_id: str, year: int, month: int) -> Optional[LCTideStats]:
+        """
+        Errors except not found are raised,
+        otherwise :method:`add_stats` would create another stats of the same month.
+        """
+        query: Query = LCTideStats.query
+        try:
+            return await async_wrap(query.equal_to(LCTideStats.PORT, LCPort.create_without_data(port_id))
+                                    .equal_to(LCTideStats.YEAR, year)
+                                    .equal_to(LCTideStats.MONTH, month)
+                                    .first)()
+        except LeanCloudError as ex:
+            if ex.code == 101:
+                return None
+            raise
+
     @_login()
     async def get_areas(self) -> List[LCArea]:
         try:
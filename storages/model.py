@@ -2,15 +2,21 @@
 base model class definitions
 """
 
+import base64
 import datetime
+import math
+import sys
 from abc import ABC, abstractmethod
-from typing import Any, List, Optional, Tuple, TypedDict
+from array import array
+from typing import Any, Iterable, Iterator, List, Optional, Tuple, TypedDict, Union
 
 from utils.validate import Value
 
 
 class BaseClazz(ABC):
     """Base class. All of model classes implements it."""
+    __slots__ = ()
+
     @property
     @abstractmethod
     def objectId(self) -> Optional[str]:
@@ -50,6 +56,8 @@ class BaseClazz(ABC):
 
 class WithInfo(BaseClazz, ABC):
     """Common information column definitions."""
+    __slots__ = ()
+
     @property
     @abstractmethod
     def rid(self) -> Optional[str]:
@@ -77,11 +85,13 @@ class WithInfo(BaseClazz, ABC):
 
 class Area(WithInfo, ABC):
     """Area, Continent, Ocean, Sea"""
-    pass
+    __slots__ = ()
 
 
 class Province(WithInfo, ABC):
     """Province information."""
+    __slots__ = ()
+
     @property
     @abstractmethod
     def area(self) -> Optional[Area]:
@@ -97,6 +107,7 @@ class Province(WithInfo, ABC):
 
 class Port(WithInfo):
     """Port infomations."""
+    __slots__ = ()
 
     @property
     @abstractmethod
@@ -142,6 +153,7 @@ class TideItemDict(TypedDict):
 
 class TideItem():
     """Store a tide data pair include time and height."""
+    __slots__ = ('time', 'height')
     TIME = 'time'
     HEIGHT = 'height'
 
@@ -167,11 +179,143 @@ class TideItem():
         return TideItem(time, height)
 
     def __repr__(self) -> str:
-        return self.to_dict()
+        return repr(self.to_dict())
+
+
+class TideItemArray():
+    """
+    Compact sequence of :class:`TideItem`.
+
+    Times are stored as minutes since 00:00 and heights in cm,
+    both are packed float32 in :class:`array.array`,
+    so a day of tide costs about 8 bytes per item instead of a list of objects.
+    Missing time or height is stored as NaN.
+    Heights are read back as the shortest decimal with float32 precision,
+    and integral ones as int, so crawled heights such as 123 keep their format.
+    Arrays support the buffer protocol, so `numpy.asarray` reads them without copy.
+    """
+
+    __slots__ = ('minutes', 'heights')
+    TYPECODE = 'f'
+
+    def __init__(self, minutes: Iterable[float] = (), heights: Iterable[float] = ()) -> None:
+        """
+        :param minutes: Minutes since 00:00 of items.
+        :param heights: Heights of items, the same length as :param:`minutes`.
+        """
+        self.minutes = array(TideItemArray.TYPECODE, minutes)
+        self.heights = array(TideItemArray.TYPECODE, heights)
+        if len(self.minutes) != len(self.heights):
+            raise ValueError('minutes and heights must have the same length')
+
+    def __len__(self) -> int:
+        return len(self.minutes)
+
+    def __iter__(self) -> Iterator[TideItem]:
+        for m, h in zip(self.minutes, self.heights):
+            yield TideItem(TideItemArray._to_time(m), TideItemArray._to_height(h))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TideItemArray):
+            return NotImplemented
+        # compare bytes so that NaN equals NaN
+        return self.to_bytes() == other.to_bytes()
+
+    def __repr__(self) -> str:
+        return f'TideItemArray({self.to_dicts()})'
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of packed data."""
+        return (len(self.minutes) + len(self.heights)) * self.minutes.itemsize
+
+    @staticmethod
+    def _to_minute(t: Optional[datetime.time]) -> float:
+        if t is None:
+            return math.nan
+        return t.hour * 60 + t.minute + t.second / 60
+
+    @staticmethod
+    def _to_time(m: float) -> Optional[datetime.time]:
+        if math.isnan(m):
+            return None
+        seconds = round(m * 60)
+        return datetime.time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+    @staticmethod
+    def _to_timestr(m: float) -> Optional[str]:
+        """The same as `str` of :method:`_to_time`, without creating a :class:`datetime.time`."""
+        if math.isnan(m):
+            return None
+        seconds = round(m * 60)
+        return f'{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+
+    @staticmethod
+    def _to_height(h: float) -> Optional[Union[int, float]]:
+        if math.isnan(h):
+            return None
+        # shortest decimal of float32, such as 123.4 rather than 123.40000152587891
+        h = float(f'{h:.7g}')
+        return int(h) if h.is_integer() else h
+
+    @classmethod
+    def from_items(cls, items: Iterable[Union[TideItem, TideItemDict]]) -> 'TideItemArray':
+        """Pack :class:`TideItem`s or :class:`TideItemDict`s. None items are ignored."""
+        if isinstance(items, TideItemArray):
+            return items
+        minutes, heights = array(cls.TYPECODE), array(cls.TYPECODE)
+        for i in items or ():
+            if i is None:
+                continue
+            if not isinstance(i, TideItem):
+                i = TideItem.from_dict(i)
+            minutes.append(cls._to_minute(i.time))
+            heights.append(math.nan if i.height is None else i.height)
+        return cls(minutes, heights)
+
+    def to_items(self) -> List[TideItem]:
+        return list(self)
+
+    def to_dicts(self) -> List[TideItemDict]:
+        """The same as dicts of :method:`to_items`, built without creating :class:`TideItem`s."""
+        to_time, to_height = TideItemArray._to_timestr, TideItemArray._to_height
+        return [{TideItem.TIME: to_time(m), TideItem.HEIGHT: to_height(h)}
+                for m, h in zip(self.minutes, self.heights)]
+
+    def to_bytes(self) -> bytes:
+        """Little endian minutes followed by heights."""
+        minutes, heights = self.minutes, self.heights
+        if sys.byteorder == 'big':
+            minutes, heights = array(minutes.typecode, minutes), array(heights.typecode, heights)
+            minutes.byteswap()
+            heights.byteswap()
+        return minutes.tobytes() + heights.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'TideItemArray':
+        """Unpack bytes of :method:`to_bytes`."""
+        values = array(cls.TYPECODE)
+        values.frombytes(data)
+        if sys.byteorder == 'big':
+            values.byteswap()
+        if len(values) % 2:
+            raise ValueError('length of minutes and heights are different')
+        n = len(values) // 2
+        return cls(values[:n], values[n:])
+
+    def encode(self) -> str:
+        """Encode as a base64 string to store in json."""
+        return base64.b64encode(self.to_bytes()).decode('ascii')
+
+    @classmethod
+    def decode(cls, value: str) -> 'TideItemArray':
+        """Decode a string of :method:`encode`."""
+        return cls.from_bytes(base64.b64decode(value))
 
 
 class Tide(BaseClazz):
     """Tide data of one day."""
+    __slots__ = ()
 
     @property
     @abstractmethod
@@ -197,6 +341,24 @@ class Tide(BaseClazz):
         """Set tide limitations."""
         pass
 
+    @property
+    def predicted(self) -> bool:
+        """Whether it's predicted locally rather than crawled."""
+        return False
+
+    @property
+    def day_dicts(self) -> List[TideItemDict]:
+        """
+        Get :attr:`day` as :class:`TideItemDict`s.
+        Override it if items are stored as dicts, to skip decoding and encoding again.
+        """
+        return [i.to_dict() for i in self.day or []]
+
+    @property
+    def limit_dicts(self) -> List[TideItemDict]:
+        """Get :attr:`limit` as :class:`TideItemDict`s. See also :attr:`day_dicts`."""
+        return [i.to_dict() for i in self.limit or []]
+
     @property
     @abstractmethod
     def port(self) -> Optional[Port]:
@@ -232,3 +394,44 @@ class Tide(BaseClazz):
     def datum(self, value: float):
         """Set tide height datum plane(cm)."""
         pass
+
+
+class DayStatsDict(TypedDict):
+    # iso date
+    date: str
+    # lowest height and its time `HH:MM:SS`
+    min: float
+    minTime: Optional[str]
+    # highest height and its time `HH:MM:SS`
+    max: float
+    maxTime: Optional[str]
+    # sum and count of hourly heights
+    sum: float
+    count: int
+
+
+class TideStats(BaseClazz):
+    """Statistics of tides of a port in a month, merged from stats of each day."""
+    __slots__ = ()
+
+    @property
+    @abstractmethod
+    def port(self) -> Optional[Port]:
+        """Get related :class:`Port`."""
+        pass
+
+    @property
+    @abstractmethod
+    def year(self) -> Optional[int]:
+        pass
+
+    @property
+    @abstractmethod
+    def month(self) -> Optional[int]:
+        pass
+
+    @property
+    @abstractmethod
+    def days(self) -> List[DayStatsDict]:
+        """Get stats of each day in order of date."""
+        pass
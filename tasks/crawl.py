@@ -3,10 +3,12 @@ import sys
 from datetime import date
 from typing import Callable, Awaitable, List, Optional, Tuple, TypeVar, Union
 
+from config import CrawlerSetting
 from services.crawler_service import CrawlerService
 from storages.basedbutil import IDT
 from storages.common import ExecState
 from storages.dbutil import DbUtil
+from storages.hash_index import HashIndex
 from storages.model import Area, Port, Province, Tide, WithInfo
 from utils.console import Console
 from utils.logger import Logger
@@ -15,32 +17,56 @@ _T = TypeVar('_T', bound=WithInfo)
 
 _logger = Logger('crawl').logger
 
+_hash_index: Optional[HashIndex] = None
 
-async def inserts(os: List[_T], save: Callable[[_T], Awaitable[Tuple[ExecState, Union[Optional[_T], Exception]]]]):
+
+def hash_index() -> HashIndex:
+    global _hash_index
+    if _hash_index is None:
+        _hash_index = HashIndex(CrawlerSetting.HASH_INDEX_PATH)
+    return _hash_index
+
+
+async def inserts(os: List[_T], save: Callable[[_T], Awaitable[Tuple[ExecState, Union[Optional[_T], Exception]]]], entity: str):
+    """
+    Save crawled objects.
+
+    Objects unchanged since last saved will be skipped and returned with :attr:`ExecState.EXIST`.
+    See also :class:`HashIndex`.
+
+    :param entity: Name of objects, such as area, province and port.
+    """
+    index = hash_index()
     ret: List[Tuple[ExecState, Union[Optional[_T], Exception]]] = []
     for o in os:
+        if not index.changed(entity, o):
+            ret.append((ExecState.EXIST, o))
+            _logger.debug(f'{ExecState.EXIST.name} {entity}({o.rid})')
+            continue
         (r, obj) = await save(o)
         ret.append((r, obj))
         if isinstance(obj, WithInfo):
+            index.update(entity, o)
             _logger.info(f'{r.name} {type(obj).__name__}({obj.objectId})')
         else:
             _logger.error(f'{r.name} {o.rid} {obj}', exc_info=obj)
+    index.save()
     return ret
 
 
 async def crawl_areas():
     areas = await CrawlerService().crawl_areas()
-    return await inserts(areas, lambda o: DbUtil().add_area(o, IDT.RID))
+    return await inserts(areas, lambda o: DbUtil().add_area(o, IDT.RID), 'area')
 
 
 async def crawl_provinces(area: str):
     provinces = await CrawlerService().crawl_provinces(area)
-    return await inserts(provinces, lambda o: DbUtil().add_province(o, IDT.RID))
+    return await inserts(provinces, lambda o: DbUtil().add_province(o, IDT.RID), 'province')
 
 
 async def crawl_ports(province: str):
     ports = await CrawlerService().crawl_ports(province)
-    return await inserts(ports, lambda o: DbUtil().add_port(o, IDT.RID))
+    return await inserts(ports, lambda o: DbUtil().add_port(o, IDT.RID), 'port')
 
 
 async def crawl_tide(d: date, port: str):
@@ -0,0 +1,52 @@
+import asyncio
+import sys
+from datetime import date
+from typing import List, Optional, Tuple
+
+from storages.common import ExecState
+from storages.dbutil import DbUtil
+from utils.logger import Logger
+
+_logger = Logger('derive').logger
+
+
+async def backfill(start: date, end: date, province: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Derive and save fields of stored tides between two dates, which are used to filter tides.
+    Tides stored before derived fields were added are never found by `/tides/filter`
+    until they are backfilled. Tides whose fields are up to date are skipped.
+
+    :param province: Id/objectId of province. Backfill all ports if None.
+    :return: (count of saved tides, count of failed pages)
+    """
+    saved, failed = 0, 0
+    async for page in DbUtil().scan_tides(start, end, province):
+        (ret, count) = await DbUtil().save_derived(page)
+        if ret in [ExecState.CREATE, ExecState.UPDATE, ExecState.SUCCESS]:
+            saved += count
+            _logger.info(f'{ret.name} derived fields of {count}/{len(page)} tides')
+        else:
+            failed += 1
+            _logger.error(f'{ret.name} derived fields of {len(page)} tides {count}', exc_info=count)
+    return saved, failed
+
+
+def main(args: List[str]):
+    HELP = 'yyyy-MM-dd yyyy-MM-dd [province_id]'
+    if len(args) < 2:
+        print(HELP)
+        return
+    try:
+        start, end = date.fromisoformat(args[0]), date.fromisoformat(args[1])
+    except ValueError:
+        print('malformed date, must be yyyy-MM-dd.')
+        print(HELP)
+        return
+    province = args[2] if len(args) > 2 else None
+    loop = asyncio.get_event_loop()
+    saved, failed = loop.run_until_complete(backfill(start, end, province))
+    print(f'{saved} tides saved, {failed} pages failed.')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,65 @@
+import asyncio
+import calendar
+import sys
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from analysis.stats import day_stats, merge_days
+from storages.common import ExecState
+from storages.dbutil import DbUtil
+from storages.model import DayStatsDict
+from utils.logger import Logger
+
+_logger = Logger('stats').logger
+
+
+async def rebuild(year: int, month: int, province: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Compute stats of a month from all stored tides and replace stored stats.
+
+    Months with new tides are rebuilt by the web in the background, see :method:`CacheUtil.rebuild_stats`.
+    Use it to backfill or repair them. Rebuilds are idempotent, concurrent ones only write the same stats twice.
+
+    :param province: Id/objectId of province. Rebuild all ports if None.
+    :return: (count of written stats, count of failed ones)
+    """
+    start = date(year, month, 1)
+    end = date(year, month, calendar.monthrange(year, month)[1])
+    days: Dict[str, List[DayStatsDict]] = {}
+    async for page in DbUtil().scan_tides(start, end, province):
+        for t in page:
+            stats = day_stats(t)
+            if stats is not None and t.port is not None:
+                days.setdefault(t.port.objectId, []).append(stats)
+    written, failed = 0, 0
+    for port_id, ds in days.items():
+        (ret, obj) = await DbUtil().add_stats(port_id, year, month, merge_days([], *ds))
+        if ret in [ExecState.CREATE, ExecState.UPDATE, ExecState.SUCCESS]:
+            written += 1
+            _logger.info(f'{ret.name} stats {port_id}({year}-{month:02d}) of {len(ds)} days')
+        else:
+            failed += 1
+            _logger.error(f'{ret.name} stats {port_id}({year}-{month:02d}) {obj}', exc_info=obj)
+    return written, failed
+
+
+def main(args: List[str]):
+    HELP = '[yyyy-MM [province_id]]\nRebuild the current month by default.'
+    if args and args[0] in ('-h', '--help'):
+        print(HELP)
+        return
+    try:
+        year, month = (int(i) for i in args[0].split('-')) if args else (date.today().year, date.today().month)
+        date(year, month, 1)
+    except ValueError:
+        print('malformed month, must be yyyy-MM.')
+        print(HELP)
+        return
+    province = args[1] if len(args) > 1 else None
+    loop = asyncio.get_event_loop()
+    written, failed = loop.run_until_complete(rebuild(year, month, province))
+    print(f'{written} stats written, {failed} failed.')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -6,9 +6,10 @@ from getpass import getpass
 from typing import Callable, List
 
 import bcrypt
+from config import AdminSetting
 from web.admin import AdminConfigDict
 
-CONFIG_FILE = 'admin.json'
+CONFIG_FILE = AdminSetting.CONFIG_FILE
 config: AdminConfigDict = None
 USERNAME_ERR = 'Username must in lowercase, UPPERCASE, digits, underline_ and minus- .'
 PASSWORD_ERR = 'Password must contain at least 1 lowercase, 1 UPPERCASE, 1 digits and at least 8 characters.'
@@ -0,0 +1,88 @@
+import datetime
+from unittest import TestCase
+
+import numpy as np
+from analysis.harmonic import (CONSTITUENTS, HarmonicModel, fit, fit_tides,
+                               hours_of, select)
+from crawlers.c_model import CTide
+
+
+def model():
+    return HarmonicModel(200, ['M2', 'S2', 'K1', 'O1'], [28.9841042, 30, 15.0410686, 13.9430356],
+                         [120, 40, 30, 25], [40, 80, 200, 120])
+
+
+def tides(start=datetime.date(2022, 1, 1), days=60):
+    m = model()
+    result = []
+    for i in range(days):
+        d = start + datetime.timedelta(i)
+        t = CTide()
+        t.date = datetime.datetime(d.year, d.month, d.day)
+        t.day, t.limit = m.tide_items(d)
+        t.datum = -91
+        result.append(t)
+    return result
+
+
+class TestHarmonic(TestCase):
+    def test_select(self):
+        names = [c.name for c in select(45 * 24)]
+        self.assertIn('M2', names)
+        self.assertIn('S2', names)
+        # can't be separated from S2 and K1 in 45 days
+        self.assertNotIn('K2', names)
+        self.assertNotIn('P1', names)
+        self.assertIn('K2', [c.name for c in select(365 * 24)])
+        self.assertEqual(select(0), [])
+
+    def test_fit(self):
+        hours = np.arange(0, 30 * 24, 1.0)
+        m = model()
+        fitted = fit(hours, m.predict(hours), CONSTITUENTS[:4])
+        np.testing.assert_allclose(fitted.amplitudes, m.amplitudes, atol=1e-6)
+        np.testing.assert_allclose(fitted.phases % 360, m.phases % 360, atol=1e-6)
+        self.assertAlmostEqual(fitted.mean, 200)
+        self.assertLess(fitted.rmse, 1e-6)
+
+    def test_fit_too_few(self):
+        with self.assertRaises(ValueError):
+            fit(np.arange(2.0), np.zeros(2))
+        with self.assertRaises(ValueError):
+            fit(np.array([0, 500, 1000.0]), np.zeros(3))
+
+    def test_fit_tides(self):
+        ts = tides()
+        m = fit_tides(ts, validate_days=7)
+        self.assertEqual(m.datum, -91)
+        # heights of tides are rounded to cm
+        self.assertLess(m.rmse, 1)
+        self.assertLess(m.quality.rmse, 1)
+        self.assertEqual(m.quality.count, sum(len(t.day) + len(t.limit) for t in ts[-7:]))
+
+    def test_predict_extremes(self):
+        d = datetime.date(2022, 6, 1)
+        fitted = fit_tides(tides())
+        expected, actual = model().extremes(d), fitted.extremes(d)
+        self.assertEqual(len(expected), len(actual))
+        for e, a in zip(expected, actual):
+            self.assertEqual(e.high, a.high)
+            self.assertLessEqual(abs(e.minute - a.minute), 3)
+            self.assertAlmostEqual(e.height, a.height, delta=2)
+
+    def test_extremes(self):
+        d = datetime.date(2022, 1, 1)
+        minutes, ys = model().curve(d, 1)
+        extremes = model().extremes(d)
+        self.assertTrue(extremes)
+        for e in extremes:
+            self.assertEqual(ys[int(e.minute)], max(ys[int(e.minute) - 1:int(e.minute) + 2])
+                             if e.high else min(ys[int(e.minute) - 1:int(e.minute) + 2]))
+
+    def test_to_dict(self):
+        m = fit_tides(tides(), validate_days=7)
+        loaded = HarmonicModel.from_dict(m.to_dict())
+        hours = hours_of(datetime.datetime(2022, 6, 1)) + np.arange(24.0)
+        np.testing.assert_allclose(loaded.predict(hours), m.predict(hours))
+        self.assertEqual(loaded.quality, m.quality)
+        self.assertEqual(loaded.names, m.names)
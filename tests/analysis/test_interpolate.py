@@ -0,0 +1,78 @@
+import datetime
+from unittest import TestCase
+
+import numpy as np
+from analysis.interpolate import (COSINE, SPLINE, cosine, cubic_spline, curve,
+                                  to_arrays)
+from crawlers.c_model import CTide
+from storages.model import TideItem
+
+
+def semidiurnal(minutes):
+    """M2-like tide, period 12.42 hours."""
+    return 200 + 150 * np.cos(2 * np.pi * np.asarray(minutes) / (12.42 * 60))
+
+
+def tide():
+    t = CTide()
+    t.date = datetime.datetime(2022, 4, 7)
+    t.day = [TideItem(datetime.time(h), float(semidiurnal(h * 60))) for h in range(24)]
+    # extremes of semidiurnal
+    t.limit = [TideItem(datetime.time(0), 350.0), TideItem(datetime.time(6, 12, 36), 50.0),
+               TideItem(datetime.time(12, 25, 12), 350.0), TideItem(datetime.time(18, 37, 48), 50.0)]
+    t.datum = 0
+    return t
+
+
+class TestToArrays(TestCase):
+    def test_sort_dedupe(self):
+        x, y = to_arrays([TideItem(datetime.time(1, 30), 2.0), TideItem(datetime.time(0), 1.0),
+                          TideItem(datetime.time(1, 30), 3.0), TideItem(None, 1.0),
+                          TideItem(datetime.time(2), None)])
+        np.testing.assert_array_equal(x, [0, 90])
+        np.testing.assert_array_equal(y, [1.0, 2.0])
+
+
+class TestCubicSpline(TestCase):
+    def test_knots(self):
+        x = np.array([0, 60, 120, 180.0])
+        y = np.array([1, 3, 2, 5.0])
+        np.testing.assert_allclose(cubic_spline(x, y, x), y)
+
+    def test_linear(self):
+        """natural spline reproduces a line"""
+        x = np.array([0, 30, 90, 100.0])
+        xs = np.linspace(-10, 110, 25)
+        np.testing.assert_allclose(cubic_spline(x, 2 * x + 1, xs), 2 * xs + 1)
+
+    def test_two_knots(self):
+        np.testing.assert_allclose(cubic_spline(np.array([0, 10.0]), np.array([0, 10.0]), [5]), [5])
+
+    def test_one_knot(self):
+        with self.assertRaises(ValueError):
+            cubic_spline(np.array([0.0]), np.array([1.0]), [0])
+
+
+class TestCosine(TestCase):
+    def test_extremes_and_middle(self):
+        x = np.array([0, 360.0])
+        y = np.array([300, 100.0])
+        np.testing.assert_allclose(cosine(x, y, [0, 180, 360]), [300, 200, 100])
+
+
+class TestCurve(TestCase):
+    def test_spline(self):
+        xs, heights = curve(tide(), 10, SPLINE)
+        self.assertEqual(len(xs), 144)
+        inner = (xs >= 60) & (xs <= 22 * 60)
+        np.testing.assert_allclose(heights[inner], semidiurnal(xs[inner]), atol=0.5)
+        # natural end conditions are less accurate
+        np.testing.assert_allclose(heights[xs <= 23 * 60], semidiurnal(xs[xs <= 23 * 60]), atol=2.5)
+
+    def test_cosine(self):
+        xs, heights = curve(tide(), 10, COSINE)
+        np.testing.assert_allclose(heights, semidiurnal(xs), atol=3.0)
+
+    def test_bad_method(self):
+        with self.assertRaises(ValueError):
+            curve(tide(), 10, 'linear')
@@ -0,0 +1,99 @@
+import datetime
+from unittest import TestCase
+
+import numpy as np
+from analysis.series import TideSeries
+from crawlers.c_model import CPort, CTide
+from storages.model import TideItem
+
+
+class _Port(CPort):
+    def __init__(self, object_id: str) -> None:
+        super().__init__()
+        self._object_id = object_id
+
+    @property
+    def objectId(self):
+        return self._object_id
+
+
+def semidiurnal(minutes, shift=0):
+    """M2-like tide, period 12.42 hours, high water at :param:`shift` minutes."""
+    return 200 + 150 * np.cos(2 * np.pi * (np.asarray(minutes) - shift) / (12.42 * 60))
+
+
+def tide(shift=0, hours=range(24), d=datetime.date(2022, 4, 7)):
+    t = CTide()
+    t.date = datetime.datetime(d.year, d.month, d.day)
+    t.day = [TideItem(datetime.time(h), float(semidiurnal(h * 60, shift))) for h in hours]
+    return t
+
+
+class TestTideSeries(TestCase):
+    def setUp(self) -> None:
+        self.series = TideSeries.from_tides([tide(0), tide(200), tide(hours=[3])])
+
+    def test_from_tides(self):
+        self.assertEqual(self.series.heights.shape, (3, 24))
+        self.assertTrue(np.isnan(self.series.heights[2]).all())
+        self.assertEqual(self.series.labels[0], (None, datetime.date(2022, 4, 7)))
+
+    def test_fill_missing_hours(self):
+        series = TideSeries.from_tides([tide(hours=[h for h in range(24) if h != 5])])
+        self.assertAlmostEqual(series.heights[0, 5],
+                               (semidiurnal(240) + semidiurnal(360)) / 2)
+
+    def test_rows_of(self):
+        t1, t2 = tide(0), tide(200)
+        t1.port, t2.port = _Port('p1'), _Port('p2')
+        rows = TideSeries.from_tides([t1, t2]).rows_of(['p2', 'p3', 'p1'])
+        self.assertEqual(rows.shape, (3, 24))
+        self.assertTrue(np.isnan(rows[1]).all())
+        self.assertAlmostEqual(rows[2, 0], semidiurnal(0))
+        self.assertAlmostEqual(rows[0, 0], semidiurnal(0, 200))
+        self.assertEqual(TideSeries.from_tides([]).rows_of(['p1']).shape, (1, 24))
+
+    def test_ranges(self):
+        ranges = self.series.ranges()
+        self.assertGreater(ranges[0], 290)
+        self.assertTrue(np.isnan(ranges[2]))
+
+    def test_extrema(self):
+        extrema = self.series.extrema()
+        # shifted high water at 200 minutes, low water 6.21 hours later
+        high, low = extrema[1][0], extrema[1][1]
+        self.assertTrue(high.high)
+        self.assertAlmostEqual(high.minute, 200, delta=3)
+        self.assertAlmostEqual(high.height, 350, delta=1)
+        self.assertFalse(low.high)
+        self.assertAlmostEqual(low.minute, 200 + 6.21 * 60, delta=3)
+        self.assertAlmostEqual(low.height, 50, delta=1)
+        self.assertListEqual(extrema[2], [])
+
+    def test_windows(self):
+        windows = self.series.windows(lower=275)
+        # cos(2pi(t-s)/T) >= 0.5 when |t-s| <= T/6
+        sixth = 12.42 * 60 / 6
+        w = windows[1][0]
+        self.assertAlmostEqual(w.start, 200 - sixth, delta=2)
+        self.assertAlmostEqual(w.end, 200 + sixth, delta=2)
+        self.assertEqual(len(windows[1]), 2)
+        # starts from 00:00
+        self.assertEqual(windows[0][0].start, 0)
+        self.assertListEqual(windows[2], [])
+
+    def test_windows_between(self):
+        windows = self.series.windows(lower=100, upper=300)
+        for w in windows[0]:
+            self.assertLess(w.start, w.end)
+            mid = semidiurnal((w.start + w.end) / 2)
+            self.assertTrue(100 <= mid <= 300)
+
+    def test_windows_no_bound(self):
+        with self.assertRaises(ValueError):
+            self.series.windows()
+
+    def test_empty(self):
+        series = TideSeries.from_tides([])
+        self.assertEqual(len(series.ranges()), 0)
+        self.assertListEqual(series.windows(lower=1), [])
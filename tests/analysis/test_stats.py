@@ -0,0 +1,84 @@
+import datetime
+from unittest import TestCase
+
+from analysis.stats import (checksum, day_stats, derive, first_high,
+                            merge_days, summarize)
+from crawlers.c_model import CTide
+from storages.model import TideItem
+
+
+def tide(d: datetime.date, offset: float = 0):
+    t = CTide()
+    t.date = datetime.datetime(d.year, d.month, d.day)
+    t.day = [TideItem(datetime.time(h), float(h) + offset) for h in range(24)]
+    t.limit = [TideItem(datetime.time(23, 30), 30.0 + offset), TideItem(datetime.time(0, 10), -1.0 + offset)]
+    return t
+
+
+class TestStats(TestCase):
+    def test_day_stats(self):
+        s = day_stats(tide(datetime.date(2022, 4, 1)))
+        self.assertEqual(s['date'], '2022-04-01')
+        self.assertEqual((s['min'], s['minTime']), (-1.0, '00:10:00'))
+        self.assertEqual((s['max'], s['maxTime']), (30.0, '23:30:00'))
+        self.assertEqual((s['sum'], s['count']), (276.0, 24))
+
+    def test_day_stats_empty(self):
+        t = CTide()
+        t.day = [TideItem(None, 1.0), TideItem(datetime.time(1), None)]
+        self.assertIsNone(day_stats(t))
+
+    def test_merge_days(self):
+        d1, d2 = datetime.date(2022, 4, 1), datetime.date(2022, 4, 2)
+        days = merge_days([], day_stats(tide(d2)))
+        days = merge_days(days, day_stats(tide(d1)), None)
+        self.assertEqual([d['date'] for d in days], ['2022-04-01', '2022-04-02'])
+        # merge the same day again replaces it
+        days = merge_days(days, day_stats(tide(d2, 10)))
+        self.assertEqual(len(days), 2)
+        self.assertEqual(days[1]['max'], 40.0)
+
+    def test_summarize(self):
+        days = merge_days([], day_stats(tide(datetime.date(2022, 4, 1))),
+                          day_stats(tide(datetime.date(2022, 4, 2), 10)))
+        s = summarize(days)
+        self.assertEqual(s.count, 2)
+        self.assertEqual(s.min, (datetime.datetime(2022, 4, 1, 0, 10), -1.0))
+        self.assertEqual(s.max, (datetime.datetime(2022, 4, 2, 23, 30), 40.0))
+        self.assertEqual(s.mean, 16.5)
+        self.assertEqual(s.mean_range, 31.0)
+        self.assertEqual(summarize([]).count, 0)
+
+    def test_derive(self):
+        t = tide(datetime.date(2022, 4, 1))
+        f = derive(t)
+        self.assertEqual((f.max, f.min, f.range), (30.0, -1.0, 31.0))
+        # the later limit is higher
+        self.assertEqual(f.first_high, datetime.datetime(2022, 4, 1, 23, 30))
+        self.assertEqual(f.checksum, checksum(tide(datetime.date(2022, 4, 1))))
+        self.assertNotEqual(f.checksum, checksum(tide(datetime.date(2022, 4, 1), 1)))
+
+    def test_derive_empty(self):
+        t = CTide()
+        t.date = datetime.datetime(2022, 4, 1)
+        f = derive(t)
+        self.assertEqual((f.max, f.min, f.range, f.first_high), (None, None, None, None))
+        self.assertEqual(len(f.checksum), 40)
+
+    def test_first_high(self):
+        t = CTide()
+        t.date = datetime.datetime(2022, 4, 1)
+        t.day = [TideItem(datetime.time(h), float(abs(h - 6))) for h in range(12)]
+        # only hourly heights, the first local maximum
+        self.assertIsNone(first_high(t))
+        t.day = [TideItem(datetime.time(h), float(-abs(h - 6))) for h in range(12)]
+        self.assertEqual(first_high(t), datetime.datetime(2022, 4, 1, 6))
+        # limits in any order
+        t.limit = [TideItem(datetime.time(18, 20), 120.0), TideItem(datetime.time(12, 5), 10.0),
+                   TideItem(datetime.time(5, 50), 100.0)]
+        self.assertEqual(first_high(t), datetime.datetime(2022, 4, 1, 5, 50))
+        # the only limit is a high water if higher than mean of hourly heights
+        t.limit = [TideItem(datetime.time(5, 50), 1.0)]
+        self.assertEqual(first_high(t), datetime.datetime(2022, 4, 1, 5, 50))
+        t.limit = [TideItem(datetime.time(5, 50), -5.0)]
+        self.assertIsNone(first_high(t))
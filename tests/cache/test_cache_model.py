@@ -0,0 +1,83 @@
+import datetime
+import json
+from unittest import TestCase
+
+from unittest.mock import patch
+
+from cache.cache_model import CacheTide, aliases_of
+from crawlers.c_model import CPort, CTide
+from storages.model import TideItem, TideItemArray
+
+
+def tide():
+    t = CTide()
+    t.date = datetime.datetime(2022, 4, 7)
+    t.day = [TideItem(datetime.time(i), i + 0.1) for i in range(24)]
+    t.limit = [TideItem(datetime.time(3, 37), 1.0)]
+    t.datum = -91
+    return t
+
+
+class TestCacheTide(TestCase):
+    def test_to_record(self):
+        t = tide()
+        record = CacheTide.to_record(t, 'p1')
+        self.assertIsInstance(record[CacheTide.DAY], str)
+        c = CacheTide(json.loads(json.dumps(record)))
+        self.assertEqual([i.to_dict() for i in t.day], [i.to_dict() for i in c.day])
+        self.assertEqual([i.to_dict() for i in t.limit], [i.to_dict() for i in c.limit])
+        self.assertEqual(24, len(c.day_array))
+
+    def test_legacy_record(self):
+        t = tide()
+        record = CacheTide.to_record(t, 'p1')
+        record[CacheTide.DAY] = [i.to_dict() for i in t.day]
+        c = CacheTide(record)
+        self.assertEqual(c.day[1].time, datetime.time(1))
+        self.assertEqual(c.day[1].height, 1.1)
+
+    def test_dicts(self):
+        t = tide()
+        c = CacheTide(CacheTide.to_record(t, 'p1'))
+        self.assertEqual(c.day_dicts, [i.to_dict() for i in t.day])
+        self.assertEqual(c.limit_dicts, [{'time': '03:37:00', 'height': 1}])
+        record = CacheTide.to_record(t, 'p1')
+        record[CacheTide.DAY] = [i.to_dict() for i in t.day]
+        self.assertEqual(CacheTide(record).day_dicts, [i.to_dict() for i in t.day])
+
+    def test_decode_once(self):
+        c = CacheTide(CacheTide.to_record(tide(), 'p1'))
+        with patch('cache.cache_model.TideItemArray.decode', wraps=TideItemArray.decode) as decode:
+            c.day_dicts
+            c.day
+            self.assertIs(c.day_array, c.day_array)
+            self.assertEqual(decode.call_count, 1)
+            c.day = [TideItem(datetime.time(1), 2.0)]
+            self.assertEqual(c.day_dicts, [{'time': '01:00:00', 'height': 2}])
+            self.assertEqual(decode.call_count, 2)
+
+    def test_set_day(self):
+        c = CacheTide()
+        c.day = [TideItem(datetime.time(1), 2.0)]
+        self.assertEqual(c.day[0].height, 2.0)
+        self.assertEqual(c.limit, [])
+
+
+class TestAliases(TestCase):
+    def test_aliases_of_list(self):
+        raw = json.dumps({'data': [{'code': f'T{i:03d}', 'enname': f'PORT{i}', 'pyname': ' '}
+                                   for i in range(100)]})
+        ports = []
+        for i in range(100):
+            p = CPort()
+            p.rid, p.raw = f'T{i:03d}', raw
+            ports.append(p)
+        with patch('cache.cache_model.json.loads', wraps=json.loads) as loads:
+            self.assertListEqual([aliases_of(p) for p in ports], [[f'PORT{i}'] for i in range(100)])
+            # raw data shared by the list is parsed once
+            loads.assert_called_once()
+        p = CPort()
+        p.rid, p.raw = 'T999', raw
+        self.assertListEqual(aliases_of(p), [])
+        p.raw = 'not json'
+        self.assertListEqual(aliases_of(p), [])
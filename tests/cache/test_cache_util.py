@@ -0,0 +1,455 @@
+import asyncio
+import datetime
+import json
+import math
+import os
+import tempfile
+import time
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, patch
+
+from cache.cache_model import CacheProvince, CacheTideStats
+from cache.cache_util import CacheUtil
+from cache.memory_cache import MemoryCache
+from cache.snapshot import Snapshot
+from crawlers.c_model import CArea, CPort, CTide
+from storages.basedbutil import IDT
+from storages.changelog import ChangeLog
+from storages.common import ExecState
+from storages.model import TideItem
+from utils.singleton import SingletonMeta
+
+
+def new_cache_util(db_util) -> CacheUtil:
+    """Create a :class:`CacheUtil` without singleton container."""
+    return super(SingletonMeta, CacheUtil).__call__(MemoryCache(), db_util)
+
+
+class _Area(CArea):
+    """Area with objectId as stored one."""
+
+    def __init__(self, object_id: str) -> None:
+        super().__init__()
+        self._object_id = object_id
+
+    @property
+    def objectId(self):
+        return self._object_id
+
+
+class _Port(CPort):
+    def __init__(self, object_id: str) -> None:
+        super().__init__()
+        self._object_id = object_id
+
+    @property
+    def objectId(self):
+        return self._object_id
+
+
+def area(object_id: str = 'a1', rid: str = 'r1', name: str = 'n1'):
+    a = _Area(object_id)
+    a.rid = rid
+    a.name = name
+    return a
+
+
+def port(object_id: str = 'p1', rid: str = 'T001'):
+    p = _Port(object_id)
+    p.rid = rid
+    p.name = 'port'
+    p.zone = ''
+    p.geopoint = (1.0, 2.0)
+    return p
+
+
+def tide(d: datetime.date):
+    t = CTide()
+    t.date = datetime.datetime(d.year, d.month, d.day)
+    t.day = [TideItem(datetime.time(i), float(i)) for i in range(24)]
+    t.limit = [TideItem(datetime.time(3, 37), 1.0)]
+    t.datum = -91
+    t.port = CPort()
+    t.port.rid = 'T001'
+    return t
+
+
+class TestCacheUtil(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.db = AsyncMock()
+        self.cu = new_cache_util(self.db)
+
+    async def test_get_area_read_through(self):
+        self.db.get_area.return_value = area()
+        a1 = await self.cu.get_area('a1', IDT.ID)
+        a2 = await self.cu.get_area('a1', IDT.ID)
+        self.db.get_area.assert_awaited_once()
+        self.assertEqual(a1.objectId, 'a1')
+        self.assertEqual(a2.name, 'n1')
+
+    async def test_get_area_unexist(self):
+        self.db.get_area.return_value = None
+        self.assertIsNone(await self.cu.get_area('a1', IDT.ID))
+
+    async def test_get_area_rid_not_cached(self):
+        self.db.get_area.return_value = area()
+        await self.cu.get_area('r1', IDT.RID)
+        await self.cu.get_area('r1', IDT.RID)
+        self.assertEqual(self.db.get_area.await_count, 2)
+
+    async def test_get_areas(self):
+        self.db.get_areas.return_value = [area('a1'), area('a2')]
+        await self.cu.get_areas()
+        areas = await self.cu.get_areas()
+        self.db.get_areas.assert_awaited_once()
+        self.assertListEqual([a.objectId for a in areas], ['a1', 'a2'])
+
+    async def test_add_area_unchanged(self):
+        """cached area has the same rid and name, skip writing"""
+        self.db.get_area.return_value = area()
+        a = area(None)
+        (ret, _) = await self.cu.add_area(a, IDT.RID)
+        self.assertEqual(ret, ExecState.EXIST)
+        self.db.add_area.assert_not_awaited()
+
+    async def test_add_area_evict_areas(self):
+        self.db.get_areas.return_value = [area('a1')]
+        await self.cu.get_areas()
+        self.db.get_area.return_value = None
+        self.db.add_area.return_value = (ExecState.CREATE, area('a2'))
+        await self.cu.add_area(area(None, 'r2', 'n2'), IDT.RID)
+        self.db.get_areas.return_value = [area('a1'), area('a2')]
+        areas = await self.cu.get_areas()
+        self.assertEqual(len(areas), 2)
+
+    async def test_find_tides_cached(self):
+        d = datetime.date(2022, 4, 7)
+        t = tide(d)
+        t.port = port('p1')
+        self.db.find_tides.return_value = [t]
+        found = await self.cu.find_tides(d, min_range=20)
+        self.db.find_tides.assert_awaited_once_with(d, 20, None, None, None, None, None)
+        self.assertEqual([f.port.objectId for f in found], ['p1'])
+        # found tides are read through cache
+        self.assertEqual(len((await self.cu.get_tide('p1', d)).day), 24)
+        self.db.get_tide.assert_not_awaited()
+
+    async def test_get_stats_evict(self):
+        self.db.get_stats.return_value = CacheTideStats(
+            {'objectId': 's1', 'port': 'p1', 'year': 2022, 'month': 4, 'days': []})
+        self.assertEqual((await self.cu.get_stats('p1', 2022, 4)).objectId, 's1')
+        await self.cu.get_stats('p1', 2022, 4)
+        self.db.get_stats.assert_awaited_once()
+        self.assertEqual(self.cu._keys_of({'entity': 'stats', 'id': 's1', 'parent': 'p1', 'date': '2022-04'}),
+                         ['stats:p1:2022-04'])
+        self.assertEqual(self.cu._keys_of({'entity': 'tide', 'id': 't1', 'parent': 'p1', 'date': '2022-04-07'}),
+                         ['tide:p1:2022-04-07'])
+
+    async def test_get_stored_tide(self):
+        d = datetime.date(2022, 4, 7)
+        self.db.get_tide.return_value = None
+        self.assertIsNone(await self.cu.get_stored_tide('p1', d))
+        self.db.get_port.assert_not_awaited()
+        self.db.get_tide.return_value = tide(d)
+        self.assertEqual(len((await self.cu.get_stored_tide('p1', d)).day), 24)
+        self.assertIsNotNone(self.cu.get_cached_tide('p1', d))
+
+    async def test_rebuild_stats(self):
+        t = tide(datetime.date(2022, 4, 7))
+        t.port = port()
+        self.db.add_tide.return_value = (ExecState.CREATE, t)
+        self.db.add_stats.return_value = (ExecState.UPDATE, CacheTideStats(
+            {'objectId': 's1', 'port': 'p1', 'year': 2022, 'month': 4, 'days': []}))
+        await self.cu.add_tide(t, IDT.ID)
+        self.db.get_tides_range.return_value = [t, tide(datetime.date(2022, 4, 1))]
+        self.assertEqual(await self.cu.rebuild_stats(), 1)
+        self.db.get_tides_range.assert_awaited_once_with(
+            'p1', datetime.date(2022, 4, 1), datetime.date(2022, 4, 30))
+        (port_id, year, month, days) = self.db.add_stats.await_args.args
+        self.assertEqual((port_id, year, month), ('p1', 2022, 4))
+        # the whole month is rebuilt from storage
+        self.assertEqual([d['date'] for d in days], ['2022-04-01', '2022-04-07'])
+        self.assertEqual(await self.cu.rebuild_stats(), 0)
+
+    async def test_rebuild_stats_failed(self):
+        t = tide(datetime.date(2022, 4, 7))
+        t.port = port()
+        self.db.add_tide.return_value = (ExecState.CREATE, t)
+        await self.cu.add_tide(t, IDT.ID)
+        self.db.get_tides_range.side_effect = Exception('down')
+        self.assertEqual(await self.cu.rebuild_stats(), 0)
+        self.db.get_tides_range.side_effect = None
+        self.db.get_tides_range.return_value = [t]
+        self.db.add_stats.return_value = (ExecState.UPDATE, CacheTideStats(
+            {'objectId': 's1', 'port': 'p1', 'year': 2022, 'month': 4, 'days': []}))
+        self.assertEqual(await self.cu.rebuild_stats(), 1)
+
+    @patch('cache.cache_util.CrawlerService')
+    async def test_get_tide_crawl(self, crawler):
+        d = datetime.date(2022, 4, 7)
+        self.db.get_tide.return_value = None
+        self.db.get_port.return_value = port()
+        self.db.add_tide.return_value = (ExecState.FAIL, Exception())
+        crawler.return_value.crawl_tide = AsyncMock(return_value=tide(d))
+        t1 = await self.cu.get_tide('p1', d)
+        t2 = await self.cu.get_tide('p1', d)
+        crawler.return_value.crawl_tide.assert_awaited_once_with(d, 'T001')
+        self.db.add_tide.assert_awaited_once()
+        self.assertEqual(t1.port.objectId, 'p1')
+        self.assertEqual(t2.date.date(), d)
+        self.assertEqual(len(t2.day), 24)
+        self.assertEqual(t2.day[3].time, datetime.time(3))
+
+    @patch('cache.cache_util.CrawlerService')
+    async def test_get_tide_coalesce(self, crawler):
+        d = datetime.date(2022, 4, 7)
+
+        async def crawl(d, rid):
+            await asyncio.sleep(0.01)
+            return tide(d)
+        self.db.get_tide.return_value = None
+        self.db.get_tides.return_value = {}
+        self.db.get_port.return_value = port()
+        self.db.add_tide.return_value = (ExecState.FAIL, Exception())
+        crawler.return_value.crawl_tide = AsyncMock(side_effect=crawl)
+        tides = await asyncio.gather(*[self.cu.get_tide('p1', d) for _ in range(5)],
+                                     self.cu.get_tides(['p1'], d))
+        self.assertTrue(all(t.date.date() == d for t in tides[:5]))
+        self.assertIn('p1', tides[5])
+        crawler.return_value.crawl_tide.assert_awaited_once()
+        self.db.get_tide.assert_awaited_once()
+        self.db.add_tide.assert_awaited_once()
+        self.db.get_port.assert_awaited_once()
+
+    async def test_prewarm(self):
+        self.db.get_tide.side_effect = lambda port_id, d: tide(d)
+        count = await self.cu.prewarm(['p1', 'p2'], 2, 2)
+        self.assertEqual(count, 4)
+        tomorrow = datetime.date.today() + datetime.timedelta(1)
+        self.assertIsNotNone(self.cu.cache.get(f'tide:p2:{tomorrow}'))
+
+    @patch('cache.cache_util.CrawlerService')
+    async def test_get_tides(self, crawler):
+        d = datetime.date(2022, 4, 7)
+        self.db.get_tide.return_value = tide(d)
+        await self.cu.get_tide('p1', d)
+        self.db.get_tides.return_value = {'p2': tide(d)}
+        self.db.get_port.side_effect = lambda p, col: port(p) if p == 'p3' else None
+        self.db.add_tide.return_value = (ExecState.FAIL, Exception())
+        crawler.return_value.crawl_tide = AsyncMock(return_value=tide(d))
+        tides = await self.cu.get_tides(['p1', 'p2', 'p3', 'p4', 'p1'], d)
+        self.assertListEqual(list(tides.keys()), ['p1', 'p2', 'p3'])
+        self.db.get_tides.assert_awaited_once_with(['p2', 'p3', 'p4'], d)
+        crawler.return_value.crawl_tide.assert_awaited_once_with(d, 'T001')
+        self.assertEqual(tides['p3'].port.objectId, 'p3')
+        # all found are cached
+        self.db.get_tides.reset_mock()
+        tides = await self.cu.get_tides(['p2', 'p3'], d)
+        self.assertEqual(len(tides), 2)
+        self.db.get_tides.assert_not_awaited()
+
+    @patch('cache.cache_util.HarmonicSetting.FALLBACK', False)
+    @patch('cache.cache_util.CrawlerService')
+    async def test_iter_tides(self, crawler):
+        start = datetime.date(2022, 4, 1)
+        days = [start + datetime.timedelta(i) for i in range(5)]
+        self.db.get_tide.return_value = tide(days[1])
+        await self.cu.get_tide('p1', days[1])
+        self.db.get_tides_range.return_value = [tide(days[2]), tide(days[4])]
+        self.db.get_port.return_value = port()
+        self.db.add_tide.return_value = (ExecState.FAIL, Exception())
+        crawler.return_value.crawl_tide = AsyncMock(
+            side_effect=lambda d, rid: tide(d) if d == days[0] else None)
+        tides = [t async for t in self.cu.iter_tides('p1', days[0], days[4])]
+        self.assertListEqual([t.date.date() for t in tides],
+                             [days[1], days[2], days[4], days[0]])
+        self.db.get_tides_range.assert_awaited_once_with('p1', days[0], days[4])
+        self.assertEqual(crawler.return_value.crawl_tide.await_count, 2)
+        # stored and crawled are cached
+        self.db.get_tides_range.reset_mock()
+        tides = [t async for t in self.cu.iter_tides('p1', days[0], days[2])]
+        self.assertEqual(len(tides), 3)
+        self.db.get_tides_range.assert_not_awaited()
+
+    def stored_tides(self, days: int):
+        """Stored tides of recent :param:`days` days, with a semidiurnal tide."""
+        today = datetime.date.today()
+        tides = []
+        for i in range(days, 0, -1):
+            t = tide(today - datetime.timedelta(i))
+            t.day = [TideItem(datetime.time(h), 200 + 150 * math.cos(
+                math.radians(28.9841042 * (i * -24 + h)))) for h in range(24)]
+            t.limit = []
+            tides.append(t)
+        return tides
+
+    @patch('cache.cache_util.CrawlerService')
+    async def test_predict_fallback(self, crawler):
+        d = datetime.date.today() + datetime.timedelta(3)
+        self.db.get_tide.return_value = None
+        self.db.get_port.return_value = port()
+        self.db.get_tides_range.return_value = self.stored_tides(40)
+        crawler.return_value.crawl_tide = AsyncMock(side_effect=TimeoutError())
+        t = await self.cu.get_tide('p1', d)
+        self.assertTrue(t.predicted)
+        self.assertEqual(t.date.date(), d)
+        self.assertEqual(len(t.day), 24)
+        self.assertGreaterEqual(len(t.limit), 3)
+        self.assertEqual(t.datum, -91)
+        self.db.add_tide.assert_not_awaited()
+        # model is cached
+        await self.cu.predict_tide('p1', d + datetime.timedelta(1))
+        self.db.get_tides_range.assert_awaited_once()
+
+    @patch('cache.cache_util.CrawlerService')
+    async def test_predict_fallback_too_few(self, crawler):
+        self.db.get_tide.return_value = None
+        self.db.get_port.return_value = port()
+        self.db.get_tides_range.return_value = self.stored_tides(3)
+        crawler.return_value.crawl_tide = AsyncMock(side_effect=TimeoutError())
+        with self.assertRaises(TimeoutError):
+            await self.cu.get_tide('p1', datetime.date.today())
+        crawler.return_value.crawl_tide = AsyncMock(return_value=None)
+        self.assertIsNone(await self.cu.get_tide('p1', datetime.date.today()))
+
+    async def test_get_port_index(self):
+        self.db.get_areas.return_value = [area('a1')]
+        self.db.get_provinces.return_value = [CacheProvince({'objectId': 'pr1'})]
+        no_geopoint = port('p3')
+        no_geopoint.geopoint = None
+        self.db.get_ports.return_value = [port('p1'), port('p2'), no_geopoint]
+        v1, i1 = await self.cu.get_port_index()
+        self.assertEqual(len(i1), 2)
+        self.assertEqual(i1.nearest(1.0, 2.0)[0][1], 0)
+        v2, i2 = await self.cu.get_port_index()
+        self.assertEqual(v1, v2)
+        self.assertIs(i1, i2)
+        # unchanged hierarchy isn't walked again
+        with patch.object(self.cu, 'get_all_ports') as get_all_ports:
+            self.assertIs((await self.cu.get_port_index())[1], i1)
+            get_all_ports.assert_not_called()
+        self.db.get_ports.return_value = [port('p1')]
+        await self.cu.refresh_hierarchy()
+        v3, i3 = await self.cu.get_port_index()
+        self.assertNotEqual(v1, v3)
+        self.assertEqual(len(i3), 1)
+
+    async def test_get_search_index(self):
+        p1 = port('p1')
+        p1.name = '岐口'
+        p1.rid = 'T025'
+        p1.raw = json.dumps({'data': [{'code': 'T024', 'enname': 'TANGGU'},
+                                      {'code': 'T025', 'enname': 'QIKOU', 'pyname': 'QK'}]})
+        self.db.get_areas.return_value = [area('a1', name='中国近海海域')]
+        self.db.get_provinces.return_value = [CacheProvince({'objectId': 'pr1', 'name': '天津'})]
+        self.db.get_ports.return_value = [p1]
+        index, docs = await self.cu.get_search_index()
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.search('qikou')[0][0], ('port', 'p1'))
+        self.assertEqual(docs[('port', 'p1')].name, '岐口')
+        self.assertEqual(index.search('天津')[0][0], ('province', 'pr1'))
+        # lists loaded by the first walk are indexed again once
+        index, docs = await self.cu.get_search_index()
+        with patch.object(self.cu, 'get_hierarchy') as get_hierarchy:
+            self.assertIs((await self.cu.get_search_index())[1], docs)
+            get_hierarchy.assert_not_called()
+        self.db.get_ports.return_value = []
+        await self.cu.refresh_hierarchy()
+        index, docs = await self.cu.get_search_index()
+        self.assertEqual(len(index), 2)
+        self.assertListEqual(index.search('qk'), [])
+
+    async def test_get_tide_port_unexist(self):
+        self.db.get_tide.return_value = None
+        self.db.get_port.return_value = None
+        self.assertIsNone(await self.cu.get_tide('p1', datetime.date.today()))
+
+
+class TestCacheUtilSnapshot(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.dir = tempfile.TemporaryDirectory()
+        self.db = AsyncMock()
+        self.cu = new_cache_util(self.db)
+        self.cu.snapshot = Snapshot(os.path.join(self.dir.name, 'snapshot.gz'))
+
+    def tearDown(self) -> None:
+        self.dir.cleanup()
+
+    async def test_save_load(self):
+        self.db.get_areas.return_value = [area('a1'), area('a2')]
+        await self.cu.get_areas()
+        self.cu.cache.set('tide:p1:2000-01-01', {})
+        self.cu.cache.set('tide:p1:2999-01-01', {})
+        self.assertEqual(self.cu.save_snapshot(), 2)
+        restarted = new_cache_util(self.db)
+        restarted.snapshot = self.cu.snapshot
+        self.assertEqual(restarted.load_snapshot(), 2)
+        areas = await restarted.get_areas()
+        self.db.get_areas.assert_awaited_once()
+        self.assertListEqual([a.objectId for a in areas], ['a1', 'a2'])
+        self.assertIsNotNone(restarted.cache.get('tide:p1:2999-01-01'))
+
+    async def test_load_remaining_ttl(self):
+        self.cu.cache.set('tide:p1:2999-01-01', {}, 100)
+        self.cu.cache.set('tide:p1:2999-01-02', {}, 1000)
+        self.cu.cache.set('tide:p1:2999-01-03', {})
+        self.assertEqual(self.cu.save_snapshot(), 3)
+        restarted = new_cache_util(self.db)
+        restarted.snapshot = self.cu.snapshot
+        with patch('cache.cache_util.time.time', return_value=time.time() + 500):
+            self.assertEqual(restarted.load_snapshot(), 2)
+        # expired before restarted
+        self.assertIsNone(restarted.cache.get('tide:p1:2999-01-01'))
+        expire = restarted.cache.expire_of('tide:p1:2999-01-02')
+        self.assertAlmostEqual(expire, self.cu.cache.expire_of('tide:p1:2999-01-02'), delta=2)
+        self.assertIsNone(restarted.cache.expire_of('tide:p1:2999-01-03'))
+        self.assertIsNotNone(restarted.cache.get('tide:p1:2999-01-03'))
+
+    async def test_load_unexist(self):
+        self.assertEqual(self.cu.load_snapshot(), 0)
+
+    async def test_refresh_hierarchy(self):
+        self.db.get_areas.return_value = [area('a1')]
+        await self.cu.get_areas()
+        self.assertEqual(await self.cu.refresh_hierarchy(), 0)
+        self.db.get_areas.return_value = [area('a1'), area('a2')]
+        self.assertEqual(await self.cu.refresh_hierarchy(), 1)
+        areas = await self.cu.get_areas()
+        self.assertListEqual([a.objectId for a in areas], ['a1', 'a2'])
+        self.assertIsNotNone(self.cu.cache.get('area:a2'))
+
+
+class TestCacheUtilChangeLog(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.dir = tempfile.TemporaryDirectory()
+        self.db = AsyncMock()
+        self.cu = new_cache_util(self.db)
+        self.publisher = ChangeLog(os.path.join(self.dir.name, 'changelog'), source='other')
+        self.cu.changelog = ChangeLog(self.publisher.path)
+        self.cu.changelog.subscribe()
+
+    def tearDown(self) -> None:
+        self.dir.cleanup()
+
+    async def test_apply_changes(self):
+        self.db.get_areas.return_value = [area('a1')]
+        self.db.get_area.return_value = area('a1')
+        await self.cu.get_areas()
+        await self.cu.get_area('a1', IDT.ID)
+        self.cu.cache.set('tide:p1:2022-04-07', {})
+        self.cu.cache.set('tide:p1:2022-04-08', {})
+        self.publisher.publish('area', 'a2')
+        self.publisher.publish('tide', 't1', 'p1', '2022-04-07')
+        self.assertEqual(self.cu.apply_changes(), 2)
+        self.assertIsNone(self.cu.cache.get('areas'))
+        self.assertIsNotNone(self.cu.cache.get('area:a1'))
+        self.assertIsNone(self.cu.cache.get('tide:p1:2022-04-07'))
+        self.assertIsNotNone(self.cu.cache.get('tide:p1:2022-04-08'))
+        self.assertSetEqual(self.cu._stale_stats, {('p1', 2022, 4)})
+
+    async def test_skip_own_changes(self):
+        self.cu.cache.set('tide:p1:2022-04-07', {})
+        ChangeLog(self.publisher.path).publish('tide', 't1', 'p1', '2022-04-07')
+        self.publisher.publish('tide', 't2', 'p1', '2022-04-08')
+        self.assertEqual(self.cu.apply_changes(), 1)
+        self.assertIsNotNone(self.cu.cache.get('tide:p1:2022-04-07'))
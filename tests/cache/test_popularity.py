@@ -0,0 +1,42 @@
+from unittest import TestCase
+
+from cache.popularity import Popularity
+
+
+class TestPopularity(TestCase):
+    def test_top(self):
+        p = Popularity(half_life=60)
+        for k, n in [('a', 3), ('b', 5), ('c', 1)]:
+            for _ in range(n):
+                p.hit(k, now=p._landmark)
+        top = p.top(2, now=p._landmark)
+        self.assertListEqual([k for k, _ in top], ['b', 'a'])
+        self.assertAlmostEqual(top[0][1], 5)
+
+    def test_decay(self):
+        """old hits weigh less than new hits"""
+        p = Popularity(half_life=60)
+        t0 = p._landmark
+        for _ in range(3):
+            p.hit('old', now=t0)
+        for _ in range(2):
+            p.hit('new', now=t0 + 120)
+        top = p.top(2, now=t0 + 120)
+        self.assertListEqual([k for k, _ in top], ['new', 'old'])
+        self.assertAlmostEqual(top[1][1], 0.75)
+
+    def test_rescale(self):
+        p = Popularity(half_life=1)
+        t0 = p._landmark
+        p.hit('a', now=t0)
+        p.hit('b', now=t0 + 100)
+        top = p.top(2, now=t0 + 100)
+        self.assertListEqual([k for k, _ in top], ['b', 'a'])
+        self.assertAlmostEqual(top[0][1], 1)
+
+    def test_capacity(self):
+        p = Popularity(capacity=2)
+        for k in ['a', 'a', 'b', 'b', 'c', 'd', 'e']:
+            p.hit(k, now=p._landmark)
+        self.assertLessEqual(len(p._scores), 4)
+        self.assertSetEqual({k for k, _ in p.top(2)}, {'a', 'b'})
@@ -0,0 +1,176 @@
+import os
+import tempfile
+import time
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+from cache.shared_cache import SharedCache
+
+
+class TestSharedCache(TestCase):
+    def setUp(self) -> None:
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'shared.cache')
+        # two instances act as two worker processes
+        self.writer = SharedCache(self.path, check_interval=0)
+        self.reader = SharedCache(self.path, check_interval=0)
+        self.assertTrue(self.writer.is_writer())
+
+    def tearDown(self) -> None:
+        del self.writer
+        del self.reader
+        self.dir.cleanup()
+
+    def test_get_unexist(self):
+        self.assertIsNone(self.reader.get('abc'))
+
+    def test_set_get(self):
+        self.writer.set('area:1', {'name': '中国近海海域', 'geopoint': [1.0, 2.0]})
+        self.writer.set('areas', [1, 2, 3])
+        self.assertDictEqual(self.reader.get('area:1'),
+                             {'name': '中国近海海域', 'geopoint': [1.0, 2.0]})
+        self.assertListEqual(self.reader.get('areas'), [1, 2, 3])
+
+    def test_get_many(self):
+        self.writer.set_many({'a': 1, 'b': [2]})
+        self.writer.set('c', 3, ttl=-1)
+        self.assertDictEqual(self.reader.get_many(['a', 'b', 'c', 'd']), {'a': 1, 'b': [2]})
+
+    def test_set_not_writer(self):
+        """items of other processes are spooled to the writer, and kept in their memory until written"""
+        self.writer.set_many({'a': 1, 'b': 2})
+        self.reader.set('c', 3)
+        self.assertEqual(self.reader.get('a'), 1)
+        self.assertEqual(self.reader.get('c'), 3)
+        self.assertIn('c', self.reader._local.keys())
+        self.assertNotIn('c', SharedCache(self.path).keys())
+        # moved to the shared file on next check of the writer
+        self.assertEqual(self.writer.get('c'), 3)
+        self.assertEqual(SharedCache(self.path).get('c'), 3)
+        self.assertEqual(self.reader.get('c'), 3)
+        self.assertListEqual(self.reader._local.keys(), [])
+
+    def test_set_not_writer_mapped(self):
+        """items already in the shared file are neither kept nor spooled"""
+        self.writer.set('a', [1])
+        self.reader.set_many({'a': [1], 'b': 2})
+        self.assertListEqual(self.reader._local.keys(), ['b'])
+        with open(f'{self.path}.spool', 'rb') as f:
+            self.assertEqual(f.read().count(b'\n'), 1)
+        self.reader.set('a', [2])
+        self.assertEqual(self.reader.get('a'), [2])
+        self.assertEqual(self.writer.get('a'), [2])
+
+    def test_spool_ordered(self):
+        """a spooled item is never written after a later delete"""
+        self.reader.set('a', 1)
+        self.reader.delete('a')
+        self.assertIsNone(self.writer.get('a'))
+        self.assertIsNone(SharedCache(self.path).get('a'))
+
+    def test_spool_before_election(self):
+        """items spooled before the writer is elected are ignored"""
+        path = os.path.join(self.dir.name, 'other.cache')
+        reader = SharedCache(path, check_interval=0)
+        reader._writer_checked = time.monotonic() + 60
+        reader.set('a', 1)
+        writer = SharedCache(path, check_interval=0)
+        self.assertTrue(writer.is_writer())
+        self.assertIsNone(writer.get('a'))
+        reader.set('b', 2)
+        self.assertEqual(writer.get('b'), 2)
+
+    def test_spool_rotated(self):
+        self.reader.set('a', 1)
+        with patch('cache.shared_cache._SPOOL_MAX_SIZE', 0):
+            self.reader.set('b', 2)
+        self.reader.set('c', 3)
+        self.assertDictEqual(self.writer.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2, 'c': 3})
+
+    def test_delete_local(self):
+        self.writer.set('a', 1)
+        self.reader.set('b', 2)
+        self.reader.delete_local('a', 'b')
+        self.assertIsNone(self.reader.get('b'))
+        self.assertEqual(self.reader.get('a'), 1)
+
+    def test_set_override(self):
+        self.writer.set('a', 1)
+        self.assertEqual(self.reader.get('a'), 1)
+        self.writer.set('a', 'abcdefg')
+        self.assertEqual(self.reader.get('a'), 'abcdefg')
+
+    def test_ttl(self):
+        self.writer.set('a', 1, ttl=-1)
+        self.writer.set('b', 2, ttl=60)
+        self.assertIsNone(self.reader.get('a'))
+        self.assertEqual(self.reader.get('b'), 2)
+        self.assertAlmostEqual(self.reader.expire_of('b'), time.time() + 60, delta=1)
+        self.assertIsNone(self.reader.expire_of('a'))
+
+    def test_delete(self):
+        self.writer.set_many({'a': 1, 'b': 2})
+        self.reader.delete('a', 'unexist')
+        self.assertIsNone(self.writer.get('a'))
+        self.assertEqual(self.writer.get('b'), 2)
+
+    def test_clear(self):
+        self.writer.set_many({'a': 1, 'b': 2})
+        self.writer.clear()
+        self.assertIsNone(self.reader.get('a'))
+        self.assertIsNone(self.reader.get('b'))
+
+    def test_check_interval(self):
+        """reader doesn't see changes until check interval passed"""
+        reader = SharedCache(self.path, check_interval=60)
+        self.writer.set('a', 1)
+        self.assertEqual(reader.get('a'), 1)
+        self.writer.set('a', 2)
+        self.assertEqual(reader.get('a'), 1)
+        reader._checked = time.monotonic() - 60
+        self.assertEqual(reader.get('a'), 2)
+
+    def test_is_writer(self):
+        self.assertTrue(self.writer.is_writer())
+        self.assertTrue(self.writer.is_writer())
+        self.assertFalse(self.reader.is_writer())
+
+
+class TestSharedCacheAsync(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'shared.cache')
+        self.writer = SharedCache(self.path, check_interval=0)
+        self.reader = SharedCache(self.path, check_interval=0)
+        self.assertTrue(self.writer.is_writer())
+
+    def tearDown(self) -> None:
+        del self.writer
+        del self.reader
+        self.dir.cleanup()
+
+    async def test_write_in_background(self):
+        """writes are batched in a thread, and visible to the writer at once"""
+        for i in range(10):
+            self.writer.set(str(i), i)
+        self.writer.delete('0')
+        self.assertEqual(self.writer.get('9'), 9)
+        self.assertIsNone(self.writer.get('0'))
+        await self.writer.flush()
+        self.assertIsNone(self.reader.get('0'))
+        self.assertDictEqual(self.reader.get_many(['1', '9']), {'1': 1, '9': 9})
+        self.assertCountEqual(self.reader.keys(), [str(i) for i in range(1, 10)])
+
+    async def test_delete_not_writer(self):
+        self.writer.set('a', 1)
+        await self.writer.flush()
+        self.reader.delete('a')
+        self.assertIsNone(self.reader.get('a'))
+        await self.reader.flush()
+        self.assertIsNone(self.writer.get('a'))
+
+    async def test_flush_spooled(self):
+        """the writer writes spooled items on flush"""
+        self.reader.set('a', 1)
+        await self.writer.flush()
+        self.assertEqual(SharedCache(self.path).get('a'), 1)
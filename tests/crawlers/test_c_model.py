@@ -0,0 +1,25 @@
+import datetime
+from unittest import TestCase
+
+from crawlers.c_model import CArea, CPort, CProvince, CTide
+from storages.model import TideItem
+
+
+class TestCModel(TestCase):
+    def test_slots(self):
+        for c in (CArea, CProvince, CPort, CTide):
+            with self.subTest(c.__name__):
+                o = c()
+                self.assertFalse(hasattr(o, '__dict__'))
+                with self.assertRaises(AttributeError):
+                    o.unknown = 1
+        self.assertFalse(hasattr(TideItem(None, None), '__dict__'))
+
+    def test_lazy_timestamp(self):
+        before = datetime.datetime.now()
+        p = CPort()
+        self.assertIsNone(p._created_at)
+        created = p.createdAt
+        self.assertGreaterEqual(created, before)
+        self.assertIs(p.createdAt, created)
+        self.assertEqual(p.updatedAt, created)
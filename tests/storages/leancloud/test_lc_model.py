@@ -0,0 +1,53 @@
+import datetime
+from unittest import TestCase
+
+from storages.leancloud.lc_model import LCPort, LCTide, LCTideStats
+from storages.model import TideItem
+
+"""
+These tests don't connect to leancloud.
+"""
+
+
+class TestLCTide(TestCase):
+    def setUp(self) -> None:
+        self.tide = LCTide()
+        self.tide.day = [TideItem(datetime.time(i), float(i)) for i in range(24)]
+
+    def test_decode_once(self):
+        a, b = self.tide.day, self.tide.day
+        self.assertIsNot(a, b)
+        self.assertIs(a[3], b[3])
+        self.assertEqual(a[3].time, datetime.time(3))
+
+    def test_invalidate_on_set(self):
+        self.assertEqual(self.tide.day[0].height, 0.0)
+        self.tide.set(LCTide.DAY, [{'time': '01:00:00', 'height': 2.0}])
+        self.assertEqual(len(self.tide.day), 1)
+        self.assertEqual(self.tide.day[0].height, 2.0)
+
+    def test_dicts(self):
+        self.assertIs(self.tide.day_dicts, self.tide.get(LCTide.DAY))
+        self.assertDictEqual(self.tide.day_dicts[1], {'time': '01:00:00', 'height': 1.0})
+        self.assertEqual(self.tide.limit_dicts, [])
+        self.assertEqual(self.tide.limit, [])
+
+    def test_derive(self):
+        self.tide.date = datetime.datetime(2022, 4, 1)
+        self.tide.limit = [TideItem(datetime.time(23, 40), 24.5)]
+        self.tide.derive()
+        self.assertEqual((self.tide.max_height, self.tide.min_height, self.tide.range), (24.5, 0.0, 24.5))
+        self.assertEqual(self.tide.first_high, datetime.datetime(2022, 4, 1, 23, 40))
+        checksum = self.tide.checksum
+        self.tide.datum = -91
+        self.tide.derive()
+        self.assertNotEqual(self.tide.checksum, checksum)
+
+
+class TestLCTideStats(TestCase):
+    def test_port(self):
+        stats = LCTideStats()
+        self.assertIsNone(stats.port)
+        port = LCPort()
+        stats.port = port
+        self.assertIs(stats.port, port)
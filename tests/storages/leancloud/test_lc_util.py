@@ -217,7 +217,7 @@ class TestLCUtilAdd(IsolatedAsyncioTestCase):
     async def test_add_tide_get_set_tideitem(self):
         """add_tide and verify __to_dicts when set"""
         def convert(tideitems):
-            return [tideitem.__dict__ for tideitem in tideitems]
+            return [tideitem.to_dict() for tideitem in tideitems]
         area = add_area()
         province = add_province(area)
         port = add_port(province)
@@ -353,6 +353,18 @@ class TestLCUtilGet(IsolatedAsyncioTestCase):
         t = await self.lc.get_tide('unexistport', datetime.datetime.now().date())
         self.assertIsNone(t)
 
+    async def test_save_derived(self):
+        area = add_area()
+        province = add_province(area)
+        port = add_port(province)
+        (tide, _, _) = add_tide(port)
+        (ret, count) = await self.lc.save_derived([tide])
+        self.assertEqual((ret, count), (ExecState.UPDATE, 1))
+        t = await self.lc.get_tide(port.objectId, tide.date.date())
+        self.assertIsNotNone(t.checksum)
+        self.assertEqual(await self.lc.save_derived([t]), (ExecState.UPDATE, 0))
+        delete(tide, port, province, area)
+
 
 class TestLCUtilGetList(IsolatedAsyncioTestCase):
     """LCUtil.get_* which return a list."""
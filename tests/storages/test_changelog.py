@@ -0,0 +1,56 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from storages.changelog import ChangeLog
+
+
+class TestChangeLog(TestCase):
+    def setUp(self) -> None:
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'changelog')
+        self.publisher = ChangeLog(self.path, max_size=2000)
+        self.subscriber = ChangeLog(self.path)
+
+    def tearDown(self) -> None:
+        del self.subscriber
+        self.dir.cleanup()
+
+    def test_read_unexist(self):
+        self.assertListEqual(self.subscriber.read(), [])
+
+    def test_publish_read(self):
+        self.subscriber.subscribe()
+        self.publisher.publish('area', 'a1')
+        self.publisher.publish('tide', 't1', 'p1', '2022-04-07')
+        changes = self.subscriber.read()
+        self.assertListEqual([c['id'] for c in changes], ['a1', 't1'])
+        self.assertEqual(changes[1]['parent'], 'p1')
+        self.assertEqual(changes[1]['date'], '2022-04-07')
+        self.assertTrue(self.subscriber.is_own(changes[0]))
+        self.assertFalse(ChangeLog(self.path, source='other').is_own(changes[0]))
+        self.assertListEqual(self.subscriber.read(), [])
+
+    def test_subscribe_skip_history(self):
+        self.publisher.publish('area', 'a1')
+        self.subscriber.subscribe()
+        self.publisher.publish('area', 'a2')
+        self.assertListEqual([c['id'] for c in self.subscriber.read()], ['a2'])
+
+    def test_partial_line(self):
+        self.subscriber.subscribe()
+        with open(self.path, 'ab') as f:
+            f.write(b'{"entity":"area",')
+        self.assertListEqual(self.subscriber.read(), [])
+        with open(self.path, 'ab') as f:
+            f.write(b'"id":"a1","parent":null,"date":null}\n')
+        self.assertListEqual([c['id'] for c in self.subscriber.read()], ['a1'])
+
+    def test_rotate(self):
+        open(self.path, 'wb').close()
+        self.subscriber.subscribe()
+        ids = [f'area{i:04d}' for i in range(40)]
+        for i in ids:
+            self.publisher.publish('area', i)
+        self.assertTrue(os.path.isfile(f'{self.path}.1'))
+        self.assertListEqual([c['id'] for c in self.subscriber.read()], ids)
@@ -0,0 +1,56 @@
+import datetime
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, patch
+
+from cache.cache_model import CacheTideStats
+from crawlers.c_model import CPort, CTide
+from storages.basedbutil import IDT
+from storages.common import ExecState
+from storages.dbutil import DbUtil
+from storages.model import TideItem
+from utils.singleton import SingletonMeta
+
+
+class _Port(CPort):
+    @property
+    def objectId(self):
+        return 'p1'
+
+
+def tide(d: datetime.date):
+    t = CTide()
+    t.date = datetime.datetime(d.year, d.month, d.day)
+    t.day = [TideItem(datetime.time(h), float(h)) for h in range(24)]
+    t.port = _Port()
+    t.port.rid = 'T001'
+    return t
+
+
+@patch('storages.dbutil.ChangeLogSetting.PATH', None)
+class TestDbUtil(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.db = AsyncMock()
+        self.stored = {}
+
+        async def add_stats(port_id, year, month, days):
+            self.stored[(port_id, year, month)] = CacheTideStats(
+                {'objectId': 's1', 'port': port_id, 'year': year, 'month': month, 'days': days})
+            return ExecState.UPDATE, self.stored[(port_id, year, month)]
+        self.db.add_stats.side_effect = add_stats
+        self.db.get_stats.side_effect = lambda *key: self.stored.get(key)
+        self.du = super(SingletonMeta, DbUtil).__call__(self.db)
+
+    async def test_add_tide_without_stats(self):
+        self.db.add_tide.return_value = (ExecState.CREATE, tide(datetime.date(2022, 4, 1)))
+        (ret, _) = await self.du.add_tide(tide(datetime.date(2022, 4, 1)), IDT.RID)
+        self.assertEqual(ret, ExecState.CREATE)
+        # stats are rebuilt by `tasks/stats.py` out of the request path
+        self.db.get_stats.assert_not_awaited()
+        self.db.add_stats.assert_not_awaited()
+
+    async def test_add_stats(self):
+        (ret, stats) = await self.du.add_stats('p1', 2022, 4, None)
+        self.assertEqual(ret, ExecState.UPDATE)
+        self.assertListEqual(stats.days, [])
+        with self.assertRaises(ValueError):
+            await self.du.add_stats('p1', 2022, 13, [])
@@ -0,0 +1,62 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from crawlers.c_model import CPort, CProvince
+from storages.hash_index import HashIndex
+
+
+def port(name: str = '岐口', geopoint=(38.6, 117.51666667), province_rid: str = '4975833679728738945'):
+    p = CPort()
+    p.rid = 'T025'
+    p.name = name
+    p.geopoint = geopoint
+    p.zone = ''
+    p.raw = 'raw data is not hashed'
+    p.province = CProvince()
+    p.province.rid = province_rid
+    return p
+
+
+class TestContentHash(TestCase):
+    def test_stable(self):
+        self.assertEqual(port().content_hash, port().content_hash)
+
+    def test_ignore_raw(self):
+        p = port()
+        p.raw = 'another raw data'
+        self.assertEqual(p.content_hash, port().content_hash)
+
+    def test_changed(self):
+        h = port().content_hash
+        self.assertNotEqual(port(name='QIKOU').content_hash, h)
+        self.assertNotEqual(port(geopoint=(38.6, 117.5)).content_hash, h)
+        self.assertNotEqual(port(province_rid='abc').content_hash, h)
+
+
+class TestHashIndex(TestCase):
+    def setUp(self) -> None:
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'hash_index.json')
+
+    def tearDown(self) -> None:
+        self.dir.cleanup()
+
+    def test_changed(self):
+        index = HashIndex(self.path)
+        self.assertTrue(index.changed('port', port()))
+        index.update('port', port())
+        self.assertFalse(index.changed('port', port()))
+        self.assertTrue(index.changed('port', port(name='QIKOU')))
+        self.assertTrue(index.changed('area', port()))
+
+    def test_save_load(self):
+        index = HashIndex(self.path)
+        index.update('port', port())
+        index.save()
+        self.assertFalse(HashIndex(self.path).changed('port', port()))
+
+    def test_load_broken(self):
+        with open(self.path, 'w') as f:
+            f.write('{broken')
+        self.assertTrue(HashIndex(self.path).changed('port', port()))
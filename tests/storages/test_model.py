@@ -0,0 +1,54 @@
+import datetime
+import math
+from unittest import TestCase
+
+from storages.model import TideItem, TideItemArray
+
+
+def items():
+    return [TideItem(datetime.time(0, 0), 123.4),
+            TideItem(datetime.time(5, 37, 30), -12.0),
+            TideItem(None, 56.0),
+            TideItem(datetime.time(23, 59), None)]
+
+
+class TestTideItemArray(TestCase):
+    def test_from_items(self):
+        a = TideItemArray.from_items(items())
+        self.assertEqual(4, len(a))
+        self.assertEqual(337.5, a.minutes[1])
+        self.assertTrue(math.isnan(a.minutes[2]))
+        self.assertTrue(math.isnan(a.heights[3]))
+        self.assertEqual(32, a.nbytes)
+
+    def test_to_dicts(self):
+        dicts = [i.to_dict() for i in items()]
+        a = TideItemArray.from_items(dicts)
+        self.assertEqual(dicts, a.to_dicts())
+        self.assertEqual(dicts, [i.to_dict() for i in a.to_items()])
+
+    def test_heights_format(self):
+        a = TideItemArray.from_items([TideItem(datetime.time(h), v)
+                                      for h, v in enumerate((123, 0.1, 456.78, -5))])
+        heights = [i.height for i in a]
+        self.assertListEqual(heights, [123, 0.1, 456.78, -5])
+        self.assertListEqual([type(h) for h in heights], [int, float, float, int])
+        self.assertEqual(a.to_dicts()[0]['height'], 123)
+
+    def test_encode(self):
+        a = TideItemArray.from_items(items())
+        s = a.encode()
+        self.assertIsInstance(s, str)
+        self.assertEqual(a, TideItemArray.decode(s))
+        self.assertEqual(a.to_dicts(), TideItemArray.decode(s).to_dicts())
+
+    def test_empty(self):
+        a = TideItemArray.from_items(None)
+        self.assertEqual(0, len(a))
+        self.assertEqual([], TideItemArray.decode(a.encode()).to_items())
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            TideItemArray([1.0], [])
+        with self.assertRaises(ValueError):
+            TideItemArray.from_bytes(b'\0' * 12)
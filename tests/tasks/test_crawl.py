@@ -10,7 +10,7 @@ class TestCrawl(IsolatedAsyncioTestCase):
     def assertSuccess(self, rets: list):
         for (ret, _) in rets:
             self.assertIn(
-                ret, [ExecState.CREATE, ExecState.UPDATE, ExecState.SUCCESS])
+                ret, [ExecState.CREATE, ExecState.UPDATE, ExecState.SUCCESS, ExecState.EXIST])
 
     async def test_crawl_areas(self):
         rets = await crawl_areas()
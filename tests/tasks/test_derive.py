@@ -0,0 +1,25 @@
+import datetime
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, patch
+
+from crawlers.c_model import CTide
+from storages.common import ExecState
+
+from tasks.derive import backfill
+
+
+class TestDerive(IsolatedAsyncioTestCase):
+    @patch('tasks.derive.DbUtil')
+    async def test_backfill(self, db_util):
+        pages = [[CTide(), CTide()], [CTide()]]
+
+        async def scan_tides(start, end, province):
+            self.assertEqual((start, end, province),
+                             (datetime.date(2022, 4, 1), datetime.date(2022, 4, 30), 'pr1'))
+            for page in pages:
+                yield page
+        db_util.return_value.scan_tides = scan_tides
+        db_util.return_value.save_derived = AsyncMock(side_effect=[
+            (ExecState.UPDATE, 2), (ExecState.FAIL, Exception('down'))])
+        self.assertEqual(await backfill(datetime.date(2022, 4, 1), datetime.date(2022, 4, 30), 'pr1'), (2, 1))
+        db_util.return_value.save_derived.assert_any_await(pages[0])
@@ -0,0 +1,46 @@
+import datetime
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, patch
+
+from crawlers.c_model import CPort, CTide
+from storages.common import ExecState
+from storages.model import TideItem
+
+from tasks.stats import rebuild
+
+
+class _Port(CPort):
+    def __init__(self, object_id: str) -> None:
+        super().__init__()
+        self._object_id = object_id
+
+    @property
+    def objectId(self):
+        return self._object_id
+
+
+def tide(port_id: str, d: datetime.date):
+    t = CTide()
+    t.date = datetime.datetime(d.year, d.month, d.day)
+    t.day = [TideItem(datetime.time(h), float(h)) for h in range(24)]
+    t.port = _Port(port_id)
+    return t
+
+
+class TestStats(IsolatedAsyncioTestCase):
+    @patch('tasks.stats.DbUtil')
+    async def test_rebuild(self, db_util):
+        pages = [[tide('p1', datetime.date(2022, 4, 2)), tide('p2', datetime.date(2022, 4, 1))],
+                 [tide('p1', datetime.date(2022, 4, 1))]]
+
+        async def scan_tides(*_):
+            for page in pages:
+                yield page
+        db_util.return_value.scan_tides = scan_tides
+        db_util.return_value.add_stats = AsyncMock(side_effect=[
+            (ExecState.UPDATE, None), (ExecState.FAIL, Exception('down'))])
+        self.assertEqual(await rebuild(2022, 4), (1, 1))
+        (port_id, year, month, days) = db_util.return_value.add_stats.await_args_list[0].args
+        self.assertEqual((port_id, year, month), ('p1', 2022, 4))
+        # each month is written once with days in order
+        self.assertEqual([d['date'] for d in days], ['2022-04-01', '2022-04-02'])
@@ -0,0 +1,54 @@
+from unittest import TestCase
+
+import numpy as np
+from utils.geo import GeoIndex, haversine
+
+# (name, latitude, longitude)
+PORTS = [('qikou', 38.6, 117.51666667),
+         ('tanggu', 38.98333333, 117.78333333),
+         ('dalian', 38.93333333, 121.65),
+         ('shanghai', 31.23333333, 121.48333333),
+         ('suva', -18.13333333, 178.43333333),
+         ('apia', -13.81666667, -171.76666667)]
+
+
+class TestHaversine(TestCase):
+    def test_zero(self):
+        self.assertAlmostEqual(haversine(38.6, 117.5, [38.6], [117.5])[0], 0)
+
+    def test_known(self):
+        # one degree of latitude is about 111.2 km
+        np.testing.assert_allclose(haversine(0, 0, [1, 0], [0, 1]), [111.195, 111.195], atol=0.01)
+
+    def test_antimeridian(self):
+        self.assertAlmostEqual(haversine(0, 179.5, [0], [-179.5])[0], 111.195, places=2)
+
+
+class TestGeoIndex(TestCase):
+    def setUp(self) -> None:
+        self.index = GeoIndex([p[0] for p in PORTS], [p[1:] for p in PORTS])
+
+    def test_nearest(self):
+        nearest = self.index.nearest(38.9, 117.7, 2)
+        self.assertListEqual([n for n, _ in nearest], ['tanggu', 'qikou'])
+        self.assertLess(nearest[0][1], nearest[1][1])
+
+    def test_nearest_max_distance(self):
+        nearest = self.index.nearest(38.9, 117.7, 10, max_distance=100)
+        self.assertListEqual([n for n, _ in nearest], ['tanggu', 'qikou'])
+
+    def test_nearest_more_than_all(self):
+        self.assertEqual(len(self.index.nearest(0, 0, 100)), len(PORTS))
+
+    def test_empty(self):
+        index = GeoIndex([], [])
+        self.assertListEqual(index.nearest(0, 0, 1), [])
+        self.assertListEqual(index.within(-90, -180, 90, 180), [])
+
+    def test_within(self):
+        self.assertListEqual(self.index.within(30, 115, 39, 122),
+                             ['shanghai', 'qikou', 'dalian', 'tanggu'])
+        self.assertListEqual(self.index.within(38.6, 117.51666667, 38.6, 117.51666667), ['qikou'])
+
+    def test_within_antimeridian(self):
+        self.assertListEqual(self.index.within(-20, 170, -10, -170), ['suva', 'apia'])
@@ -0,0 +1,48 @@
+from unittest import TestCase
+
+from utils.search import SearchIndex, normalize
+
+
+class TestNormalize(TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize(' Ｑi Kou '), 'qikou')
+
+
+class TestSearchIndex(TestCase):
+    def setUp(self) -> None:
+        self.index = SearchIndex()
+        self.index.add('p1', ['岐口', 'QIKOU', 'QK'])
+        self.index.add('p2', ['塘沽', 'TANGGU'])
+        self.index.add('p3', ['上海', 'SHANGHAI'])
+        self.index.add('p4', ['上海港', ''])
+
+    def keys(self, query: str, k: int = 10):
+        return [key for key, _ in self.index.search(query, k)]
+
+    def test_exact_prefix_substring(self):
+        self.assertListEqual(self.keys('上海'), ['p3', 'p4'])
+        self.assertListEqual(self.keys('海港'), ['p4'])
+
+    def test_alias(self):
+        self.assertListEqual(self.keys('qk'), ['p1'])
+        self.assertListEqual(self.keys('Tang'), ['p2'])
+
+    def test_single_char(self):
+        self.assertListEqual(sorted(self.keys('海')), ['p3', 'p4'])
+
+    def test_no_match(self):
+        self.assertListEqual(self.keys('口岐'), [])
+        self.assertListEqual(self.keys('北京'), [])
+        self.assertListEqual(self.keys(' '), [])
+
+    def test_top_k(self):
+        self.assertListEqual(self.keys('上海', 1), ['p3'])
+
+    def test_replace_remove(self):
+        self.index.add('p1', ['歧口'])
+        self.assertListEqual(self.keys('qk'), [])
+        self.assertListEqual(self.keys('歧口'), ['p1'])
+        self.index.remove('p1')
+        self.index.remove('unexist')
+        self.assertListEqual(self.keys('口'), [])
+        self.assertEqual(len(self.index), 3)
@@ -0,0 +1,49 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from utils.singleflight import SingleFlight
+
+
+class TestSingleFlight(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.sf = SingleFlight()
+        self.calls = 0
+
+    async def call(self, value=1, delay=0.01):
+        self.calls += 1
+        await asyncio.sleep(delay)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    async def test_coalesce(self):
+        results = await asyncio.gather(*[self.sf.do('k', self.call) for _ in range(5)])
+        self.assertListEqual(results, [1] * 5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(self.sf), 0)
+
+    async def test_different_keys(self):
+        results = await asyncio.gather(self.sf.do('a', lambda: self.call(1)),
+                                       self.sf.do('b', lambda: self.call(2)))
+        self.assertListEqual(results, [1, 2])
+        self.assertEqual(self.calls, 2)
+
+    async def test_call_again_after_done(self):
+        await self.sf.do('k', self.call)
+        await self.sf.do('k', self.call)
+        self.assertEqual(self.calls, 2)
+
+    async def test_exception(self):
+        results = await asyncio.gather(*[self.sf.do('k', lambda: self.call(ValueError()))
+                                         for _ in range(2)], return_exceptions=True)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(self.sf), 0)
+
+    async def test_cancel_one_caller(self):
+        t1 = asyncio.ensure_future(self.sf.do('k', self.call))
+        t2 = asyncio.ensure_future(self.sf.do('k', self.call))
+        await asyncio.sleep(0)
+        t1.cancel()
+        self.assertEqual(await t2, 1)
+        self.assertEqual(self.calls, 1)
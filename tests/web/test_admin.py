@@ -0,0 +1,101 @@
+import datetime
+import gzip
+import json
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import MagicMock, patch
+
+import bcrypt
+from aiohttp import BasicAuth, web
+from aiohttp.test_utils import TestClient, TestServer
+from config import AdminSetting
+from crawlers.c_model import CTide
+from storages.model import TideItem
+from web.admin import routes
+from web.constant import ErrCode
+
+
+def tide(port_id: str, d: datetime.date):
+    t = CTide()
+    t.date = datetime.datetime(d.year, d.month, d.day)
+    t.day = [TideItem(datetime.time(i), float(i)) for i in range(24)]
+    t.limit = [TideItem(datetime.time(3, 37), 1.0)]
+    t.datum = -91
+    t.port = MagicMock(objectId=port_id)
+    return t
+
+
+def auth(password: str):
+    return {'Authorization': BasicAuth('admin', password).encode()}
+
+
+class TestExportTides(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.dir = tempfile.TemporaryDirectory()
+        config_file = os.path.join(self.dir.name, 'admin.json')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump({'users': {'admin': bcrypt.hashpw(
+                b'Passw0rd', bcrypt.gensalt(4)).decode()}}, f)
+        self.config_patch = patch.object(AdminSetting, 'CONFIG_FILE', config_file)
+        self.config_patch.start()
+        self.pages = [[tide('p1', datetime.date(2022, 4, 1)), tide('p2', datetime.date(2022, 4, 1))],
+                      [tide('p1', datetime.date(2022, 4, 2))]]
+        db = MagicMock()
+        db.return_value.scan_tides = self.scan_tides
+        self.db_patch = patch('web.admin.DbUtil', db)
+        self.db_patch.start()
+        app = web.Application()
+        app.add_routes(routes)
+        self.client = TestClient(TestServer(app))
+        await self.client.start_server()
+
+    async def asyncTearDown(self) -> None:
+        await self.client.close()
+        self.db_patch.stop()
+        self.config_patch.stop()
+        self.dir.cleanup()
+
+    async def scan_tides(self, start, end, province_id=None):
+        self.scanned = (start, end, province_id)
+        for page in self.pages:
+            yield page
+
+    async def test_unauthorized(self):
+        resp = await self.client.get('/export/tides?start=2022-04-01&end=2022-04-02')
+        self.assertEqual(resp.status, 401)
+        resp = await self.client.get('/export/tides?start=2022-04-01&end=2022-04-02',
+                                     headers=auth('wrong'))
+        self.assertEqual(resp.status, 401)
+        self.assertEqual((await resp.json())['code'], ErrCode.PWD_ERR['code'])
+
+    async def test_not_init(self):
+        with patch.object(AdminSetting, 'CONFIG_FILE', os.path.join(self.dir.name, 'unexist.json')):
+            resp = await self.client.get('/export/tides?start=2022-04-01&end=2022-04-02',
+                                         headers=auth('Passw0rd'))
+        self.assertEqual(resp.status, 401)
+        self.assertEqual((await resp.json())['code'], ErrCode.NOT_INIT['code'])
+
+    async def test_bad_request(self):
+        resp = await self.client.get('/export/tides?start=2022-04-01',
+                                     headers=auth('Passw0rd'))
+        self.assertEqual(resp.status, 400)
+
+    async def test_export(self):
+        resp = await self.client.get('/export/tides?start=2022-04-01&end=2022-04-02&province=pr1',
+                                     headers={**auth('Passw0rd'), 'Accept-Encoding': 'identity'})
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(resp.content_type, 'application/x-ndjson')
+        lines = (await resp.read()).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertDictEqual(json.loads(lines[2])['day'][1], {'time': '01:00:00', 'height': 1.0})
+        self.assertListEqual([json.loads(line)['port'] for line in lines], ['p1', 'p2', 'p1'])
+        self.assertEqual(self.scanned, (datetime.date(2022, 4, 1), datetime.date(2022, 4, 2), 'pr1'))
+
+    async def test_export_gzip(self):
+        resp = await self.client.get('/export/tides?start=2022-04-01&end=2022-04-02',
+                                     headers={**auth('Passw0rd'), 'Accept-Encoding': 'gzip'},
+                                     auto_decompress=False)
+        self.assertEqual(resp.headers['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(await resp.read()).decode().splitlines()
+        self.assertEqual(len(lines), 3)
@@ -0,0 +1,87 @@
+import datetime
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from cache.cache_model import CacheTide
+from web.constant import CacheControl
+from web.costumer import parse_step, routes, tide_cache_control
+
+
+def tide(predicted: bool = False):
+    return CacheTide({'date': '2022-04-07T00:00:00', 'predicted': predicted})
+
+
+class TestTideCacheControl(TestCase):
+    def test_past(self):
+        past = datetime.date(2022, 4, 7)
+        self.assertEqual(tide_cache_control(past, [tide()]), CacheControl.PAST_TIDE)
+        self.assertEqual(tide_cache_control(datetime.date.today(), [tide()]), CacheControl.TIDE)
+
+    def test_predicted(self):
+        """predicted tides of past dates are not immutable"""
+        cc = tide_cache_control(datetime.date(2022, 4, 7), [tide(), tide(True)])
+        self.assertEqual(cc, CacheControl.PREDICTED)
+        self.assertNotIn('immutable', cc)
+
+
+class TestCurveStep(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.patch = patch('web.costumer.CacheUtil', return_value=MagicMock())
+        self.patch.start()
+        app = web.Application()
+        app.add_routes(routes)
+        self.client = TestClient(TestServer(app))
+        await self.client.start_server()
+
+    async def asyncTearDown(self) -> None:
+        await self.client.close()
+        self.patch.stop()
+
+    def test_parse_step(self):
+        self.assertEqual(parse_step('10m'), 10)
+        self.assertEqual(parse_step('1H'), 60)
+        self.assertEqual(parse_step('90s'), 1.5)
+        self.assertEqual(parse_step('5'), 5)
+        with self.assertRaises(ValueError):
+            parse_step('m')
+
+    async def test_rejected_step(self):
+        for step in ('30s', '2h', '0'):
+            resp = await self.client.get('/tide/p1/2022-04-07/curve', params={'step': step})
+            self.assertEqual(resp.status, 400)
+            self.assertEqual(resp.reason, 'step must be between 1m and 1h')
+        resp = await self.client.get('/tide/p1/2022-04-07/curve', params={'step': 'x'})
+        self.assertEqual(resp.status, 400)
+        # the suggested step is accepted
+        self.assertIn('90s', resp.reason)
+        self.assertTrue(1 <= parse_step('90s') <= 60)
+
+
+class TestMatrixFormat(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        cu = AsyncMock()
+        cu.get_ports.return_value = []
+        cu.get_tides.return_value = {}
+        self.patch = patch('web.costumer.CacheUtil', return_value=cu)
+        self.patch.start()
+        app = web.Application()
+        app.add_routes(routes)
+        self.client = TestClient(TestServer(app))
+        await self.client.start_server()
+
+    async def asyncTearDown(self) -> None:
+        await self.client.close()
+        self.patch.stop()
+
+    async def test_format(self):
+        resp = await self.client.get('/matrix/province/pr1/2022-04-07', params={'format': 'npz'})
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(resp.content_type, 'application/x-npz')
+
+    async def test_unsupported_format(self):
+        resp = await self.client.get('/matrix/province/pr1/2022-04-07', params={'format': 'npy'})
+        self.assertEqual(resp.status, 406)
+        resp = await self.client.get('/matrix/province/pr1/2022-04-07', params={'format': 'csv'})
+        self.assertEqual(resp.status, 400)
@@ -0,0 +1,13 @@
+from unittest import TestCase
+
+from web.headers import parse_qvalues
+
+
+class TestParseQvalues(TestCase):
+    def test_parse(self):
+        self.assertDictEqual(parse_qvalues('GZIP, br;q=0.5, *;q=0'), {'gzip': 1.0, 'br': 0.5, '*': 0.0})
+        self.assertDictEqual(parse_qvalues('application/json;charset=utf-8;q=0.8, text/*'),
+                             {'application/json': 0.8, 'text/*': 1.0})
+
+    def test_malformed(self):
+        self.assertDictEqual(parse_qvalues(', br;q=x'), {'br': 0.0})
@@ -0,0 +1,138 @@
+import asyncio
+import datetime
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, MagicMock, patch
+from urllib.parse import unquote
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from crawlers.c_model import CTide
+from storages.model import TideItem
+from web.costumer import routes
+from web.jobs import JobQueue, JobState
+
+
+def new_job_queue(ttl: float = 60) -> JobQueue:
+    q = JobQueue.__new__(JobQueue)
+    q.__init__(concurrency=2, ttl=ttl)
+    return q
+
+
+class TestJobQueue(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.q = new_job_queue()
+        self.calls = 0
+
+    async def call(self, value=1, delay=0.01):
+        self.calls += 1
+        await asyncio.sleep(delay)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    async def test_submit_wait(self):
+        job = self.q.submit('k', self.call)
+        self.assertFalse(job.is_finished)
+        await self.q.wait(job, 1)
+        self.assertEqual(job.state, JobState.DONE)
+        self.assertEqual(job.result, 1)
+        self.assertIs(self.q.get(job.id), job)
+
+    async def test_same_key(self):
+        j1 = self.q.submit('k', self.call)
+        j2 = self.q.submit('k', self.call)
+        self.assertIs(j1, j2)
+        await self.q.wait(j1, 1)
+        j3 = self.q.submit('k', self.call)
+        self.assertIsNot(j1, j3)
+        await self.q.wait(j3, 1)
+        self.assertEqual(self.calls, 2)
+
+    async def test_wait_timeout(self):
+        job = self.q.submit('k', lambda: self.call(delay=1))
+        await self.q.wait(job, 0.01)
+        self.assertEqual(job.state, JobState.RUNNING)
+        await self.q.close()
+        self.assertEqual(job.state, JobState.FAILED)
+
+    async def test_failed(self):
+        job = await self.q.wait(self.q.submit('k', lambda: self.call(ValueError('boom'))), 1)
+        self.assertEqual(job.state, JobState.FAILED)
+        self.assertEqual(job.error, 'boom')
+
+    async def test_expire(self):
+        self.q.ttl = 0
+        job = await self.q.wait(self.q.submit('k', self.call), 1)
+        await asyncio.sleep(0.01)
+        self.assertIsNone(self.q.get(job.id))
+
+
+class TestAsyncTide(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        d = datetime.date(2022, 4, 7)
+        t = CTide()
+        t.date = datetime.datetime(d.year, d.month, d.day)
+        t.day = [TideItem(datetime.time(i), float(i)) for i in range(24)]
+        t.limit = []
+        t.datum = -91
+        self.cu = MagicMock()
+        self.cu.get_cached_tide.return_value = None
+        self.cu.get_port = AsyncMock(return_value=MagicMock())
+
+        async def get_tide(port_id, d):
+            await asyncio.sleep(0.05)
+            return t
+        self.cu.get_tide = AsyncMock(side_effect=get_tide)
+        self.cu.get_stored_tide = AsyncMock(return_value=None)
+        self.tide = t
+        self.patches = [patch('web.costumer.CacheUtil', return_value=self.cu),
+                        patch('web.costumer.JobQueue', return_value=new_job_queue())]
+        for p in self.patches:
+            p.start()
+        app = web.Application()
+        app.add_routes(routes)
+        self.client = TestClient(TestServer(app))
+        await self.client.start_server()
+
+    async def asyncTearDown(self) -> None:
+        await self.client.close()
+        for p in self.patches:
+            p.stop()
+
+    async def test_async(self):
+        resp = await self.client.get('/tide/p1/2022-04-07?async=1')
+        self.assertEqual(resp.status, 202)
+        location = resp.headers['Location']
+        self.assertEqual((await resp.json())['data']['state'], JobState.PENDING)
+        resp = await self.client.get(f'{location}?wait=1')
+        self.assertEqual(resp.status, 200)
+        job = (await resp.json())['data']
+        self.assertEqual(job['state'], JobState.DONE)
+        self.assertEqual(job['result']['date'], '2022-04-07')
+        self.cu.get_tide.assert_awaited_once()
+        self.assertTrue(unquote(location).endswith('/jobs/tide:p1:2022-04-07'))
+
+    async def test_job_unexist(self):
+        resp = await self.client.get('/jobs/abc')
+        self.assertEqual(resp.status, 404)
+        resp = await self.client.get('/jobs/tide:p1:2022-13-01')
+        self.assertEqual(resp.status, 404)
+        self.cu.get_port.return_value = None
+        resp = await self.client.get('/jobs/tide:p2:2022-04-07')
+        self.assertEqual(resp.status, 404)
+
+    @patch('web.costumer.JobSetting.POLL_INTERVAL', 0.01)
+    async def test_job_of_other_worker(self):
+        """a poll landing on another worker reads the tide stored by the job instead of running it again"""
+        resp = await self.client.get('/jobs/tide:p1:2022-04-07')
+        self.assertEqual(resp.status, 202)
+        self.assertEqual((await resp.json())['data']['state'], JobState.PENDING)
+        self.cu.get_stored_tide.side_effect = [None, None, self.tide]
+        resp = await self.client.get('/jobs/tide:p1:2022-04-07?wait=1')
+        self.assertEqual(resp.status, 200)
+        job = (await resp.json())['data']
+        self.assertEqual(job['id'], 'tide:p1:2022-04-07')
+        self.assertEqual(job['state'], JobState.DONE)
+        self.assertEqual(job['result']['date'], '2022-04-07')
+        self.cu.get_stored_tide.assert_awaited_with('p1', datetime.date(2022, 4, 7))
+        self.cu.get_tide.assert_not_awaited()
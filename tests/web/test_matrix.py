@@ -0,0 +1,54 @@
+import datetime
+import io
+import json
+from unittest import TestCase, skipUnless
+
+import numpy as np
+from web.matrix import (JSON, MSGPACK, NPZ, Matrix, matrix_response, msgpack,
+                        negotiate_type, to_json, to_npz)
+
+
+def matrix():
+    heights = np.arange(48, dtype=np.float64).reshape(2, 24) + 0.125
+    heights[1, 3] = np.nan
+    return Matrix(datetime.date(2022, 4, 7), ['p1', 'p2'], heights)
+
+
+class TestNegotiateType(TestCase):
+    def test_default(self):
+        self.assertEqual(negotiate_type(None), JSON)
+        self.assertEqual(negotiate_type('*/*'), JSON)
+        self.assertEqual(negotiate_type('application/*'), JSON)
+
+    def test_exact(self):
+        self.assertEqual(negotiate_type('application/x-npz'), NPZ)
+        self.assertEqual(negotiate_type('application/x-npz, */*;q=0.1'), NPZ)
+        self.assertEqual(negotiate_type('application/json;q=0.5, */*'), NPZ)
+
+    def test_not_acceptable(self):
+        self.assertIsNone(negotiate_type('text/html'))
+        self.assertIsNone(negotiate_type('application/x-npz;q=0', [NPZ]))
+
+
+class TestEncode(TestCase):
+    def test_npz(self):
+        loaded = np.load(io.BytesIO(to_npz(matrix())))
+        self.assertListEqual(loaded['ports'].tolist(), ['p1', 'p2'])
+        self.assertEqual(loaded['heights'].dtype, np.dtype('<f4'))
+        np.testing.assert_array_equal(loaded['heights'], matrix().heights.astype(np.float32))
+
+    def test_json(self):
+        m = to_json(matrix())
+        self.assertEqual(m['ports'], ['p1', 'p2'])
+        self.assertIsNone(m['heights'][1][3])
+        self.assertEqual(m['heights'][0][1], 1.12)
+        body = json.loads(matrix_response(matrix(), JSON).body)
+        self.assertEqual(len(body['data']['heights']), 2)
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_msgpack(self):
+        resp = matrix_response(matrix(), MSGPACK)
+        self.assertEqual(resp.content_type, MSGPACK)
+        m = msgpack.unpackb(resp.body)
+        heights = np.frombuffer(m['heights'], dtype=m['dtype']).reshape(m['shape'])
+        np.testing.assert_array_equal(heights, matrix().heights.astype(np.float32))
@@ -0,0 +1,88 @@
+import gzip
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from aiohttp import hdrs, web
+from aiohttp.test_utils import TestClient, TestServer
+from web.compression import negotiate
+from web.middleware import compression_middleware
+from web.model import body_response, conditional_response, wrap_response
+from web.response_cache import CachedBody
+
+LARGE = ['x' * 10] * 200
+
+
+class TestNegotiate(TestCase):
+    def test_none(self):
+        self.assertIsNone(negotiate(None))
+        self.assertIsNone(negotiate('identity'))
+
+    def test_gzip(self):
+        self.assertEqual(negotiate('deflate, GZIP'), 'gzip')
+        self.assertEqual(negotiate('*'), negotiate('gzip, br'))
+
+    def test_quality(self):
+        self.assertIsNone(negotiate('gzip;q=0'))
+        self.assertEqual(negotiate('br;q=0.5, gzip', ['br', 'gzip']), 'gzip')
+        self.assertEqual(negotiate('br, gzip;q=0.5', ['gzip']), 'gzip')
+
+
+class TestCompressionMiddleware(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.cached = CachedBody('"v1"', wrap_response(LARGE).body)
+        app = web.Application(middlewares=[compression_middleware])
+        app.router.add_get('/small', self.small_handler)
+        app.router.add_get('/large', self.large_handler)
+        app.router.add_get('/cached', self.cached_handler)
+        app.router.add_get('/conditional', self.conditional_handler)
+        self.client = TestClient(TestServer(app))
+        await self.client.start_server()
+
+    async def asyncTearDown(self) -> None:
+        await self.client.close()
+
+    async def small_handler(self, _):
+        return wrap_response('x')
+
+    async def large_handler(self, _):
+        return wrap_response(LARGE)
+
+    async def cached_handler(self, _):
+        resp = body_response(self.cached)
+        resp.headers[hdrs.ETAG] = self.cached.etag
+        return resp
+
+    async def conditional_handler(self, request):
+        return conditional_response(request, '"v1"', lambda: LARGE)
+
+    async def get(self, path: str, accept: str):
+        return await self.client.get(path, headers={hdrs.ACCEPT_ENCODING: accept},
+                                     auto_decompress=False)
+
+    async def test_small(self):
+        resp = await self.get('/small', 'gzip')
+        self.assertNotIn(hdrs.CONTENT_ENCODING, resp.headers)
+
+    async def test_identity(self):
+        resp = await self.get('/large', 'identity')
+        self.assertNotIn(hdrs.CONTENT_ENCODING, resp.headers)
+        self.assertEqual(resp.headers[hdrs.VARY], hdrs.ACCEPT_ENCODING)
+
+    async def test_gzip(self):
+        resp = await self.get('/large', 'gzip')
+        self.assertEqual(resp.headers[hdrs.CONTENT_ENCODING], 'gzip')
+        self.assertEqual(gzip.decompress(await resp.read()), self.cached.body)
+
+    async def test_cached_variant(self):
+        resp = await self.get('/cached', 'gzip')
+        self.assertEqual(await resp.read(), self.cached.encoded('gzip'))
+        self.assertEqual(resp.headers[hdrs.ETAG], 'W/"v1"')
+        self.assertIs(self.cached.encoded('gzip'), self.cached.encoded('gzip'))
+
+    async def test_not_modified(self):
+        resp = await self.get('/conditional', 'gzip')
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(resp.headers[hdrs.VARY], hdrs.ACCEPT_ENCODING)
+        resp = await self.client.get('/conditional', headers={hdrs.ACCEPT_ENCODING: 'gzip',
+                                                               hdrs.IF_NONE_MATCH: resp.headers[hdrs.ETAG]})
+        self.assertEqual(resp.status, 304)
+        self.assertEqual(resp.headers[hdrs.VARY], hdrs.ACCEPT_ENCODING)
@@ -0,0 +1,104 @@
+from datetime import datetime, time, timezone
+import json
+import warnings
+from unittest import TestCase
+
+from aiohttp import hdrs
+from aiohttp.test_utils import make_mocked_request
+from crawlers.c_model import CTide
+from storages.model import TideItem
+from web.model import (CACHED_BODY, conditional_response, dumps_response,
+                       etag_of, to_tide_model)
+from web.response_cache import ResponseCache
+
+
+def request(**headers):
+    return make_mocked_request('GET', '/', headers=headers)
+
+
+class TestConditionalResponse(TestCase):
+    LAST_MODIFIED = datetime(2022, 4, 7, 1, 2, 3, tzinfo=timezone.utc)
+
+    def setUp(self) -> None:
+        self.called = 0
+
+    def data(self):
+        self.called += 1
+        return {'id': 'abc'}
+
+    def test_etag_stable(self):
+        self.assertEqual(etag_of('areas', [('a', self.LAST_MODIFIED)]),
+                         etag_of('areas', [('a', self.LAST_MODIFIED)]))
+        self.assertNotEqual(etag_of('areas', [('a', self.LAST_MODIFIED)]),
+                            etag_of('areas', [('a', datetime.now())]))
+
+    def test_modified(self):
+        etag = etag_of('a')
+        resp = conditional_response(request(), etag, self.data,
+                                    self.LAST_MODIFIED, 'public, max-age=60')
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(self.called, 1)
+        self.assertEqual(resp.headers[hdrs.ETAG], etag)
+        self.assertEqual(resp.headers[hdrs.CACHE_CONTROL], 'public, max-age=60')
+        self.assertEqual(resp.headers[hdrs.LAST_MODIFIED],
+                         'Thu, 07 Apr 2022 01:02:03 GMT')
+
+    def test_if_none_match(self):
+        etag = etag_of('a')
+        resp = conditional_response(
+            request(**{hdrs.IF_NONE_MATCH: f'"other", {etag}'}), etag, self.data)
+        self.assertEqual(resp.status, 304)
+        self.assertEqual(self.called, 0)
+        self.assertEqual(resp.headers[hdrs.ETAG], etag)
+
+    def test_if_none_match_changed(self):
+        resp = conditional_response(
+            request(**{hdrs.IF_NONE_MATCH: '"other"'}), etag_of('a'), self.data)
+        self.assertEqual(resp.status, 200)
+
+    def test_if_modified_since(self):
+        resp = conditional_response(
+            request(**{hdrs.IF_MODIFIED_SINCE: 'Thu, 07 Apr 2022 01:02:03 GMT'}),
+            etag_of('a'), self.data, self.LAST_MODIFIED)
+        self.assertEqual(resp.status, 304)
+        resp = conditional_response(
+            request(**{hdrs.IF_MODIFIED_SINCE: 'Thu, 07 Apr 2022 01:02:02 GMT'}),
+            etag_of('a'), self.data, self.LAST_MODIFIED)
+        self.assertEqual(resp.status, 200)
+
+    def test_cache_key(self):
+        ResponseCache().clear()
+        etag = etag_of('a')
+        r1 = conditional_response(request(), etag, self.data, cache_key='a')
+        r2 = conditional_response(request(), etag, self.data, cache_key='a')
+        self.assertEqual(self.called, 1)
+        self.assertEqual(r1.body, r2.body)
+        self.assertEqual(json.loads(r2.body)['data'], {'id': 'abc'})
+        conditional_response(request(), etag_of('b'), self.data, cache_key='a')
+        self.assertEqual(self.called, 2)
+
+    def test_cache_key_body(self):
+        """cached body is attached for compression middleware"""
+        ResponseCache().clear()
+        etag = etag_of('a')
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            resp = conditional_response(request(), etag, lambda: ['x' * 10] * 200, cache_key='a')
+        # the key is typed, so that aiohttp doesn't warn about it
+        self.assertListEqual([str(w.message) for w in caught], [])
+        self.assertIs(resp[CACHED_BODY], ResponseCache().get('a', etag))
+        self.assertEqual(json.loads(resp.body)['data'][0], 'x' * 10)
+
+
+class TestToTideModel(TestCase):
+    def test_serialize(self):
+        tide = CTide()
+        tide.date = datetime(2022, 4, 7)
+        tide.day = [TideItem(time(i), float(i)) for i in range(24)]
+        tide.limit = [TideItem(time(3, 37), 338.0)]
+        tide.datum = -91
+        data = json.loads(dumps_response(to_tide_model(tide)))['data']
+        self.assertEqual(data['date'], '2022-04-07')
+        self.assertEqual(len(data['day']), 24)
+        self.assertDictEqual(data['day'][1], TideItem(time(1), 1.0).to_dict())
+        self.assertDictEqual(data['limit'][0], {'time': '03:37:00', 'height': 338.0})
@@ -0,0 +1,33 @@
+import gzip
+from unittest import TestCase
+
+from web.response_cache import ResponseCache
+
+
+class TestResponseCache(TestCase):
+    def setUp(self) -> None:
+        self.rc = ResponseCache.__new__(ResponseCache)
+        self.rc.__init__(maxsize=2)
+
+    def test_get_put(self):
+        self.rc.put('areas', '"v1"', b'[1]')
+        self.assertEqual(self.rc.get('areas', '"v1"').body, b'[1]')
+        self.assertIsNone(self.rc.get('unexist', '"v1"'))
+
+    def test_etag_changed(self):
+        self.rc.put('areas', '"v1"', b'[1]')
+        self.assertIsNone(self.rc.get('areas', '"v2"'))
+        self.assertIsNone(self.rc.get('areas', '"v1"'))
+
+    def test_lru(self):
+        self.rc.put('a', '"v1"', b'a')
+        self.rc.put('b', '"v1"', b'b')
+        self.rc.get('a', '"v1"')
+        self.rc.put('c', '"v1"', b'c')
+        self.assertIsNotNone(self.rc.get('a', '"v1"'))
+        self.assertIsNone(self.rc.get('b', '"v1"'))
+
+    def test_encoded(self):
+        cached = self.rc.put('a', '"v1"', b'a' * 100)
+        self.assertEqual(gzip.decompress(cached.encoded('gzip')), b'a' * 100)
+        self.assertIs(cached.encoded('gzip'), cached.encoded('gzip'))
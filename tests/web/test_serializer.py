@@ -0,0 +1,45 @@
+import json
+from datetime import date, datetime, time
+from unittest import TestCase, skipIf
+
+import numpy as np
+from storages.model import TideItem
+from web.serializer import OrjsonSerializer, StdSerializer, orjson
+
+DATA = {'date': date(2022, 4, 7),
+        'datetime': datetime(2022, 4, 7, 1, 2, 3),
+        'geopoint': (38.6, 117.51666667),
+        'name': '岐口',
+        'day': [TideItem(time(1), 1.0), TideItem(time(1, 2, 3, 4), None)]}
+EXPECTED = {'date': '2022-04-07',
+            'datetime': '2022-04-07T01:02:03',
+            'geopoint': [38.6, 117.51666667],
+            'name': '岐口',
+            'day': [{'time': '01:00:00', 'height': 1.0},
+                    {'time': '01:02:03.000004', 'height': None}]}
+
+
+class TestSerializer(TestCase):
+    def test_std(self):
+        self.assertDictEqual(json.loads(StdSerializer().dumps(DATA)), EXPECTED)
+
+    @skipIf(orjson is None, 'orjson is not installed')
+    def test_orjson(self):
+        self.assertDictEqual(json.loads(OrjsonSerializer().dumps(DATA)), EXPECTED)
+
+    def test_numpy(self):
+        data = {'f64': np.float64(1.5), 'f32': np.float32(0.25), 'i64': np.int64(3),
+                'bool': np.bool_(True), 'array': np.array([1.0, 2.0], dtype=np.float32)}
+        expected = {'f64': 1.5, 'f32': 0.25, 'i64': 3, 'bool': True, 'array': [1.0, 2.0]}
+        self.assertDictEqual(json.loads(StdSerializer().dumps(data)), expected)
+        if orjson is not None:
+            self.assertDictEqual(json.loads(OrjsonSerializer().dumps(data)), expected)
+
+    def test_same_as_to_dict(self):
+        """serialized TideItem equals to TideItem.to_dict"""
+        item = TideItem(time(1, 2, 3, 4), 1.0)
+        self.assertDictEqual(json.loads(StdSerializer().dumps(item)), item.to_dict())
+
+    def test_unsupported(self):
+        with self.assertRaises(TypeError):
+            StdSerializer().dumps(object())
@@ -1,6 +1,7 @@
 import asyncio
 from functools import wraps, partial
-from typing import Any, Coroutine, TypeVar
+from typing import (Any, AsyncIterator, Awaitable, Coroutine, Iterable, List,
+                    TypeVar)
 
 
 def async_wrap(func):
@@ -37,3 +38,51 @@ def run_async(coroutine: Coroutine[Any, Any, _ReturnType]) -> _ReturnType:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             return loop.run_until_complete(coroutine)
+
+
+async def gather_bounded(aws: Iterable[Awaitable[_ReturnType]], limit: int, return_exceptions: bool = False) -> List[_ReturnType]:
+    """
+    Like :func:`asyncio.gather` but run at most :param:`limit` awaitables at the same time.
+
+    :param aws: Awaitables to run.
+    :param limit: Max count of running awaitables.
+    :param return_exceptions: See also :func:`asyncio.gather`.
+    :return: Results in the order of :param:`aws`.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(aw: Awaitable[_ReturnType]) -> _ReturnType:
+        async with semaphore:
+            return await aw
+    return await asyncio.gather(*[run(aw) for aw in aws], return_exceptions=return_exceptions)
+
+
+async def as_completed_bounded(aws: Iterable[Awaitable[_ReturnType]], limit: int, return_exceptions: bool = False) -> AsyncIterator[_ReturnType]:
+    """
+    Like :func:`asyncio.as_completed` but run at most :param:`limit` awaitables at the same time,
+    and yield results directly.
+
+    Unfinished awaitables are cancelled if the iteration is stopped early.
+
+    :param aws: Awaitables to run.
+    :param limit: Max count of running awaitables.
+    :param return_exceptions: Yield exceptions as results instead of raising them.
+    :return: Results in the order of completion.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(aw: Awaitable[_ReturnType]) -> _ReturnType:
+        async with semaphore:
+            return await aw
+    tasks = [asyncio.ensure_future(run(aw)) for aw in aws]
+    try:
+        for f in asyncio.as_completed(tasks):
+            try:
+                yield await f
+            except Exception as ex:
+                if not return_exceptions:
+                    raise
+                yield ex
+    finally:
+        for t in tasks:
+            t.cancel()
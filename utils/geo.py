@@ -0,0 +1,85 @@
+"""Vectorized geographic computations."""
+from typing import Generic, List, Sequence, Tuple, TypeVar, Union
+
+import numpy as np
+
+# mean radius of the earth in kilometers
+EARTH_RADIUS = 6371.0088
+
+_Item = TypeVar('_Item')
+
+
+def haversine(lat: float, lon: float, lats: Union[np.ndarray, Sequence[float]], lons: Union[np.ndarray, Sequence[float]]) -> np.ndarray:
+    """
+    Great-circle distances from one point to many points.
+
+    :param lat: Latitude of the point in degrees.
+    :param lon: Longitude of the point in degrees.
+    :param lats: Latitudes of other points in degrees.
+    :param lons: Longitudes of other points in degrees.
+    :return: Distances in kilometers.
+    """
+    phi1 = np.radians(lat)
+    phi2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dphi = phi2 - phi1
+    dlambda = np.radians(np.asarray(lons, dtype=np.float64) - lon)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class GeoIndex(Generic[_Item]):
+    """
+    Immutable in-memory index of items with coordinates.
+
+    Points are kept in numpy arrays sorted by latitude, so that a bounding box
+    query only checks the latitude band found by binary search,
+    and a nearest query computes all distances in one vectorized pass.
+    """
+
+    def __init__(self, items: Sequence[_Item], points: Sequence[Tuple[float, float]]) -> None:
+        """
+        :param items: Indexed items.
+        :param points: (latitude, longitude) of each item in degrees.
+        """
+        if len(items) != len(points):
+            raise ValueError('items and points must have the same length')
+        coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        order = np.argsort(coords[:, 0], kind='stable')
+        self._items = [items[i] for i in order]
+        self._lats = coords[order, 0]
+        self._lons = coords[order, 1]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def nearest(self, lat: float, lon: float, k: int = 1, max_distance: float = None) -> List[Tuple[_Item, float]]:
+        """
+        Get the :param:`k` nearest items of a point.
+
+        :param max_distance: Kilometers. Items farther than this are excluded.
+        :return: (item, distance in kilometers) in ascending order of distance.
+        """
+        if k <= 0 or not self._items:
+            return []
+        distances = haversine(lat, lon, self._lats, self._lons)
+        k = min(k, len(distances))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest], kind='stable')]
+        return [(self._items[i], float(distances[i])) for i in nearest
+                if max_distance is None or distances[i] <= max_distance]
+
+    def within(self, south: float, west: float, north: float, east: float) -> List[_Item]:
+        """
+        Get items in a bounding box, edges included.
+
+        A box crossing the antimeridian has :param:`west` greater than :param:`east`.
+        :return: Items in ascending order of latitude.
+        """
+        start = np.searchsorted(self._lats, south, side='left')
+        end = np.searchsorted(self._lats, north, side='right')
+        lons = self._lons[start:end]
+        if west <= east:
+            mask = (lons >= west) & (lons <= east)
+        else:
+            mask = (lons >= west) | (lons <= east)
+        return [self._items[start + i] for i in np.flatnonzero(mask)]
@@ -0,0 +1,109 @@
+"""In-memory n-gram index for searching names."""
+import heapq
+import unicodedata
+from typing import Dict, Generic, Hashable, Iterable, List, Optional, Set, Tuple, TypeVar
+
+_Key = TypeVar('_Key', bound=Hashable)
+
+# scores of match types, the larger the better
+EXACT = 3.0
+PREFIX = 2.0
+SUBSTRING = 1.0
+
+
+def normalize(text: str) -> str:
+    """Normalize full-width characters and case, and remove whitespaces."""
+    return ''.join(unicodedata.normalize('NFKC', text).casefold().split())
+
+
+def grams(text: str) -> Set[str]:
+    """Unigrams and bigrams of normalized :param:`text`."""
+    return set(text) | {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _query_grams(text: str) -> Set[str]:
+    """Grams which must be all contained by a matched name."""
+    if len(text) == 1:
+        return {text}
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class SearchIndex(Generic[_Key]):
+    """
+    Inverted index from unigrams and bigrams to documents.
+
+    Each document has many names, such as a Chinese name and its English and pinyin names.
+    A query matches a document if it's a substring of any normalized name.
+    Candidates are found by intersecting postings of the query grams, then verified and ranked:
+    exact match first, then prefix, then substring. Shorter names rank higher on ties.
+    Documents can be added and removed one by one, so the index is updated incrementally.
+    """
+
+    def __init__(self) -> None:
+        # key: normalized names
+        self._names: Dict[_Key, List[str]] = {}
+        self._postings: Dict[str, Set[_Key]] = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, key: _Key) -> bool:
+        return key in self._names
+
+    def add(self, key: _Key, names: Iterable[str]):
+        """
+        Index a document, replace it if :param:`key` exists.
+
+        :param names: Names to search. Empty ones are ignored.
+        """
+        self.remove(key)
+        normalized = list(dict.fromkeys(filter(None, (normalize(n) for n in names if n))))
+        self._names[key] = normalized
+        for g in set().union(*(grams(n) for n in normalized)):
+            self._postings.setdefault(g, set()).add(key)
+
+    def remove(self, key: _Key):
+        """Remove a document. Unexist key will be ignored."""
+        names = self._names.pop(key, None)
+        if not names:
+            return
+        for g in set().union(*(grams(n) for n in names)):
+            posting = self._postings.get(g)
+            if posting is not None:
+                posting.discard(key)
+                if not posting:
+                    del self._postings[g]
+
+    def _score(self, key: _Key, q: str) -> Optional[float]:
+        best: Optional[float] = None
+        for name in self._names[key]:
+            if name == q:
+                score = EXACT
+            elif name.startswith(q):
+                score = PREFIX
+            elif q in name:
+                score = SUBSTRING
+            else:
+                continue
+            # prefer shorter names, in (0, 1)
+            score += 1 / (1 + len(name))
+            if best is None or score > best:
+                best = score
+        return best
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[_Key, float]]:
+        """
+        Get top :param:`k` documents matching :param:`query`.
+
+        :return: (key, score) in descending order of score.
+        """
+        q = normalize(query)
+        if not q or k <= 0:
+            return []
+        postings = [self._postings.get(g) for g in _query_grams(q)]
+        if not all(postings):
+            return []
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        scored = [(key, self._score(key, q)) for key in candidates]
+        return heapq.nlargest(k, [(key, s) for key, s in scored if s is not None], key=lambda i: i[1])
@@ -0,0 +1,40 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+_ReturnType = TypeVar('_ReturnType')
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one call.
+
+    The first caller of a key starts the call, later callers wait for it
+    before it completes, and all of them get the same result or exception.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        """Count of in-flight calls."""
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[_ReturnType]]) -> _ReturnType:
+        """
+        Call :param:`func` if no call of :param:`key` is in flight, or else wait for that call.
+
+        Cancelling one caller doesn't cancel the call shared with others.
+
+        :param key: Key of the call.
+        :param func: Start the call. Only called by the first caller.
+        """
+        fut = self._calls.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(func())
+            self._calls[key] = fut
+
+            def done(_):
+                if self._calls.get(key) is fut:
+                    del self._calls[key]
+            fut.add_done_callback(done)
+        return await asyncio.shield(fut)
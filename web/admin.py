@@ -0,0 +1,113 @@
+import functools
+import json
+import os
+import zlib
+from datetime import date
+from typing import Dict, Optional, Tuple, TypedDict
+
+import bcrypt
+from aiohttp import BasicAuth, hdrs, web
+from aiohttp.web import Request, Response
+from config import AdminSetting
+from storages.dbutil import DbUtil
+from utils.async_util import async_wrap
+from utils.logger import Logger
+
+from web.constant import ErrCode
+from web.middleware import HandleType
+from web.compression import negotiate
+from web.model import to_tide_row_model, wrap_response
+from web.serializer import dumps
+
+routes = web.RouteTableDef()
+_logger = Logger('admin').logger
+
+
+class AdminConfigDict(TypedDict):
+    # username: bcrypt hashed password
+    users: Dict[str, str]
+
+
+# (mtime of config file, config)
+_config: Tuple[Optional[int], AdminConfigDict] = (None, AdminConfigDict(users={}))
+
+
+def load_config() -> AdminConfigDict:
+    """Load :attr:`AdminSetting.CONFIG_FILE`, reload it once it's modified."""
+    global _config
+    try:
+        mtime = os.stat(AdminSetting.CONFIG_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return AdminConfigDict(users={})
+    if mtime != _config[0]:
+        with open(AdminSetting.CONFIG_FILE, encoding='utf-8') as f:
+            _config = (mtime, json.load(f))
+    return _config[1]
+
+
+def check_password(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode(), hashed.encode())
+
+
+def unauthorized(err: dict) -> Response:
+    resp = wrap_response(code=err['code'], msg=err['msg'])
+    resp.set_status(401)
+    resp.headers[hdrs.WWW_AUTHENTICATE] = 'Basic realm="tide-crawler"'
+    return resp
+
+
+def basic_auth(handler: HandleType) -> HandleType:
+    """Allow requests with basic authorization of users in :attr:`AdminSetting.CONFIG_FILE`."""
+    @functools.wraps(handler)
+    async def wrapped(request: Request):
+        users = load_config().get('users')
+        if not users:
+            return unauthorized(ErrCode.NOT_INIT)
+        try:
+            auth = BasicAuth.decode(request.headers.get(hdrs.AUTHORIZATION, ''))
+        except ValueError:
+            return unauthorized(ErrCode.PWD_ERR)
+        hashed = users.get(auth.login)
+        # bcrypt is slow by design, check it out of the event loop
+        if not hashed or not await async_wrap(check_password)(auth.password, hashed):
+            return unauthorized(ErrCode.PWD_ERR)
+        return await handler(request)
+    return wrapped
+
+
+@routes.get('/export/tides')
+@basic_auth
+async def export_tides(request: Request):
+    """
+    Stream tides between `start` and `end`(inclusive) as ndjson, one line per tide.
+    Filter by `province` if specified. Gzip if accepted.
+    """
+    try:
+        start = date.fromisoformat(request.query['start'])
+        end = date.fromisoformat(request.query['end'])
+    except KeyError:
+        return web.Response(status=400, reason='start and end are required')
+    except ValueError:
+        return web.Response(status=400, reason='malformat date, must be iso format: yyyy-MM-dd')
+    if start > end:
+        return web.Response(status=400, reason='start must not be after end')
+    province_id = request.query.get('province')
+    response = web.StreamResponse()
+    response.content_type = 'application/x-ndjson'
+    compressor = None
+    if negotiate(request.headers.get(hdrs.ACCEPT_ENCODING), ['gzip']):
+        compressor = zlib.compressobj(wbits=31)
+        response.headers[hdrs.CONTENT_ENCODING] = 'gzip'
+    response.headers[hdrs.VARY] = hdrs.ACCEPT_ENCODING
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    count = 0
+    async for page in DbUtil().scan_tides(start, end, province_id):
+        chunk = b''.join(dumps(to_tide_row_model(t)) + b'\n' for t in page)
+        count += len(page)
+        await response.write(compressor.compress(chunk) if compressor else chunk)
+    if compressor:
+        await response.write(compressor.flush())
+    await response.write_eof()
+    _logger.info(f'export {count} tides of {province_id or "all"}({start}~{end})')
+    return response
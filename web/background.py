@@ -0,0 +1,95 @@
+"""Background tasks of web application."""
+import asyncio
+from datetime import datetime, time, timedelta
+from typing import Awaitable, Callable
+
+from aiohttp import web
+from cache.cache_util import CacheUtil
+from cache.popularity import TidePopularity
+from config import CacheSetting, ChangeLogSetting
+from utils.logger import Logger
+
+_logger = Logger('background').logger
+
+
+async def run(func: Callable[[], Awaitable]):
+    """Call :param:`func` and log the exception instead of raising it."""
+    try:
+        await func()
+    except Exception as ex:
+        _logger.error(f'{func.__name__} failed. {ex}',
+                      exc_info=True, stack_info=True)
+
+
+async def every(seconds: float, func: Callable[[], Awaitable]):
+    """Call :param:`func` every :param:`seconds` until cancelled."""
+    while True:
+        await asyncio.sleep(seconds)
+        await run(func)
+
+
+async def daily(at: time, func: Callable[[], Awaitable]):
+    """Call :param:`func` at :param:`at` every day until cancelled."""
+    while True:
+        now = datetime.now()
+        next_run = datetime.combine(now.date(), at)
+        if next_run <= now:
+            next_run += timedelta(1)
+        await asyncio.sleep((next_run - now).total_seconds())
+        await run(func)
+
+
+async def refresh_hierarchy():
+    count = await CacheUtil().refresh_hierarchy()
+    _logger.info(f'refresh {count} stale lists from storage')
+
+
+async def save_snapshot():
+    CacheUtil().save_snapshot()
+
+
+async def flush_cache():
+    await CacheUtil().cache.flush()
+
+
+async def apply_changes():
+    CacheUtil().apply_changes()
+
+
+async def rebuild_stats():
+    count = await CacheUtil().rebuild_stats()
+    if count:
+        _logger.info(f'rebuild {count} monthly stats with new tides')
+
+
+async def prewarm():
+    cu = CacheUtil()
+    if not cu.cache.is_writer():
+        return
+    ports = [p for p, _ in TidePopularity().top(CacheSetting.PREWARM_TOP_K)]
+    count = await cu.prewarm(ports, CacheSetting.PREWARM_DAYS, CacheSetting.PREWARM_CONCURRENCY)
+    _logger.info(f'prewarm {count} tides of {len(ports)} popular ports')
+
+
+async def cache_ctx(app: web.Application):
+    """
+    Cleanup context to restore cache from snapshot before serving,
+    validate it in the background and save snapshots periodically.
+    Write items spooled by other processes to the shared cache, evict changed items
+    from change log of storage, and rebuild stats of months with new tides.
+    Prewarm tides of popular ports every day.
+    """
+    CacheUtil().load_snapshot()
+    tasks = [asyncio.create_task(run(refresh_hierarchy)),
+             asyncio.create_task(every(CacheSetting.SNAPSHOT_INTERVAL, save_snapshot)),
+             asyncio.create_task(every(CacheSetting.SHARED_CHECK_INTERVAL, flush_cache)),
+             asyncio.create_task(every(ChangeLogSetting.POLL_INTERVAL, apply_changes)),
+             asyncio.create_task(every(CacheSetting.STATS_INTERVAL, rebuild_stats)),
+             asyncio.create_task(daily(CacheSetting.PREWARM_AT, prewarm))]
+    yield
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await run(rebuild_stats)
+    await save_snapshot()
+    await CacheUtil().cache.flush()
@@ -0,0 +1,43 @@
+"""Content encoding negotiation and compression of response bodies."""
+import gzip
+from typing import Callable, Dict, Iterable, Optional
+
+from web.headers import parse_qvalues
+
+try:
+    import brotli
+except ImportError:  # optional, only gzip is supported without it
+    brotli = None
+
+_COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {
+    'gzip': lambda b: gzip.compress(b, compresslevel=6),
+}
+if brotli:
+    _COMPRESSORS['br'] = lambda b: brotli.compress(b, quality=5)
+
+# preferred order if the client accepts many with the same quality
+ENCODINGS = tuple(e for e in ('br', 'gzip') if e in _COMPRESSORS)
+
+
+def negotiate(header: Optional[str], encodings: Iterable[str] = ENCODINGS) -> Optional[str]:
+    """
+    Choose the encoding accepted by the client with the highest quality.
+
+    :param header: `Accept-Encoding` header.
+    :param encodings: Supported encodings in preferred order.
+    :return: Chosen encoding, or None for identity.
+    """
+    if not header:
+        return None
+    accepted = parse_qvalues(header)
+    best, best_q = None, 0.0
+    for e in encodings:
+        q = accepted.get(e, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = e, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress :param:`body` by :param:`encoding`, which must be one of :data:`ENCODINGS`."""
+    return _COMPRESSORS[encoding](body)
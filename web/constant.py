@@ -1,5 +1,7 @@
 from typing import TypedDict
 
+from config import HarmonicSetting
+
 
 class CodeMessage(TypedDict):
     code: int
@@ -11,3 +13,15 @@ class ErrCode:
         code=100001, msg='Not initialized. Please set one admin user.')
     PWD_ERR = CodeMessage(
         code=200001, msg='Username or password wrong. Please login again.')
+
+
+class CacheControl:
+    """Cache-Control header values"""
+    # areas, provinces and ports rarely change
+    HIERARCHY = 'public, max-age=300'
+    # tides of past dates never change
+    PAST_TIDE = 'public, max-age=31536000, immutable'
+    # tides of today and future may be crawled again
+    TIDE = 'public, max-age=3600'
+    # predicted tides are replaced once crawled, never cache them longer than the server does
+    PREDICTED = f'public, max-age={int(min(3600, HarmonicSetting.PREDICTED_TTL))}'
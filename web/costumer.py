@@ -1,23 +1,41 @@
-from datetime import date
+import asyncio
+import time
+from datetime import date, timedelta
+from typing import Iterable, List, Optional
 
-from aiohttp import web
-from aiohttp.web import Request
+from aiohttp import hdrs, web
+from aiohttp.web import Request, Response
+from analysis.interpolate import METHODS, SPLINE, curve
+from analysis.series import TideSeries
 from cache.cache_util import CacheUtil
-from services.crawler_service import CrawlerService
+from cache.popularity import TidePopularity
+from config import CacheSetting, HarmonicSetting, JobSetting
 from storages.basedbutil import IDT
-from storages.dbutil import DbUtil
+from storages.model import Tide
 
-from web.model import (to_area_model, to_models, to_port_model,
-                       to_province_model, to_tide_model, wrap_response)
+from web.constant import CacheControl
+from web.jobs import Job, JobQueue, JobState
+from web.matrix import (FORMATS, MEDIA_TYPES, UNSUPPORTED_FORMATS, Matrix,
+                        matrix_response, negotiate_type)
+from web.model import (conditional_response, etag_of, last_modified_of,
+                       to_area_model, to_curve_model, to_day_windows_models,
+                       to_models, to_near_port_model, to_port_model,
+                       to_province_model, to_search_result_model,
+                       to_stats_model, to_tide_model, to_tide_row_model,
+                       to_tides_model, versions_of, wrap_response)
+from web.serializer import dumps
 
 routes = web.RouteTableDef()
 
 
 @routes.get('/list/areas')
 # @alru_cache # TODO: type Request is unhashtable
-async def get_areas(_):
+async def get_areas(request: Request):
     areas = await CacheUtil().get_areas()
-    return wrap_response(to_models(areas, to_area_model))
+    return conditional_response(request, etag_of('areas', versions_of(areas)),
+                                lambda: to_models(areas, to_area_model),
+                                last_modified_of(areas), CacheControl.HIERARCHY,
+                                'areas')
 
 
 @routes.get('/list/provinces/{area}')
@@ -25,7 +43,10 @@ async def get_areas(_):
 async def get_provinces(request: Request):
     area_id = request.match_info.get('area')
     provinces = await CacheUtil().get_provinces(area_id, IDT.ID)
-    return wrap_response(to_models(provinces, to_province_model))
+    return conditional_response(request, etag_of('provinces', area_id, versions_of(provinces)),
+                                lambda: to_models(provinces, to_province_model),
+                                last_modified_of(provinces), CacheControl.HIERARCHY,
+                                f'provinces:{area_id}')
 
 
 @routes.get('/list/ports/{province}')
@@ -33,7 +54,17 @@ async def get_provinces(request: Request):
 async def get_ports(request: Request):
     province_id = request.match_info.get('province')
     ports = await CacheUtil().get_ports(province_id, IDT.ID)
-    return wrap_response(to_models(ports, to_port_model))
+    return conditional_response(request, etag_of('ports', province_id, versions_of(ports)),
+                                lambda: to_models(ports, to_port_model),
+                                last_modified_of(ports), CacheControl.HIERARCHY,
+                                f'ports:{province_id}')
+
+
+def tide_cache_control(last: date, tides: Iterable[Tide]) -> str:
+    """Cache-Control of :param:`tides` until :param:`last`. Predicted tides are never cached as immutable."""
+    if any(t.predicted for t in tides):
+        return CacheControl.PREDICTED
+    return CacheControl.PAST_TIDE if last < date.today() else CacheControl.TIDE
 
 
 def resp404(obj):
@@ -47,7 +78,9 @@ async def get_area(request: Request):
     area = await CacheUtil().get_area(pid, IDT.ID)
     if area is None:
         return resp404(f'area: {pid}')
-    return wrap_response(to_area_model(area))
+    return conditional_response(request, etag_of('area', versions_of([area])),
+                                lambda: to_area_model(area),
+                                area.updatedAt, CacheControl.HIERARCHY)
 
 
 @routes.get('/province/{id}')
@@ -57,7 +90,9 @@ async def get_province(request: Request):
     province = await CacheUtil().get_province(pid, IDT.ID)
     if province is None:
         return resp404(f'province: {pid}')
-    return wrap_response(to_province_model(province))
+    return conditional_response(request, etag_of('province', versions_of([province])),
+                                lambda: to_province_model(province),
+                                province.updatedAt, CacheControl.HIERARCHY)
 
 
 @routes.get('/port/{id}')
@@ -67,7 +102,119 @@ async def get_port(request: Request):
     port = await CacheUtil().get_port(pid, IDT.ID)
     if port is None:
         return resp404(f'port: {pid}')
-    return wrap_response(to_port_model(port))
+    return conditional_response(request, etag_of('port', versions_of([port])),
+                                lambda: to_port_model(port),
+                                port.updatedAt, CacheControl.HIERARCHY)
+
+
+def wants_async(request: Request) -> bool:
+    """Determine whether the client prefers a job to blocking on slow work, by `async=1` or `Prefer: respond-async`."""
+    return request.query.get('async') in ('1', 'true') \
+        or 'respond-async' in request.headers.get('Prefer', '')
+
+
+def job_response(request: Request, job: Job) -> Response:
+    """202 with the url of :param:`job` to poll, or 200 if it's finished."""
+    url = str(request.app.router['get_job'].url_for(id=job.id))
+    resp = wrap_response(job.to_model())
+    if not job.is_finished:
+        resp.set_status(202)
+        resp.headers[hdrs.RETRY_AFTER] = '1'
+    resp.headers[hdrs.LOCATION] = url
+    return resp
+
+
+def submit_tide_job(port_id: str, d: date) -> Job:
+    """Get the tide in background, it's crawled if not found. The job id is `tide:{port}:{date}`."""
+    async def crawl():
+        return to_tide_model(await CacheUtil().get_tide(port_id, d))
+    return JobQueue().submit(f'tide:{port_id}:{d}', crawl)
+
+
+async def foreign_job(job_id: str, wait: float) -> Optional[Job]:
+    """
+    Answer a job submitted by another process from its id. The call isn't run again,
+    so that polls across workers never crawl and save the same tide twice.
+    The job is done once its tide is found in cache or storage, and pending until then.
+
+    :param wait: Seconds to read cache and storage again until the tide is found.
+    :return: None if :param:`job_id` is malformed or refers to nothing.
+    """
+    kind, _, rest = job_id.partition(':')
+    port_id, _, date_str = rest.rpartition(':')
+    if kind != 'tide' or not port_id:
+        return None
+    try:
+        d = date.fromisoformat(date_str)
+    except ValueError:
+        return None
+    if await CacheUtil().get_port(port_id, IDT.ID) is None:
+        return None
+    job = Job(f'tide:{port_id}:{d}')
+    deadline = time.monotonic() + wait
+    while True:
+        tide = await CacheUtil().get_stored_tide(port_id, d)
+        if tide is not None:
+            job.state, job.result, job.finished = JobState.DONE, to_tide_model(tide), time.time()
+            return job
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return job
+        await asyncio.sleep(min(JobSetting.POLL_INTERVAL, remaining))
+
+
+@routes.get('/jobs/{id}', name='get_job')
+async def get_job(request: Request):
+    """
+    Get state and result of a job. Wait at most `wait` seconds until it finished.
+
+    Jobs unknown by current process, such as submitted by another worker, are answered
+    by :func:`foreign_job`. Failures of them aren't known, so they keep pending.
+    """
+    job_id = request.match_info.get('id')
+    try:
+        wait = max(0.0, min(float(request.query.get('wait', 0)), JobSetting.MAX_WAIT))
+    except ValueError:
+        return web.Response(status=400, reason='wait must be seconds')
+    job = JobQueue().get(job_id)
+    if job is None:
+        job = await foreign_job(job_id, wait)
+        if job is None:
+            return resp404(f'job: {job_id}')
+    else:
+        await JobQueue().wait(job, wait)
+    return job_response(request, job)
+
+
+@routes.get('/tide/{port}/windows')
+async def get_tide_windows(request: Request):
+    """
+    Get tidal range, high and low waters, and windows when the height is between `min` and `max`
+    of each day between `start` and `end`(inclusive).
+    """
+    port_id = request.match_info.get('port')
+    try:
+        start = date.fromisoformat(request.query['start']) if 'start' in request.query else date.today()
+        end = date.fromisoformat(request.query['end']) if 'end' in request.query else start
+        lower = float(request.query['min']) if 'min' in request.query else None
+        upper = float(request.query['max']) if 'max' in request.query else None
+    except ValueError:
+        return web.Response(status=400, reason='malformat params, start and end must be yyyy-MM-dd, min and max must be numbers')
+    if lower is None and upper is None:
+        return web.Response(status=400, reason='min or max is required')
+    if start > end:
+        return web.Response(status=400, reason='start must not be after end')
+    if end - start >= timedelta(CacheSetting.RANGE_MAX_DAYS):
+        return web.Response(status=400, reason=f'too many days, max {CacheSetting.RANGE_MAX_DAYS}')
+    port = await CacheUtil().get_port(port_id, IDT.ID)
+    if port is None:
+        return web.Response(status=404, reason=f'cannot found port: {port_id}')
+    TidePopularity().hit(port_id)
+    tides = await CacheUtil().get_tides_range(port_id, start, end)
+    cache_control = tide_cache_control(end, tides)
+    return conditional_response(request, etag_of('windows', start, end, lower, upper, versions_of(tides)),
+                                lambda: to_day_windows_models(TideSeries.from_tides(tides), lower, upper),
+                                last_modified_of(tides), cache_control)
 
 
 @routes.get('/tide/{port}/{date}')
@@ -79,11 +226,302 @@ async def get_tide(request: Request):
         d = date.fromisoformat(date_str)
     except:
         return web.Response(status=400, reason='malformat date, must be iso format: yyyy-MM-dd')
-    tide = await CacheUtil().get_tide(port_id, d)
+    tide = CacheUtil().get_cached_tide(port_id, d)
+    if tide is None and wants_async(request):
+        port = await CacheUtil().get_port(port_id, IDT.ID)
+        if port is None:
+            return web.Response(status=404, reason=f'cannot found port: {port_id}')
+
+        return job_response(request, submit_tide_job(port_id, d))
+    if tide is None:
+        tide = await CacheUtil().get_tide(port_id, d)
     if tide is None:
-        port = await DbUtil().get_port(port_id, IDT.ID)
+        port = await CacheUtil().get_port(port_id, IDT.ID)
         if port is None:
             return web.Response(status=404, reason=f'cannot found port: {port_id}')
-        tide = await CrawlerService().crawl_tide(d, port.rid)
-        await DbUtil().add_tide(tide, IDT.RID)
-    return wrap_response(to_tide_model(tide))
+        return resp404(f'tide: {port_id}/{date_str}')
+    TidePopularity().hit(port_id)
+    cache_control = tide_cache_control(d, [tide])
+    return conditional_response(request, etag_of('tide', d, versions_of([tide])),
+                                lambda: to_tide_model(tide),
+                                tide.updatedAt, cache_control)
+
+
+def parse_step(value: str) -> float:
+    """Parse step like `10m`, `1h` or `90s` to minutes. Plain number is minutes."""
+    units = {'s': 1 / 60, 'm': 1, 'h': 60}
+    value = value.strip().lower()
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+@routes.get('/tide/{port}/{date}/curve')
+async def get_tide_curve(request: Request):
+    """Get interpolated heights of a day every `step`(10m by default) by `method`(spline or cosine)."""
+    port_id = request.match_info.get('port')
+    date_str = request.match_info.get('date')
+    try:
+        d = date.fromisoformat(date_str)
+    except:
+        return web.Response(status=400, reason='malformat date, must be iso format: yyyy-MM-dd')
+    try:
+        step = parse_step(request.query.get('step', '10m'))
+    except ValueError:
+        return web.Response(status=400, reason='malformat step, such as 10m, 1h or 90s')
+    if not 1 <= step <= 60:
+        return web.Response(status=400, reason='step must be between 1m and 1h')
+    method = request.query.get('method', SPLINE)
+    if method not in METHODS:
+        return web.Response(status=400, reason=f'method must be one of {", ".join(METHODS)}')
+    tide = await CacheUtil().get_tide(port_id, d)
+    if tide is None:
+        return resp404(f'tide: {port_id}/{date_str}')
+    TidePopularity().hit(port_id)
+    try:
+        minutes, heights = curve(tide, step, method)
+    except ValueError as ex:
+        return web.Response(status=422, reason=f'cannot interpolate tide: {ex}')
+    cache_control = tide_cache_control(d, [tide])
+    return conditional_response(request, etag_of('curve', d, step, method, versions_of([tide])),
+                                lambda: to_curve_model(d, step, method, minutes, heights),
+                                tide.updatedAt, cache_control)
+
+
+@routes.get('/tide/{port}')
+async def get_tide_range(request: Request):
+    """Stream tides between `start` and `end`(inclusive) as ndjson, one line per day."""
+    port_id = request.match_info.get('port')
+    try:
+        start = date.fromisoformat(request.query['start']) if 'start' in request.query else date.today()
+        end = date.fromisoformat(request.query['end']) if 'end' in request.query else start
+    except:
+        return web.Response(status=400, reason='malformat date, must be iso format: yyyy-MM-dd')
+    if start > end:
+        return web.Response(status=400, reason='start must not be after end')
+    if end - start >= timedelta(CacheSetting.RANGE_MAX_DAYS):
+        return web.Response(status=400, reason=f'too many days, max {CacheSetting.RANGE_MAX_DAYS}')
+    port = await CacheUtil().get_port(port_id, IDT.ID)
+    if port is None:
+        return web.Response(status=404, reason=f'cannot found port: {port_id}')
+    TidePopularity().hit(port_id)
+    # headers are sent before knowing whether any tide is predicted
+    cache_control = CacheControl.PREDICTED if HarmonicSetting.FALLBACK else CacheControl.TIDE
+    response = web.StreamResponse(headers={hdrs.CACHE_CONTROL: cache_control})
+    response.content_type = 'application/x-ndjson'
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    async for tide in CacheUtil().iter_tides(port_id, start, end):
+        await response.write(dumps(to_tide_model(tide)) + b'\n')
+    await response.write_eof()
+    return response
+
+
+@routes.get('/stats/{port}/{year}/{month}')
+async def get_stats(request: Request):
+    """Get lowest and highest waters, mean height and mean range of a port in a month."""
+    port_id = request.match_info.get('port')
+    try:
+        year = int(request.match_info.get('year'))
+        month = int(request.match_info.get('month'))
+        date(year, month, 1)
+    except ValueError:
+        return web.Response(status=400, reason='malformat month, must be /yyyy/MM')
+    stats = await CacheUtil().get_stats(port_id, year, month)
+    if stats is None:
+        return resp404(f'stats: {port_id}/{year}/{month}')
+    return conditional_response(request, etag_of('stats', versions_of([stats])),
+                                lambda: to_stats_model(stats),
+                                stats.updatedAt, CacheControl.TIDE)
+
+
+async def tides_response(request: Request, port_ids: List[str], d: date):
+    """Response tides of :param:`port_ids` at :param:`d`, null for ports without tide."""
+    tides = await CacheUtil().get_tides(port_ids, d)
+    for port_id in tides:
+        TidePopularity().hit(port_id)
+    found = [tides[p] for p in port_ids if p in tides]
+    cache_control = tide_cache_control(d, found)
+    return conditional_response(request, etag_of('tides', d, port_ids, versions_of(found)),
+                                lambda: to_tides_model(tides, port_ids),
+                                last_modified_of(found), cache_control)
+
+
+@routes.get('/tides')
+async def get_tides(request: Request):
+    port_ids = list(dict.fromkeys(
+        p.strip() for p in request.query.get('ports', '').split(',') if p.strip()))
+    if not port_ids:
+        return web.Response(status=400, reason='ports is required, separated by comma')
+    if len(port_ids) > CacheSetting.BATCH_MAX_PORTS:
+        return web.Response(status=400, reason=f'too many ports, max {CacheSetting.BATCH_MAX_PORTS}')
+    date_str = request.query.get('date')
+    try:
+        d = date.fromisoformat(date_str) if date_str else date.today()
+    except:
+        return web.Response(status=400, reason='malformat date, must be iso format: yyyy-MM-dd')
+    return await tides_response(request, port_ids, d)
+
+
+@routes.get('/tides/province/{id}/{date}')
+async def get_province_tides(request: Request):
+    pid = request.match_info.get('id')
+    date_str = request.match_info.get('date')
+    try:
+        d = date.fromisoformat(date_str)
+    except:
+        return web.Response(status=400, reason='malformat date, must be iso format: yyyy-MM-dd')
+    province = await CacheUtil().get_province(pid, IDT.ID)
+    if province is None:
+        return resp404(f'province: {pid}')
+    ports = await CacheUtil().get_ports(pid, IDT.ID)
+    return await tides_response(request, [p.objectId for p in ports], d)
+
+
+async def matrix_response_of(request: Request, port_ids: List[str], d: date):
+    """
+    Response hourly heights of :param:`port_ids` at :param:`d` as a ports × hours matrix,
+    in the format of `format` query, or negotiated from `Accept` header.
+    """
+    fmt = request.query.get('format')
+    if fmt is not None:
+        media_type = FORMATS.get(fmt)
+        if fmt in UNSUPPORTED_FORMATS:
+            return web.Response(status=406, reason=f'{fmt} is not supported, use one of {", ".join(FORMATS)}')
+        if media_type is None:
+            return web.Response(status=400, reason=f'format must be one of {", ".join(FORMATS)}')
+    else:
+        media_type = negotiate_type(request.headers.get(hdrs.ACCEPT))
+        if media_type is None:
+            return web.Response(status=406, reason=f'acceptable types: {", ".join(MEDIA_TYPES)}')
+    tides = await CacheUtil().get_tides(port_ids, d)
+    for port_id in tides:
+        TidePopularity().hit(port_id)
+    found = [tides[p] for p in port_ids if p in tides]
+    cache_control = tide_cache_control(d, found)
+    resp = conditional_response(request, etag_of('matrix', media_type, d, port_ids, versions_of(found)),
+                                lambda: Matrix(d, port_ids, TideSeries.from_tides(found).rows_of(port_ids)),
+                                last_modified_of(found), cache_control,
+                                render=lambda m: matrix_response(m, media_type))
+    resp.headers.add(hdrs.VARY, hdrs.ACCEPT)
+    return resp
+
+
+@routes.get('/matrix/province/{id}/{date}')
+async def get_province_matrix(request: Request):
+    """Hourly heights of all ports of a province, see also :func:`matrix_response_of`."""
+    pid = request.match_info.get('id')
+    try:
+        d = date.fromisoformat(request.match_info.get('date'))
+    except:
+        return web.Response(status=400, reason='malformat date, must be iso format: yyyy-MM-dd')
+    province = await CacheUtil().get_province(pid, IDT.ID)
+    if province is None:
+        return resp404(f'province: {pid}')
+    ports = await CacheUtil().get_ports(pid, IDT.ID)
+    return await matrix_response_of(request, [p.objectId for p in ports], d)
+
+
+@routes.get('/matrix/area/{id}/{date}')
+async def get_area_matrix(request: Request):
+    """Hourly heights of all ports of all provinces of an area, see also :func:`matrix_response_of`."""
+    aid = request.match_info.get('id')
+    try:
+        d = date.fromisoformat(request.match_info.get('date'))
+    except:
+        return web.Response(status=400, reason='malformat date, must be iso format: yyyy-MM-dd')
+    area = await CacheUtil().get_area(aid, IDT.ID)
+    if area is None:
+        return resp404(f'area: {aid}')
+    port_ids: List[str] = []
+    for province in await CacheUtil().get_provinces(aid, IDT.ID):
+        port_ids.extend(p.objectId for p in await CacheUtil().get_ports(province.objectId, IDT.ID))
+    return await matrix_response_of(request, port_ids, d)
+
+
+@routes.get('/tides/filter/{date}')
+async def filter_tides(request: Request):
+    """
+    Find tides of a date by `minRange`, `maxRange`, `minHigh` and `maxLow` in cm,
+    in descending order of tidal range. Filter ports of `province` and at most `limit` tides if specified.
+    Tides stored before derived fields were added are found only after backfilled by `tasks/derive.py`.
+    """
+    date_str = request.match_info.get('date')
+    try:
+        d = date.fromisoformat(date_str)
+    except:
+        return web.Response(status=400, reason='malformat date, must be iso format: yyyy-MM-dd')
+    try:
+        filters = [float(request.query[n]) if n in request.query else None
+                   for n in ('minRange', 'maxRange', 'minHigh', 'maxLow')]
+        limit = int(request.query.get('limit', CacheSetting.BATCH_MAX_PORTS))
+    except ValueError as ex:
+        return web.Response(status=400, reason=f'minRange, maxRange, minHigh and maxLow must be numbers, limit must be an integer. {ex}')
+    if not 0 < limit <= CacheSetting.BATCH_MAX_PORTS:
+        return web.Response(status=400, reason=f'limit must be between 1 and {CacheSetting.BATCH_MAX_PORTS}')
+    province_id = request.query.get('province')
+    tides = await CacheUtil().find_tides(d, *filters, province_id, limit)
+    cache_control = tide_cache_control(d, tides)
+    return conditional_response(request, etag_of('filter', d, filters, province_id, limit, versions_of(tides)),
+                                lambda: to_models(tides, to_tide_row_model),
+                                last_modified_of(tides), cache_control)
+
+
+def query_floats(request: Request, *names: str, lower: float, upper: float) -> List[float]:
+    """Get required float query params between :param:`lower` and :param:`upper`."""
+    values = [float(request.query[n]) for n in names]
+    if not all(lower <= v <= upper for v in values):
+        raise ValueError(f'{",".join(names)} must be between {lower} and {upper}')
+    return values
+
+
+@routes.get('/ports/nearest')
+async def get_nearest_ports(request: Request):
+    """Get `k` ports nearest to (`lat`, `lon`) and within `max` kilometers if specified."""
+    try:
+        lat, = query_floats(request, 'lat', lower=-90, upper=90)
+        lon, = query_floats(request, 'lon', lower=-180, upper=180)
+        k = int(request.query.get('k', 10))
+        max_distance = float(request.query['max']) if 'max' in request.query else None
+    except (KeyError, ValueError) as ex:
+        return web.Response(status=400, reason=f'lat and lon are required, k and max are optional. {ex}')
+    if not 0 < k <= CacheSetting.BATCH_MAX_PORTS:
+        return web.Response(status=400, reason=f'k must be between 1 and {CacheSetting.BATCH_MAX_PORTS}')
+    version, index = await CacheUtil().get_port_index()
+    return conditional_response(request, etag_of('nearest', lat, lon, k, max_distance, version),
+                                lambda: [to_near_port_model(p, dist) for p, dist
+                                         in index.nearest(lat, lon, k, max_distance)],
+                                cache_control=CacheControl.HIERARCHY)
+
+
+@routes.get('/ports/bbox')
+async def get_ports_in_bbox(request: Request):
+    """Get ports in bounding box. It crosses the antimeridian if `west` is greater than `east`."""
+    try:
+        south, north = query_floats(request, 'south', 'north', lower=-90, upper=90)
+        west, east = query_floats(request, 'west', 'east', lower=-180, upper=180)
+    except (KeyError, ValueError) as ex:
+        return web.Response(status=400, reason=f'south, west, north and east are required. {ex}')
+    if south > north:
+        return web.Response(status=400, reason='south must not be greater than north')
+    version, index = await CacheUtil().get_port_index()
+    return conditional_response(request, etag_of('bbox', south, west, north, east, version),
+                                lambda: to_models(index.within(south, west, north, east), to_port_model),
+                                cache_control=CacheControl.HIERARCHY)
+
+
+@routes.get('/search')
+async def search(request: Request):
+    """Search top `k` areas, provinces and ports by name, English or pinyin name."""
+    q = request.query.get('q', '').strip()
+    if not q:
+        return web.Response(status=400, reason='q is required')
+    try:
+        k = int(request.query.get('k', 10))
+    except ValueError:
+        return web.Response(status=400, reason='k must be an integer')
+    if not 0 < k <= CacheSetting.BATCH_MAX_PORTS:
+        return web.Response(status=400, reason=f'k must be between 1 and {CacheSetting.BATCH_MAX_PORTS}')
+    index, docs = await CacheUtil().get_search_index()
+    return wrap_response([to_search_result_model(kind, docs[(kind, oid)])
+                          for (kind, oid), _ in index.search(q, k)])
@@ -0,0 +1,25 @@
+"""Parsers of http headers."""
+from typing import Dict
+
+
+def parse_qvalues(header: str) -> Dict[str, float]:
+    """
+    Parse a header of values weighted by quality, such as `Accept` and `Accept-Encoding`.
+    Parameters other than `q` are ignored, and malformed qualities are 0.
+
+    :return: Quality of each value in lowercase.
+    """
+    accepted: Dict[str, float] = {}
+    for part in header.split(','):
+        name, *params = [p.strip() for p in part.split(';')]
+        if not name:
+            continue
+        q = 1.0
+        for p in params:
+            if p.lower().startswith('q='):
+                try:
+                    q = float(p[2:])
+                except ValueError:
+                    q = 0.0
+        accepted[name.lower()] = q
+    return accepted
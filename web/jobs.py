@@ -0,0 +1,151 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypedDict
+
+from aiohttp import web
+from config import JobSetting
+from utils.logger import Logger
+from utils.singleton import Singleton
+
+
+class JobState:
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+class JobModel(TypedDict):
+    id: str
+    state: str
+    # unix timestamps
+    created: float
+    finished: Optional[float]
+    # result of done job
+    result: Any
+    # error message of failed job
+    error: Optional[str]
+
+
+class Job:
+    """
+    A background call with its state and result.
+
+    Its id is the key of the call, such as `tide:{port}:{date}`,
+    so that any process can derive the call from the id and answer it.
+    """
+
+    def __init__(self, key: str) -> None:
+        self.id = key
+        self.key = key
+        self.state = JobState.PENDING
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.state in (JobState.DONE, JobState.FAILED)
+
+    def to_model(self) -> JobModel:
+        return JobModel(id=self.id, state=self.state, created=self.created,
+                        finished=self.finished, result=self.result, error=self.error)
+
+
+class JobQueue(Singleton):
+    """
+    Run jobs in background of current process with bounded concurrency.
+
+    Submitting a key which has an unfinished job returns that job,
+    so that concurrent misses wait for the same job.
+    Finished jobs are kept for :attr:`JobSetting.TTL` seconds to be polled.
+    Jobs are only known by the process which runs them, polls landing on other processes
+    are answered from the result stored by the call. See also :func:`web.costumer.foreign_job`.
+    """
+
+    def __init__(self, concurrency: int = None, ttl: float = None) -> None:
+        """
+        :param concurrency: Max count of running jobs. :attr:`JobSetting.CONCURRENCY` by default.
+        :param ttl: Seconds to keep finished jobs. :attr:`JobSetting.TTL` by default.
+        """
+        self.logger = Logger(self.__class__.__name__).logger
+        self.concurrency = concurrency if concurrency else JobSetting.CONCURRENCY
+        self.ttl = ttl if ttl is not None else JobSetting.TTL
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._jobs: Dict[str, Job] = {}
+        # key: id of unfinished job
+        self._running: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def _expire(self):
+        now = time.time()
+        expired = [i for i, j in self._jobs.items()
+                   if j.is_finished and j.finished + self.ttl < now]
+        for i in expired:
+            del self._jobs[i]
+
+    async def _run(self, job: Job, func: Callable[[], Awaitable[Any]]):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            async with self._semaphore:
+                job.state = JobState.RUNNING
+                job.result = await func()
+                job.state = JobState.DONE
+        except asyncio.CancelledError:
+            job.state, job.error = JobState.FAILED, 'cancelled'
+            raise
+        except Exception as ex:
+            self.logger.error(f'job {job.key}({job.id}) failed. {ex}',
+                              exc_info=True, stack_info=True)
+            job.state, job.error = JobState.FAILED, str(ex)
+        finally:
+            job.finished = time.time()
+            self._running.pop(job.key, None)
+
+    def submit(self, key: str, func: Callable[[], Awaitable[Any]]) -> Job:
+        """
+        Run :param:`func` in background, unless a job of :param:`key` is unfinished.
+
+        :param key: Key to identify same jobs.
+        :param func: Start the job, its return value will be the result of job.
+        """
+        self._expire()
+        running = self._running.get(key)
+        if running is not None:
+            return self._jobs[running]
+        job = Job(key)
+        self._jobs[job.id] = job
+        self._running[key] = job.id
+        job.task = asyncio.ensure_future(self._run(job, func))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._expire()
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: Job, timeout: float) -> Job:
+        """Wait at most :param:`timeout` seconds until :param:`job` finished."""
+        if not job.is_finished and timeout > 0:
+            try:
+                await asyncio.wait_for(asyncio.shield(job.task), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    async def close(self):
+        """Cancel unfinished jobs."""
+        tasks = [j.task for j in self._jobs.values() if not j.is_finished]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def jobs_ctx(app: web.Application):
+    """Cleanup context to cancel unfinished jobs on shutdown."""
+    yield
+    await JobQueue().close()
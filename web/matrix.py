@@ -0,0 +1,99 @@
+"""
+Content type negotiation and encoding of ports × hours matrices of heights.
+
+Binary formats keep heights as one contiguous float32 array,
+which is several times smaller and faster to parse than nested json.
+"""
+import io
+import math
+from datetime import date
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from aiohttp import web
+from aiohttp.web import Response
+
+from web.headers import parse_qvalues
+from web.model import wrap_response
+
+try:
+    import msgpack
+except ImportError:  # optional, only npz and json are supported without it
+    msgpack = None
+
+JSON = 'application/json'
+# `.npz` of `ports` and `heights` arrays, load it by `numpy.load`
+NPZ = 'application/x-npz'
+MSGPACK = 'application/x-msgpack'
+
+# values of `format` query which override `Accept` header
+FORMATS = {'json': JSON, 'npz': NPZ}
+# `.npy` holds one array without labels, so ports are only served in npz
+UNSUPPORTED_FORMATS = ('npy',)
+if msgpack:
+    FORMATS['msgpack'] = MSGPACK
+
+# preferred order if the client accepts many with the same quality
+MEDIA_TYPES = tuple(t for t in (JSON, NPZ, MSGPACK) if t in FORMATS.values())
+
+
+class Matrix(NamedTuple):
+    date: date
+    port_ids: List[str]
+    # array of shape (ports, 24), NaN if unknown. It's encoded as float32
+    heights: np.ndarray
+
+
+def negotiate_type(header: Optional[str], media_types: Sequence[str] = MEDIA_TYPES) -> Optional[str]:
+    """
+    Choose the media type accepted by the client with the highest quality.
+    Exact types are preferred to wildcards such as `application/*` and `*/*`.
+
+    :param header: `Accept` header. The first media type is chosen if it's empty.
+    :param media_types: Supported media types in preferred order.
+    :return: Chosen media type, or None if nothing is acceptable.
+    """
+    if not header:
+        return media_types[0] if media_types else None
+    accepted = parse_qvalues(header)
+    best, best_rank = None, (0.0, 0)
+    for t in media_types:
+        # (quality, specificity) of the most specific pattern matching t
+        patterns = ('*/*', t.split('/')[0] + '/*', t)
+        matched = [(accepted[p], s) for s, p in enumerate(patterns) if p in accepted]
+        if not matched:
+            continue
+        rank = max(matched, key=lambda m: m[1])
+        if rank[0] > 0 and rank > best_rank:
+            best, best_rank = t, rank
+    return best
+
+
+def to_npz(m: Matrix) -> bytes:
+    buf = io.BytesIO()
+    np.savez(buf, ports=np.array(m.port_ids, dtype=np.str_),
+             heights=m.heights.astype('<f4'))
+    return buf.getvalue()
+
+
+def to_msgpack(m: Matrix) -> bytes:
+    """Heights are raw bytes of little endian float32 in row-major order."""
+    return msgpack.packb({'date': m.date.isoformat(), 'ports': m.port_ids,
+                          'shape': list(m.heights.shape), 'dtype': '<f4',
+                          'heights': m.heights.astype('<f4').tobytes()})
+
+
+def to_json(m: Matrix) -> Dict:
+    return {'date': m.date, 'ports': m.port_ids,
+            'heights': [[None if math.isnan(h) else round(h, 2) for h in row]
+                        for row in m.heights.tolist()]}
+
+
+_ENCODERS: Dict[str, Callable[[Matrix], bytes]] = {NPZ: to_npz, MSGPACK: to_msgpack}
+
+
+def matrix_response(m: Matrix, media_type: str) -> Response:
+    """Response :param:`m` encoded as :param:`media_type`, which must be one of :data:`MEDIA_TYPES`."""
+    if media_type == JSON:
+        return wrap_response(to_json(m))
+    return web.Response(body=_ENCODERS[media_type](m), content_type=media_type)
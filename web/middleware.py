@@ -1,7 +1,11 @@
 from typing import Awaitable, Callable, Dict, List, Tuple, Type
 
-from aiohttp import web
+from aiohttp import hdrs, web
 from aiohttp.web import Request, Response
+from config import CacheSetting
+
+from web.compression import compress, negotiate
+from web.model import CACHED_BODY
 
 HandleType = Callable[[Request], Awaitable[ Response]]
 
@@ -38,3 +42,37 @@ async def error_middleware(request: Request, handler: HandleType):
             if isinstance(err, t):
                 return await h(request)
         return web.Response(status=500, reason=str(err))
+
+
+@web.middleware
+async def compression_middleware(request: Request, handler: HandleType):
+    """
+    Compress response body by the encoding negotiated from `Accept-Encoding`.
+
+    Compressed variants of cached bodies are reused. See also :func:`web.model.body_response`.
+    Streamed responses and bodies smaller than :attr:`CacheSetting.COMPRESS_MIN_SIZE` are not compressed.
+    304 responses vary by `Accept-Encoding` as well, since the responses they revalidate may be compressed.
+    """
+    response = await handler(request)
+    if isinstance(response, Response) and not response.prepared and response.status == 304:
+        # caches select the stored variant to revalidate by the same Vary as the full response
+        response.headers.add(hdrs.VARY, hdrs.ACCEPT_ENCODING)
+        return response
+    if not isinstance(response, Response) or response.prepared \
+            or response.status != 200 or hdrs.CONTENT_ENCODING in response.headers:
+        return response
+    body = response.body
+    if not isinstance(body, bytes) or len(body) < CacheSetting.COMPRESS_MIN_SIZE:
+        return response
+    response.headers.add(hdrs.VARY, hdrs.ACCEPT_ENCODING)
+    encoding = negotiate(request.headers.get(hdrs.ACCEPT_ENCODING))
+    if encoding is None:
+        return response
+    cached = response.get(CACHED_BODY)
+    response.body = cached.encoded(encoding) if cached else compress(body, encoding)
+    response.headers[hdrs.CONTENT_ENCODING] = encoding
+    etag = response.headers.get(hdrs.ETAG)
+    if etag and not etag.startswith('W/'):
+        # encoded bytes differ from the identity ones
+        response.headers[hdrs.ETAG] = f'W/{etag}'
+    return response
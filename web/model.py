@@ -1,9 +1,19 @@
-from datetime import datetime
-from typing import Callable, List, Tuple, TypedDict
+import hashlib
+import json
+from datetime import date, datetime
+from typing import (Any, Callable, Dict, Iterable, List, Optional, Sequence,
+                    Tuple, TypedDict)
 
-from aiohttp import web
-from aiohttp.web import Response
-from storages.model import Area, Port, Province, Tide, TideItem, TideItemDict, WithInfo
+import numpy as np
+from aiohttp import hdrs, web
+from aiohttp.web import Request, Response
+from analysis.series import TideSeries
+from analysis.stats import Extremum, summarize
+from storages.model import (Area, BaseClazz, Port, Province, Tide, TideItemDict,
+                            TideStats, WithInfo)
+
+from web.response_cache import CachedBody, ResponseCache
+from web.serializer import dumps, serializer
 
 
 class BaseModel(TypedDict):
@@ -24,11 +34,79 @@ class PortModel(BaseModel):
     geopoint: Tuple[float, float]
 
 
+class NearPortModel(PortModel):
+    # kilometers
+    distance: float
+
+
+class SearchResultModel(BaseModel):
+    # area, province or port
+    kind: str
+    # id of area of province, or id of province of port
+    parent: Optional[str]
+
+
 class TideModel(TypedDict):
-    date: str
+    date: date
     day: List[TideItemDict]
     limit: List[TideItemDict]
     datum: float
+    # predicted by harmonic analysis rather than crawled
+    predicted: bool
+
+
+class CurveModel(TypedDict):
+    date: date
+    # minutes between two points
+    step: float
+    method: str
+    # `HH:mm` of each point
+    times: List[str]
+    heights: List[float]
+
+
+class ExtremeModel(TypedDict):
+    # `HH:mm`
+    time: str
+    height: float
+    # high or low
+    type: str
+
+
+class WindowModel(TypedDict):
+    # `HH:mm`, inclusive
+    start: str
+    # `HH:mm`, exclusive
+    end: str
+
+
+class DayWindowsModel(TypedDict):
+    date: date
+    # tidal range of hourly heights
+    range: float
+    extremes: List[ExtremeModel]
+    windows: List[WindowModel]
+
+
+class HighLowModel(TypedDict):
+    time: datetime
+    height: float
+
+
+class StatsModel(TypedDict):
+    # id of port
+    port: str
+    year: int
+    month: int
+    # count of days with tides
+    days: int
+    # lowest and highest water of the month
+    min: Optional[HighLowModel]
+    max: Optional[HighLowModel]
+    # mean of hourly heights
+    mean: Optional[float]
+    # mean of daily tidal ranges
+    range: Optional[float]
 
 
 class BaseResponse(TypedDict):
@@ -39,8 +117,92 @@ class BaseResponse(TypedDict):
 
 
 def wrap_response(data={}, code=0, msg='success', err='') -> Response:
-    resp = BaseResponse(code=code, msg=msg, err=err, data=data)
-    return web.json_response(resp)
+    return web.Response(body=dumps_response(data, code, msg, err),
+                        content_type=serializer.content_type)
+
+
+def dumps_response(data={}, code=0, msg='success', err='') -> bytes:
+    """Serialize response like :func:`wrap_response`."""
+    return dumps(BaseResponse(code=code, msg=msg, err=err, data=data))
+
+
+# key of :class:`CachedBody` in a response, used to reuse its compressed variants
+try:
+    CACHED_BODY = web.ResponseKey('cached_body', CachedBody)
+except AttributeError:  # older aiohttp has no typed response keys
+    CACHED_BODY = 'cached_body'
+
+
+def body_response(cached: CachedBody) -> Response:
+    """
+    Response with serialized body.
+    It's compressed by :func:`web.middleware.compression_middleware` with cached variants.
+    """
+    resp = web.Response(body=cached.body, content_type=serializer.content_type)
+    resp[CACHED_BODY] = cached
+    return resp
+
+
+def etag_of(*parts: Any) -> str:
+    """
+    Strong ETag from versions of response content, such as objectId and updatedAt.
+    It's computed before serializing, so that a 304 response never serializes data.
+    """
+    content = json.dumps(parts, default=str, separators=(',', ':'))
+    return f'"{hashlib.sha1(content.encode()).hexdigest()}"'
+
+
+def versions_of(os: Iterable[BaseClazz]) -> List[Tuple[Optional[str], Optional[datetime]]]:
+    return [(o.objectId, o.updatedAt) for o in os]
+
+
+def last_modified_of(os: Iterable[BaseClazz]) -> Optional[datetime]:
+    return max((o.updatedAt for o in os if o.updatedAt), default=None)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Determine whether the client's copy is fresh by If-None-Match or If-Modified-Since."""
+    if_none_match = request.headers.get(hdrs.IF_NONE_MATCH)
+    if if_none_match:
+        tags = [t.strip() for t in if_none_match.split(',')]
+        return '*' in tags or etag in tags or f'W/{etag}' in tags
+    since = request.if_modified_since
+    if since and last_modified:
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def conditional_response(request: Request, etag: str, data: Callable[[], Any], last_modified: Optional[datetime] = None, cache_control: str = None, cache_key: str = None, render: Callable[[Any], Response] = None) -> Response:
+    """
+    Response with cache headers, or 304 if the client's copy is fresh.
+
+    :param etag: See also :func:`etag_of`.
+    :param data: Get response data. It won't be called if not modified or cached.
+    :param last_modified: Last modified time of :param:`data`.
+    :param cache_control: Cache-Control header.
+    :param cache_key: Cache serialized body as this key. See also :class:`ResponseCache`.
+        Ignored if :param:`render` is specified.
+    :param render: Build response of data, such as other formats than json. :func:`wrap_response` by default.
+    """
+    if last_modified and last_modified.tzinfo is None:
+        # naive datetime is local time
+        last_modified = last_modified.astimezone()
+    if is_not_modified(request, etag, last_modified):
+        resp = web.Response(status=304)
+    elif render:
+        resp = render(data())
+    elif cache_key:
+        rc = ResponseCache()
+        cached = rc.get(cache_key, etag) or rc.put(cache_key, etag, dumps_response(data()))
+        resp = body_response(cached)
+    else:
+        resp = wrap_response(data())
+    resp.headers[hdrs.ETAG] = etag
+    if cache_control:
+        resp.headers[hdrs.CACHE_CONTROL] = cache_control
+    if last_modified:
+        resp.last_modified = last_modified
+    return resp
 
 
 def to_base_model(o: WithInfo) -> BaseModel:
@@ -65,13 +227,75 @@ def to_port_model(o: Port) -> PortModel:
     return m
 
 
+def to_near_port_model(o: Port, distance: float) -> NearPortModel:
+    m = to_port_model(o)
+    m['distance'] = round(distance, 3)
+    return m
+
+
+def to_search_result_model(kind: str, o: WithInfo) -> SearchResultModel:
+    m = to_base_model(o)
+    parent = o.area if kind == 'province' else o.province if kind == 'port' else None
+    m.update({'kind': kind, 'parent': parent.objectId if parent else None})
+    return m
+
+
 def to_tide_model(o: Tide) -> TideModel:
     if not o:
         return None
+    return TideModel(date=o.date.date(), day=o.day_dicts, limit=o.limit_dicts, datum=o.datum,
+                     predicted=o.predicted)
+
+
+class TideRowModel(TideModel):
+    # id of port
+    port: str
+
+
+def to_tide_row_model(o: Tide) -> TideRowModel:
+    """Tide with its port id, for exporting."""
+    return TideRowModel(port=o.port.objectId, **to_tide_model(o))
+
+
+def hhmm(minute: float) -> str:
+    """Format minutes since 00:00 as `HH:mm`, rounded to the nearest minute."""
+    m = int(round(minute))
+    return f'{m // 60:02d}:{m % 60:02d}'
+
+
+def to_curve_model(d: date, step: float, method: str, minutes: Sequence[float], heights: Sequence[float]) -> CurveModel:
+    times = [hhmm(m) for m in minutes]
+    return CurveModel(date=d, step=step, method=method, times=times,
+                      heights=[round(float(h), 2) for h in heights])
+
+
+def to_day_windows_models(series: TideSeries, lower: Optional[float], upper: Optional[float]) -> List[DayWindowsModel]:
+    """Analytics of each day in :param:`series`, days without enough data are omitted."""
+    ranges = series.ranges()
+    extrema = series.extrema()
+    windows = series.windows(lower, upper)
+    return [DayWindowsModel(date=d, range=round(float(ranges[i]), 2),
+                            extremes=[ExtremeModel(time=hhmm(e.minute), height=round(e.height, 2),
+                                                   type='high' if e.high else 'low')
+                                      for e in extrema[i]],
+                            windows=[WindowModel(start=hhmm(w.start), end=hhmm(w.end)) for w in windows[i]])
+            for i, (_, d) in enumerate(series.labels) if not np.isnan(ranges[i])]
+
+
+def to_stats_model(o: TideStats) -> StatsModel:
+    s = summarize(o.days)
+
+    def high_low(e: Optional[Extremum]) -> Optional[HighLowModel]:
+        return HighLowModel(time=e.time, height=e.height) if e else None
+    return StatsModel(port=o.port.objectId if o.port else None, year=o.year, month=o.month,
+                      days=s.count, min=high_low(s.min), max=high_low(s.max),
+                      mean=round(s.mean, 2) if s.mean is not None else None,
+                      range=round(s.mean_range, 2) if s.mean_range is not None else None)
+
 
-    def items_to_dicts(items: List[TideItem]) -> List[TideItemDict]:
-        return [i.to_dict() for i in items]
-    return TideModel(date=o.date.date().isoformat(), day=items_to_dicts(o.day), limit=items_to_dicts(o.limit), datum=o.datum)
+def to_tides_model(tides: Dict[str, Tide], port_ids: List[str]) -> Dict[str, Optional[TideModel]]:
+    """Map each of :param:`port_ids` to its tide, or None if not found."""
+    return {p: to_tide_model(tides.get(p)) for p in port_ids}
 
 
 def to_models(os: list, to: Callable[[WithInfo], BaseModel]):
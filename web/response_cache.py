@@ -0,0 +1,60 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from config import CacheSetting
+from utils.singleton import Singleton
+
+from web.compression import compress
+
+
+class CachedBody:
+    """Serialized response body and its compressed variants."""
+
+    def __init__(self, etag: str, body: bytes) -> None:
+        self.etag = etag
+        self.body = body
+        self._encoded: Dict[str, bytes] = {}
+
+    def encoded(self, encoding: str) -> bytes:
+        """:attr:`body` compressed by :param:`encoding`, compressed at the first access."""
+        if encoding not in self._encoded:
+            self._encoded[encoding] = compress(self.body, encoding)
+        return self._encoded[encoding]
+
+
+class ResponseCache(Singleton):
+    """
+    LRU cache of serialized response bodies in current process.
+
+    Bodies are keyed by route and parameters, and only returned if the etag matches,
+    so that a body is rebuilt once the underlying data changes.
+    """
+
+    def __init__(self, maxsize: int = None) -> None:
+        """
+        :param maxsize: Max count of cached bodies. :attr:`CacheSetting.RESPONSE_CACHE_SIZE` by default.
+        """
+        self.maxsize = maxsize if maxsize else CacheSetting.RESPONSE_CACHE_SIZE
+        self._bodies: Dict[str, CachedBody] = OrderedDict()
+
+    def get(self, key: str, etag: str) -> Optional[CachedBody]:
+        """Get cached body of :param:`key` if it's built from the same version as :param:`etag`."""
+        cached = self._bodies.get(key)
+        if cached is None:
+            return None
+        if cached.etag != etag:
+            self._bodies.pop(key)
+            return None
+        self._bodies.move_to_end(key)
+        return cached
+
+    def put(self, key: str, etag: str, body: bytes) -> CachedBody:
+        cached = CachedBody(etag, body)
+        self._bodies[key] = cached
+        self._bodies.move_to_end(key)
+        while len(self._bodies) > self.maxsize:
+            self._bodies.popitem(last=False)
+        return cached
+
+    def clear(self):
+        self._bodies.clear()
@@ -0,0 +1,64 @@
+"""JSON serializers for responses."""
+import datetime
+import json
+from abc import ABC, abstractmethod
+from typing import Any
+
+import numpy as np
+from storages.model import TideItem
+
+try:
+    import orjson
+except ImportError:  # optional, fallback to stdlib
+    orjson = None
+
+
+def _default(o: Any) -> Any:
+    """Serialize types which are not supported natively."""
+    if isinstance(o, TideItem):
+        return {TideItem.TIME: o.time, TideItem.HEIGHT: o.height}
+    if isinstance(o, (datetime.date, datetime.time)):
+        return o.isoformat()
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    raise TypeError(f'{type(o).__name__} is not JSON serializable')
+
+
+class BaseSerializer(ABC):
+    content_type = 'application/json'
+
+    @abstractmethod
+    def dumps(self, obj: Any) -> bytes:
+        """Serialize :param:`obj` to utf-8 encoded json."""
+        pass
+
+
+class StdSerializer(BaseSerializer):
+    """Serializer by :module:`json`."""
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, default=_default, ensure_ascii=False,
+                          separators=(',', ':')).encode()
+
+
+class OrjsonSerializer(BaseSerializer):
+    """
+    Serializer by `orjson`, which serializes date, time, datetime, tuple and numpy arrays natively.
+
+    See also
+    -------
+    https://github.com/ijl/orjson
+    """
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+serializer: BaseSerializer = OrjsonSerializer() if orjson else StdSerializer()
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize :param:`obj` by the fastest available serializer."""
+    return serializer.dumps(obj)